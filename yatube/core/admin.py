@@ -0,0 +1,10 @@
+from django.contrib import admin
+
+from .models import Task
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'name', 'created', 'run_at', 'attempts', 'failed')
+    list_filter = ('failed', 'name')
+    readonly_fields = ('created', 'attempts', 'lock', 'last_error')
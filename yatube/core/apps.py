@@ -1,5 +1,14 @@
 from django.apps import AppConfig
+from django.core.signals import request_finished
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from . import db, tasks
+        connection_created.connect(db.tune_sqlite,
+                                   dispatch_uid='core.db.tune_sqlite')
+        request_finished.connect(tasks.run_pending,
+                                 dispatch_uid='core.tasks.run_pending')
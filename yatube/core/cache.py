@@ -0,0 +1,335 @@
+"""Общий для всех процессов кэш в файле SQLite.
+
+`LocMemCache` у каждого процесса свой: N воркеров gunicorn прогревают
+N копий одних и тех же страниц, а сброс поколения ленты в одном
+процессе не виден остальным. `SQLiteCache` хранит записи в одном файле
+(WAL, запись сериализует сама SQLite), поэтому кэш общий и не требует
+отдельного сервиса.
+
+Размер ограничен `MAX_ENTRIES` записями и `MAX_SIZE` байтами; при
+превышении сначала удаляются истекшие записи, затем 1/`CULL_FREQUENCY`
+давно не читанных (приближенный LRU: время чтения обновляется не чаще
+раза в `ACCESS_RESOLUTION` секунд, чтобы чтение не превращалось в
+запись).
+
+Двухуровневый режим: при `LOCAL_ENTRIES` > 0 прочитанные значения
+держатся еще и в памяти процесса (L1). Каждая запись в общий файл (L2)
+добавляет ключ в журнал `changes`; перед чтением из L1 процесс
+проверяет `PRAGMA data_version` (меняется, когда базу изменило другое
+соединение) и выбрасывает из L1 ключи из новых строк журнала. Так L1
+не отдает значение, перезаписанное другим процессом.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, '
+    'value BLOB NOT NULL, size INTEGER NOT NULL, expires REAL, '
+    'accessed REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE TABLE IF NOT EXISTS changes (seq INTEGER PRIMARY KEY '
+    'AUTOINCREMENT, key TEXT)',
+)
+
+
+class LocalTier:
+    """LRU в памяти процесса: ключ -> (срок, сериализованное значение)."""
+
+    def __init__(self, max_entries, max_size):
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, now):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] is not None and entry[0] <= now:
+                self._drop(key)
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, expires, value):
+        with self.lock:
+            self._drop(key)
+            if len(value) > self.max_size:
+                return
+            self.entries[key] = (expires, value)
+            self.size += len(value)
+            while (len(self.entries) > self.max_entries
+                   or self.size > self.max_size):
+                self._drop(next(iter(self.entries)))
+
+    def drop(self, key):
+        with self.lock:
+            self._drop(key)
+
+    def _drop(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.path = location
+        self.max_size = int(options.get('MAX_SIZE', 256 * 1024 * 1024))
+        self.access_resolution = float(options.get('ACCESS_RESOLUTION', 1))
+        # лимиты проверяются раз в столько записей процесса
+        self.cull_every = int(options.get('CULL_EVERY', 100))
+        self.log_size = int(options.get('LOG_SIZE', 10000))
+        self.busy_timeout = float(options.get('BUSY_TIMEOUT', 5))
+        local_entries = int(options.get('LOCAL_ENTRIES', 0))
+        self.local = local_entries and LocalTier(
+            local_entries, int(options.get('LOCAL_MAX_SIZE',
+                                           32 * 1024 * 1024)))
+        self._thread = threading.local()
+        self._lock = threading.Lock()
+        self._seen = None
+        self._writes = 0
+
+    @property
+    def connection(self):
+        state = self._thread
+        # после fork соединение родителя использовать нельзя
+        if getattr(state, 'pid', None) != os.getpid():
+            state.connection = self._connect()
+            state.pid = os.getpid()
+            state.data_version = None
+        return state.connection
+
+    def _connect(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=self.busy_timeout,
+                                     isolation_level=None,
+                                     check_same_thread=False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        for statement in SCHEMA:
+            connection.execute(statement)
+        if self._seen is None:
+            self._seen = self._last_change(connection)
+        return connection
+
+    def _last_change(self, connection):
+        row = connection.execute('SELECT max(seq) FROM changes').fetchone()
+        return row[0] or 0
+
+    @contextmanager
+    def _write(self):
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def _log(self, connection, key):
+        connection.execute('INSERT INTO changes (key) VALUES (?)', (key,))
+
+    def _sync(self):
+        """Выбрасывает из L1 ключи, измененные другими соединениями."""
+        connection = self.connection
+        state = self._thread
+        version = connection.execute('PRAGMA data_version').fetchone()[0]
+        if version == state.data_version:
+            return
+        state.data_version = version
+        rows = connection.execute(
+            'SELECT seq, key FROM changes WHERE seq > ? ORDER BY seq',
+            (self._seen,)).fetchall()
+        if not rows:
+            return
+        with self._lock:
+            # журнал обрезан или в нем clear(): L1 сбрасывается целиком
+            if (rows[0][0] != self._seen + 1
+                    or any(key is None for seq, key in rows)):
+                self.local.clear()
+            else:
+                for seq, key in rows:
+                    self.local.drop(key)
+            self._seen = max(self._seen, rows[-1][0])
+
+    def _remember(self, key, expires, value, seen):
+        # журнал сдвинулся, пока значение читалось: оно могло устареть
+        with self._lock:
+            if self._seen == seen:
+                self.local.put(key, expires, value)
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        seen = None
+        if self.local:
+            self._sync()
+            value = self.local.get(key, now)
+            if value is not None:
+                return pickle.loads(value)
+            seen = self._seen
+        row = self.connection.execute(
+            'SELECT value, expires, accessed FROM cache WHERE key = ?',
+            (key,)).fetchone()
+        if row is None:
+            return default
+        value, expires, accessed = row
+        if expires is not None and expires <= now:
+            return default
+        if now - accessed >= self.access_resolution:
+            self.connection.execute(
+                'UPDATE cache SET accessed = ? WHERE key = ?', (now, key))
+        if self.local:
+            self._remember(key, expires, value, seen)
+        return pickle.loads(value)
+
+    def _store(self, connection, key, value, expires, now):
+        connection.execute(
+            'INSERT OR REPLACE INTO cache (key, value, size, expires, '
+            'accessed) VALUES (?, ?, ?, ?, ?)',
+            (key, value, len(value), expires, now))
+        self._log(connection, key)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._set(key, value, timeout, version, replace=True)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._set(key, value, timeout, version, replace=False)
+
+    def _set(self, key, value, timeout, version, replace):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        expires = self.get_backend_timeout(timeout)
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        now = time.time()
+        with self._write() as connection:
+            if not replace and self._alive(connection, key, now):
+                return False
+            self._store(connection, key, value, expires, now)
+        if self.local:
+            self.local.put(key, expires, value)
+        self._written()
+        return True
+
+    def _alive(self, connection, key, now):
+        row = connection.execute('SELECT expires FROM cache WHERE key = ?',
+                                 (key,)).fetchone()
+        return row is not None and (row[0] is None or row[0] > now)
+
+    def incr(self, key, delta=1, version=None):
+        """Атомарно для всех процессов, в отличие от BaseCache.incr."""
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        with self._write() as connection:
+            row = connection.execute(
+                'SELECT value, expires FROM cache WHERE key = ?',
+                (key,)).fetchone()
+            if row is None or (row[1] is not None and row[1] <= now):
+                raise ValueError("Key '%s' not found" % key)
+            result = pickle.loads(row[0]) + delta
+            value = pickle.dumps(result, pickle.HIGHEST_PROTOCOL)
+            self._store(connection, key, value, row[1], now)
+        if self.local:
+            self.local.put(key, row[1], value)
+        return result
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        expires = self.get_backend_timeout(timeout)
+        with self._write() as connection:
+            if not self._alive(connection, key, time.time()):
+                return False
+            connection.execute('UPDATE cache SET expires = ? WHERE key = ?',
+                               (expires, key))
+            self._log(connection, key)
+        if self.local:
+            self.local.drop(key)
+        return True
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._write() as connection:
+            deleted = connection.execute('DELETE FROM cache WHERE key = ?',
+                                         (key,)).rowcount
+            self._log(connection, key)
+        if self.local:
+            self.local.drop(key)
+        return bool(deleted)
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self._alive(self.connection, key, time.time())
+
+    def clear(self):
+        with self._write() as connection:
+            connection.execute('DELETE FROM cache')
+            self._log(connection, None)
+        if self.local:
+            self.local.clear()
+
+    def _written(self):
+        with self._lock:
+            self._writes += 1
+            due = self._writes % self.cull_every == 0
+        if due:
+            self.cull()
+
+    def cull(self):
+        """Приводит кэш к лимитам и обрезает журнал изменений.
+
+        Вытесненные ключи в журнал не пишутся: значение в L1 других
+        процессов от этого не становится неверным.
+        """
+        now = time.time()
+        with self._write() as connection:
+            count, size = connection.execute(
+                'SELECT count(*), total(size) FROM cache').fetchone()
+            if count > self._max_entries or size > self.max_size:
+                connection.execute('DELETE FROM cache WHERE expires <= ?',
+                                   (now,))
+                count, size = connection.execute(
+                    'SELECT count(*), total(size) FROM cache').fetchone()
+            while count and (count > self._max_entries
+                             or size > self.max_size):
+                if self._cull_frequency == 0:
+                    connection.execute('DELETE FROM cache')
+                    break
+                connection.execute(
+                    'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                    'ORDER BY accessed LIMIT ?)',
+                    (max(1, count // self._cull_frequency),))
+                count, size = connection.execute(
+                    'SELECT count(*), total(size) FROM cache').fetchone()
+            connection.execute(
+                'DELETE FROM changes WHERE seq <= '
+                '(SELECT max(seq) FROM changes) - ?', (self.log_size,))
+
+    def close(self, **kwargs):
+        # Django закрывает кэши после каждого запроса; соединение потока
+        # переиспользуется, как CONN_MAX_AGE у базы
+        pass
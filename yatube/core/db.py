@@ -0,0 +1,91 @@
+"""Чтение с реплик и привязка к основной базе после записи.
+
+Реплики перечислены в `settings.DATABASE_REPLICAS`. Читать с них можно
+только внутри GET/HEAD-запроса, который пропустил `ReplicaMiddleware`;
+команды, потоки и все остальное работают с основной базой.
+
+Первая запись в запросе привязывает его к основной базе до конца, а
+ответ получает cookie на `DATABASE_PIN_SECONDS` секунд: следующие
+запросы (например, редирект после `post_create` или `add_comment`)
+тоже читают с основной базы и видят свою запись, даже если реплика
+отстает.
+
+`tune_sqlite` выполняет `SQLITE_PRAGMAS` для каждого нового соединения
+с файлом SQLite: WAL (читатели не ждут писателя), synchronous=NORMAL
+(в WAL коммит без fsync, база не портится при сбое), mmap и кэш
+страниц, а busy_timeout заставляет писателя ждать блокировку, а не
+сразу падать с «database is locked».
+"""
+import random
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_COOKIE = 'db_pin'
+SAFE_METHODS = ('GET', 'HEAD')
+
+_state = threading.local()
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def pin_seconds():
+    return getattr(settings, 'DATABASE_PIN_SECONDS', 15)
+
+
+def use_replicas(enabled):
+    _state.use_replicas = enabled
+    _state.wrote = False
+
+
+def pinned():
+    return not getattr(_state, 'use_replicas', False)
+
+
+def tune_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite' or connection.is_in_memory_db():
+        return
+    with connection.cursor() as cursor:
+        for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            cursor.execute('PRAGMA %s = %s' % (name, value))
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        aliases = replicas()
+        if pinned() or not aliases:
+            return DEFAULT_DB_ALIAS
+        return random.choice(aliases)
+
+    def db_for_write(self, model, **hints):
+        _state.use_replicas = False
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db not in replicas()
+
+
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        use_replicas(
+            request.method in SAFE_METHODS
+            and PIN_COOKIE not in request.COOKIES
+        )
+        try:
+            response = self.get_response(request)
+            if getattr(_state, 'wrote', False) and replicas():
+                response.set_cookie(PIN_COOKIE, '1', max_age=pin_seconds(),
+                                    httponly=True, samesite='Lax')
+        finally:
+            use_replicas(False)
+        return response
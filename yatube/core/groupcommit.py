@@ -0,0 +1,88 @@
+"""Групповая запись: сохранения из параллельных потоков процесса идут
+одной транзакцией.
+
+SQLite пишет по одному: каждая транзакция ждет блокировку записи и
+коммит. `GroupCommit.save(obj)` ставит объект в очередь. Поток, который
+застал очередь свободной, становится ведущим: ждет `window` секунд,
+пока подтянутся другие, и сохраняет до `max_size` объектов в одной
+транзакции, каждый в своей точке сохранения — ошибка одного объекта
+не откатывает остальные и поднимается в потоке, который его сохранял.
+Если за это время очередь снова набралась, ведущим становится первый
+ожидающий поток.
+
+Обработчики сигналов и `on_commit` выполняются в потоке ведущего.
+Группы собираются только внутри процесса.
+"""
+import threading
+import time
+
+from django.db import router, transaction
+
+
+class Pending:
+    __slots__ = ('obj', 'event', 'leader', 'error')
+
+    def __init__(self, obj):
+        self.obj = obj
+        self.event = threading.Event()
+        self.leader = False
+        self.error = None
+
+
+class GroupCommit:
+    def __init__(self, window=0.005, max_size=100):
+        self.window = window
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.queue = []
+        self.busy = False
+
+    def save(self, obj):
+        # запись пойдет в основную базу: роутер привязывает к ней запрос
+        # этого потока, хотя INSERT выполнит ведущий
+        router.db_for_write(type(obj), instance=obj)
+        item = Pending(obj)
+        with self.lock:
+            self.queue.append(item)
+            if not self.busy:
+                self.busy = item.leader = True
+        if item.leader:
+            if self.window:
+                time.sleep(self.window)
+        else:
+            item.event.wait()
+        if item.leader:
+            self.flush()
+        if item.error is not None:
+            raise item.error
+
+    def flush(self):
+        with self.lock:
+            batch = self.queue[:self.max_size]
+            del self.queue[:self.max_size]
+        try:
+            self.write(batch)
+        finally:
+            with self.lock:
+                if self.queue:
+                    self.queue[0].leader = True
+                    self.queue[0].event.set()
+                else:
+                    self.busy = False
+            for item in batch:
+                item.event.set()
+
+    def write(self, batch):
+        using = router.db_for_write(type(batch[0].obj))
+        try:
+            with transaction.atomic(using=using):
+                for item in batch:
+                    try:
+                        with transaction.atomic(using=using):
+                            item.obj.save(using=using)
+                    except Exception as exc:
+                        item.error = exc
+        except Exception as exc:
+            # транзакция не закоммичена: не сохранился ни один объект
+            for item in batch:
+                item.error = item.error or exc
@@ -0,0 +1,61 @@
+import json
+import signal
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import tasks
+
+
+class Command(BaseCommand):
+    help = ('Выполняет задачи очереди core.tasks, пока не получит SIGINT '
+            'или SIGTERM. Раз в --report секунд пишет число выполненных '
+            'задач, глубину очереди и задержку.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=1,
+                            help='Потоков для задач')
+        parser.add_argument('--processes', type=int, default=0,
+                            help='Процессов для задач (вместо потоков)')
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--report', type=float, default=60)
+        parser.add_argument('--once', action='store_true',
+                            help='Выполнить готовые задачи и выйти')
+        parser.add_argument('--stats', action='store_true',
+                            help='Показать состояние очереди и выйти')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.stdout.write(json.dumps(tasks.stats()))
+            return
+        worker = tasks.Worker(batch_size=options['batch_size'],
+                              threads=options['threads'],
+                              processes=options['processes'])
+        if options['once']:
+            worker.start_pool()
+            try:
+                while worker.run_once():
+                    pass
+            finally:
+                if worker.pool is not None:
+                    worker.pool.shutdown()
+            self.report(worker)
+            return
+        # задачи, поставленные самими задачами, будят этот же воркер
+        tasks._runner = worker
+        for number in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(number, lambda *args: worker.stop())
+        thread = threading.Thread(target=worker.run, name='tasks')
+        thread.start()
+        while thread.is_alive():
+            thread.join(options['report'])
+            self.report(worker)
+
+    def report(self, worker):
+        stats = tasks.stats()
+        self.stdout.write(
+            '%s done=%d failed=%d queued=%d ready=%d dead=%d lag=%.1fs' % (
+                time.strftime('%H:%M:%S'), worker.done, worker.failed,
+                stats['queued'], stats['ready'], stats['failed'],
+                stats['lag_seconds']))
@@ -0,0 +1,31 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.db import replicas
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную SQLite-базу в файлы реплик. Для локальной '
+            'проверки чтения с реплик: между запусками реплики отстают.')
+
+    def handle(self, *args, **options):
+        primary = settings.DATABASES['default']
+        if primary['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('Команда копирует только SQLite-базы.')
+        if not replicas():
+            raise CommandError('Реплики не настроены (DB_REPLICAS).')
+        source = sqlite3.connect(primary['NAME'])
+        try:
+            for alias in replicas():
+                name = settings.DATABASES[alias]['NAME']
+                target = sqlite3.connect(name)
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+                self.stdout.write('%s -> %s' % (alias, name))
+        finally:
+            source.close()
+        self.stdout.write(self.style.SUCCESS('Реплики обновлены'))
@@ -0,0 +1,305 @@
+"""Метрики запросов по view: число и время SQL, время шаблонов, кэш.
+
+`MetricsMiddleware` собирает числа одного запроса в `Recorder` и
+складывает их в гистограммы `view_name -> метрика`. Гистограммы живут
+в памяти процесса и разбиты на интервалы: в отчет попадают только
+последние `METRICS_WINDOW` секунд. Раз в `METRICS_LOG_INTERVAL` секунд
+сводка пишется одной строкой в лог `core.metrics`.
+
+При `METRICS_SQL_SAMPLE_RATE` > 0 такая доля запросов сохраняет полный
+список SQL с длительностями (последние трассы видны в отчете).
+
+Тело `StreamingHttpResponse` (ленты Atom/RSS/JSON) генерируется уже
+после выхода из middleware: его SQL учитывается в том же запросе, а
+метрики пишутся, когда сервер закрывает ответ.
+"""
+import bisect
+import logging
+import random
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import DjangoTemplates
+
+logger = logging.getLogger(__name__)
+
+# верхние границы корзин: миллисекунды или штуки
+BOUNDS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+METRICS = ('total_ms', 'queries', 'sql_ms', 'template_ms',
+           'cache_hits', 'cache_misses')
+SLOTS = 6
+TRACES = 20
+
+_local = threading.local()
+
+
+def setting(name, default):
+    return getattr(settings, name, default)
+
+
+class Histogram:
+    __slots__ = ('buckets', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.buckets = [0] * (len(BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        self.buckets[bisect.bisect_left(BOUNDS, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        for index, count in enumerate(other.buckets):
+            self.buckets[index] += count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, share):
+        """Верхняя граница корзины, в которую попал перцентиль."""
+        rank = share * self.count
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return BOUNDS[index] if index < len(BOUNDS) else self.max
+        return 0
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean': round(self.total / self.count, 3) if self.count else 0,
+            'p50': self.percentile(0.5),
+            'p95': self.percentile(0.95),
+            'max': round(self.max, 3),
+        }
+
+
+class Registry:
+    """Гистограммы по view за скользящее окно из `SLOTS` интервалов."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.slots = deque()
+        self.traces = deque(maxlen=TRACES)
+        self.logged_at = time.monotonic()
+
+    def slot(self, now):
+        width = setting('METRICS_WINDOW', 300) / SLOTS
+        start = now - now % width
+        if not self.slots or self.slots[-1][0] != start:
+            self.slots.append((start, {}))
+            while self.slots[0][0] <= start - width * SLOTS:
+                self.slots.popleft()
+        return self.slots[-1][1]
+
+    def add(self, view, values, trace=None):
+        now = time.monotonic()
+        with self.lock:
+            histograms = self.slot(now).setdefault(
+                view, {name: Histogram() for name in METRICS})
+            for name, value in values.items():
+                histograms[name].add(value)
+            if trace is not None:
+                self.traces.append({'view': view, 'sql': trace})
+            due = now - self.logged_at >= setting('METRICS_LOG_INTERVAL', 60)
+            if due:
+                self.logged_at = now
+        if due:
+            logger.info(self.log_line())
+
+    def snapshot(self):
+        with self.lock:
+            self.slot(time.monotonic())
+            views = {}
+            for start, histograms in self.slots:
+                for view, metrics in histograms.items():
+                    merged = views.setdefault(
+                        view, {name: Histogram() for name in METRICS})
+                    for name, histogram in metrics.items():
+                        merged[name].merge(histogram)
+            traces = list(self.traces)
+        return {
+            'window_seconds': setting('METRICS_WINDOW', 300),
+            'views': {
+                view: {name: histogram.summary()
+                       for name, histogram in metrics.items()}
+                for view, metrics in sorted(views.items())
+            },
+            'sql_traces': traces,
+        }
+
+    def log_line(self):
+        parts = []
+        for view, metrics in self.snapshot()['views'].items():
+            total = metrics['total_ms']
+            hits = metrics['cache_hits']['mean']
+            lookups = hits + metrics['cache_misses']['mean']
+            parts.append(
+                '%s n=%d p50=%sms p95=%sms q=%.1f sql=%.1fms tpl=%.1fms '
+                'hit=%.0f%%' % (
+                    view, total['count'], total['p50'], total['p95'],
+                    metrics['queries']['mean'], metrics['sql_ms']['mean'],
+                    metrics['template_ms']['mean'],
+                    100 * hits / lookups if lookups else 0,
+                ))
+        return 'metrics: ' + ('; '.join(parts) or 'нет запросов')
+
+    def clear(self):
+        with self.lock:
+            self.slots.clear()
+            self.traces.clear()
+
+
+registry = Registry()
+
+
+class Recorder:
+    """Числа одного запроса; SQL считается через execute_wrapper."""
+
+    def __init__(self, trace=False):
+        self.queries = 0
+        self.sql = 0.0
+        self.template = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # вложенные render() (дырки страниц) уже входят во внешний
+        self.depth = 0
+        self.trace = [] if trace else None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.queries += 1
+            self.sql += elapsed
+            if self.trace is not None:
+                self.trace.append({'sql': sql,
+                                   'ms': round(elapsed * 1000, 3)})
+
+
+def current():
+    return getattr(_local, 'recorder', None)
+
+
+def count(name):
+    """Учитывает событие ('cache_hits' или 'cache_misses') в запросе."""
+    recorder = current()
+    if recorder is not None:
+        setattr(recorder, name, getattr(recorder, name) + 1)
+
+
+@contextmanager
+def recording(recorder):
+    _local.recorder = recorder
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            yield
+    finally:
+        _local.recorder = None
+
+
+class TimedStream:
+    """Тело потокового ответа: генерируется под тем же Recorder,
+    `finish` вызывается при закрытии ответа."""
+
+    def __init__(self, content, recorder, finish):
+        self.content = content
+        self.recorder = recorder
+        self.finish = finish
+        self.closed = False
+
+    def __iter__(self):
+        with recording(self.recorder):
+            yield from self.content
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            if hasattr(self.content, 'close'):
+                self.content.close()
+        finally:
+            self.finish()
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not setting('METRICS_ENABLED', True):
+            return self.get_response(request)
+        sample = random.random() < setting('METRICS_SQL_SAMPLE_RATE', 0)
+        recorder = Recorder(trace=sample)
+        started = time.perf_counter()
+        with recording(recorder):
+            response = self.get_response(request)
+
+        def finish():
+            self.record(request, recorder, started)
+
+        if response.streaming:
+            response.streaming_content = TimedStream(
+                response.streaming_content, recorder, finish)
+        else:
+            finish()
+        return response
+
+    def record(self, request, recorder, started):
+        match = getattr(request, 'resolver_match', None)
+        registry.add(match.view_name if match else '<unresolved>', {
+            'total_ms': (time.perf_counter() - started) * 1000,
+            'queries': recorder.queries,
+            'sql_ms': recorder.sql * 1000,
+            'template_ms': recorder.template * 1000,
+            'cache_hits': recorder.cache_hits,
+            'cache_misses': recorder.cache_misses,
+        }, recorder.trace)
+
+
+class TimedTemplate:
+    def __init__(self, wrapped):
+        self.wrapped = wrapped
+
+    def __getattr__(self, name):
+        return getattr(self.wrapped, name)
+
+    def render(self, context=None, request=None):
+        recorder = current()
+        if recorder is None or recorder.depth:
+            return self.wrapped.render(context, request)
+        recorder.depth += 1
+        started = time.perf_counter()
+        try:
+            return self.wrapped.render(context, request)
+        finally:
+            recorder.depth -= 1
+            recorder.template += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Шаблонизатор Django, который засекает время render() шаблона.
+
+    Время включает ленивые запросы, выполненные при отрисовке.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
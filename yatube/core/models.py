@@ -0,0 +1,31 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Task(models.Model):
+    """Задача очереди `core.tasks`.
+
+    Взятая воркером задача получает `run_at` в будущем (аренду) и метку
+    `lock`; выполненная удаляется. Если воркер упал, задача снова
+    становится готовой, когда аренда истечет.
+    """
+    name = models.CharField(max_length=100)
+    payload = models.TextField(default='{}')
+    created = models.DateTimeField(default=timezone.now)
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    lock = models.CharField(max_length=32, blank=True)
+    failed = models.BooleanField(default=False)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        verbose_name = 'Задача'
+        verbose_name_plural = 'Задачи'
+        # воркер выбирает готовые задачи по (failed, run_at)
+        indexes = [
+            models.Index(fields=['failed', 'run_at'],
+                         name='task_ready_idx'),
+        ]
+
+    def __str__(self):
+        return '%s #%s' % (self.name, self.pk)
@@ -0,0 +1,84 @@
+"""Кэш целых страниц с «дырками» под данные пользователя.
+
+Страница рендерится один раз для всех: вместо частей, зависящих от
+пользователя (шапка, форма комментария, кнопки), тег `{% pagehole %}`
+оставляет метку. Из кэша отдается сохраненный HTML, а метки
+заполняются для текущего запроса функциями, зарегистрированными
+`@hole('имя')`. Анонимному посетителю страница отдается без запросов
+к базе.
+"""
+import json
+import re
+from functools import wraps
+
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from . import metrics
+
+HOLE_RE = re.compile(r'<!--pagehole:(.*?)-->')
+
+_holes = {}
+
+
+def hole(name):
+    """Регистрирует функцию `render(request, **kwargs) -> str` для
+    дырки `name`."""
+    def register(render):
+        _holes[name] = render
+        return render
+    return register
+
+
+def render_hole(name, request, kwargs):
+    return _holes[name](request, **kwargs)
+
+
+def marker(name, kwargs):
+    return mark_safe('<!--pagehole:%s-->' % json.dumps([name, kwargs]))
+
+
+def fill_holes(content, request):
+    def render(match):
+        name, kwargs = json.loads(match.group(1))
+        return render_hole(name, request, kwargs)
+    return HOLE_RE.sub(render, content)
+
+
+def cached_page(key_func, timeout=DEFAULT_TIMEOUT):
+    """Кэширует успешные GET-ответы view под ключом `key_func(request,
+    *args, **kwargs)`; None — не кэшировать."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            key = key_func(request, *args, **kwargs)
+            if key is None:
+                return view(request, *args, **kwargs)
+            entry = cache.get(key)
+            if entry is not None:
+                metrics.count('cache_hits')
+                content, content_type = entry
+            else:
+                metrics.count('cache_misses')
+                request.page_holes = True
+                response = view(request, *args, **kwargs)
+                request.page_holes = False
+                if response.status_code != 200 or response.streaming:
+                    return response
+                content = response.content.decode(response.charset)
+                content_type = response['Content-Type']
+                cache.set(key, (content, content_type), timeout)
+            return HttpResponse(fill_holes(content, request),
+                                content_type=content_type)
+        return wrapper
+    return decorator
+
+
+@hole('header')
+def header(request):
+    return render_to_string('includes/header.html', request=request)
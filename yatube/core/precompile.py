@@ -0,0 +1,39 @@
+"""Компиляция всех шаблонов при старте процесса.
+
+С `cached.Loader` шаблон разбирается при первом обращении, и эту цену
+платит первый запрос к каждой странице в каждом процессе. `precompile()`
+проходит по каталогам шаблонов вложенных загрузчиков и загружает все
+шаблоны заранее; синтаксическая ошибка в любом из них остановит старт,
+а не всплывет на редкой странице.
+"""
+import os
+
+from django.template import engines
+from django.template.loaders.cached import Loader as CachedLoader
+
+
+def template_names(loader):
+    for directory in loader.get_dirs():
+        for root, dirs, files in os.walk(directory):
+            for name in files:
+                path = os.path.relpath(os.path.join(root, name), directory)
+                yield path.replace(os.sep, '/')
+
+
+def precompile():
+    """Загружает шаблоны во все `cached.Loader`; возвращает их число."""
+    count = 0
+    for backend in engines.all():
+        engine = getattr(backend, 'engine', None)
+        if engine is None:
+            continue
+        for loader in engine.template_loaders:
+            if not isinstance(loader, CachedLoader):
+                continue
+            names = {name for inner in loader.loaders
+                     if hasattr(inner, 'get_dirs')
+                     for name in template_names(inner)}
+            for name in sorted(names):
+                loader.get_template(name)
+                count += 1
+    return count
@@ -0,0 +1,268 @@
+"""Очередь задач после записи, хранящаяся в таблице базы.
+
+`enqueue('posts.index', post_id=1)` добавляет строку `core.Task` в
+текущей транзакции: задача появляется, только если запись
+закоммичена, и переживает перезапуск. Выполняет задачи
+`manage.py run_worker` (пул потоков или процессов). Без него, при
+`TASKS_AFTER_RESPONSE`, поток запроса, поставившего задачи, берет
+пачку готовых задач уже после отправки ответа (`request_finished`).
+
+Воркер берет пачку готовых задач: им ставится `run_at` в будущем
+(аренда на `TASKS_LEASE` секунд) и метка взятия. Задачи одного
+имени с `batch=True` выполняются одним вызовом со списком аргументов.
+Выполненные удаляются; упавшая повторяется через 2**attempts секунд,
+а после `retries` повторов остается в таблице с `failed`.
+
+При `TASKS_EAGER` задача выполняется сразу в вызывающем потоке —
+так ведут себя тесты.
+"""
+import json
+import logging
+import threading
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import timedelta
+from itertools import groupby
+from multiprocessing import get_context
+
+from django.conf import settings
+from django.db import close_old_connections, connection, connections
+from django.db import transaction
+from django.db.models import F, Min
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+MAX_BACKOFF = 300
+
+_tasks = {}
+# воркер `run_worker`, если он работает в этом процессе
+_runner = None
+_local = threading.local()
+
+
+def setting(name, default):
+    return getattr(settings, name, default)
+
+
+class TaskType:
+    def __init__(self, name, func, batch, retries):
+        self.name = name
+        self.func = func
+        self.batch = batch
+        self.retries = retries
+
+
+def task(name, batch=False, retries=5):
+    """Регистрирует функцию задачи. Задача с `batch=True` получает
+    список словарей аргументов, остальные — аргументы одной задачи."""
+    def register(func):
+        _tasks[name] = TaskType(name, func, batch, retries)
+        return func
+    return register
+
+
+def run(name, items):
+    task_type = _tasks[name]
+    if task_type.batch:
+        task_type.func(items)
+    else:
+        for kwargs in items:
+            task_type.func(**kwargs)
+
+
+def enqueue(name, **kwargs):
+    if name not in _tasks:
+        raise KeyError('Неизвестная задача %s' % name)
+    if setting('TASKS_EAGER', False):
+        run(name, [kwargs])
+        return
+    Task.objects.create(name=name, payload=json.dumps(kwargs))
+    transaction.on_commit(wake)
+
+
+def wake():
+    """После коммита: будит `run_worker` этого процесса или отмечает,
+    что запрос поставил задачи."""
+    if _runner is not None:
+        _runner.wakeup.set()
+    else:
+        _local.pending = True
+
+
+def run_pending(**kwargs):
+    """Обработчик `request_finished`: ответ уже отправлен, и поток
+    запроса выполняет одну пачку готовых задач, если запрос их ставил.
+    """
+    if not getattr(_local, 'pending', False):
+        return
+    _local.pending = False
+    if not setting('TASKS_AFTER_RESPONSE', True):
+        return
+    try:
+        batch_size = setting('TASKS_AFTER_RESPONSE_BATCH', 20)
+        Worker(batch_size=batch_size).run_once()
+    except Exception:
+        logger.exception('Ошибка задач после ответа')
+
+
+def execute(name, items):
+    """Выполняет задачи одного имени: `items` — [(id, kwargs)].
+
+    Возвращает (id выполненных, [(id, текст ошибки)]). Каждая задача
+    (или вся пачка для batch) — в своей транзакции.
+    """
+    task_type = _tasks[name]
+    groups = [items] if task_type.batch else [[item] for item in items]
+    done, failed = [], []
+    for group in groups:
+        try:
+            with transaction.atomic():
+                run(name, [kwargs for pk, kwargs in group])
+        except Exception:
+            logger.exception('Задача %s упала', name)
+            error = traceback.format_exc()
+            failed.extend((pk, error) for pk, kwargs in group)
+        else:
+            done.extend(pk for pk, kwargs in group)
+    return done, failed
+
+
+def _execute_pooled(name, items):
+    try:
+        return execute(name, items)
+    finally:
+        close_old_connections()
+
+
+def stats():
+    """Глубина очереди и задержка самой старой готовой задачи."""
+    now = timezone.now()
+    queued = Task.objects.filter(failed=False)
+    ready = queued.filter(run_at__lte=now)
+    oldest = ready.aggregate(oldest=Min('run_at'))['oldest']
+    return {
+        'queued': queued.count(),
+        'ready': ready.count(),
+        'failed': Task.objects.filter(failed=True).count(),
+        'lag_seconds': (now - oldest).total_seconds() if oldest else 0.0,
+    }
+
+
+class Worker:
+    """Берет пачки задач и выполняет их в пуле.
+
+    `threads` <= 1 и `processes` = 0 — задачи выполняются в потоке
+    воркера.
+    """
+
+    def __init__(self, batch_size=100, threads=1, processes=0,
+                 poll_interval=None, lease=None):
+        self.batch_size = batch_size
+        self.threads = threads
+        self.processes = processes
+        self.poll_interval = (poll_interval if poll_interval is not None
+                              else setting('TASKS_POLL_INTERVAL', 1))
+        self.lease = lease if lease is not None else setting('TASKS_LEASE',
+                                                             300)
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.done = 0
+        self.failed = 0
+        self.pool = None
+
+    def start_pool(self):
+        if self.processes:
+            # дочерние процессы не должны делить соединения родителя
+            connections.close_all()
+            self.pool = ProcessPoolExecutor(self.processes,
+                                            mp_context=get_context('fork'))
+        elif self.threads > 1:
+            self.pool = ThreadPoolExecutor(self.threads,
+                                           thread_name_prefix='tasks')
+
+    def claim(self):
+        """Берет до `batch_size` готовых задач; на базах с SKIP LOCKED
+        воркеры не ждут друг друга, на SQLite запись и так одна."""
+        now = timezone.now()
+        token = uuid.uuid4().hex
+        with transaction.atomic():
+            ready = Task.objects.filter(failed=False, run_at__lte=now)
+            if connection.features.has_select_for_update_skip_locked:
+                ready = ready.select_for_update(skip_locked=True)
+            ids = list(ready.order_by('run_at', 'pk').values_list(
+                'pk', flat=True)[:self.batch_size])
+            if not ids:
+                return []
+            # условие повторяется: задачу мог взять другой воркер
+            Task.objects.filter(
+                pk__in=ids, failed=False, run_at__lte=now,
+            ).update(run_at=now + timedelta(seconds=self.lease), lock=token,
+                     attempts=F('attempts') + 1)
+            return list(Task.objects.filter(pk__in=ids, lock=token).order_by(
+                'name', 'pk'))
+
+    def run_once(self):
+        """Одна пачка задач; возвращает число взятых задач."""
+        tasks = self.claim()
+        if not tasks:
+            return 0
+        groups = []
+        for name, items in groupby(tasks, key=lambda item: item.name):
+            items = list(items)
+            if name not in _tasks:
+                for item in items:
+                    self.retry(item, 'Неизвестная задача %s' % name)
+                continue
+            groups.append((name, [(item.pk, json.loads(item.payload))
+                                  for item in items]))
+        if self.pool is None:
+            results = [execute(name, items) for name, items in groups]
+        elif groups:
+            results = list(self.pool.map(_execute_pooled, *zip(*groups)))
+        else:
+            results = []
+        by_pk = {item.pk: item for item in tasks}
+        done = [pk for ids, errors in results for pk in ids]
+        Task.objects.filter(pk__in=done, lock=tasks[0].lock).delete()
+        for ids, errors in results:
+            for pk, error in errors:
+                self.retry(by_pk[pk], error)
+        self.done += len(done)
+        self.failed += len(tasks) - len(done)
+        return len(tasks)
+
+    def retry(self, item, error):
+        task_type = _tasks.get(item.name)
+        retries = task_type.retries if task_type else 0
+        changes = {'lock': '', 'last_error': error}
+        if item.attempts > retries:
+            changes['failed'] = True
+        else:
+            changes['run_at'] = timezone.now() + timedelta(
+                seconds=min(2 ** item.attempts, MAX_BACKOFF))
+        Task.objects.filter(pk=item.pk, lock=item.lock).update(**changes)
+
+    def run(self):
+        self.start_pool()
+        try:
+            while not self.stopping.is_set():
+                try:
+                    claimed = self.run_once()
+                except Exception:
+                    logger.exception('Ошибка воркера задач')
+                    claimed = 0
+                if claimed < self.batch_size:
+                    self.wakeup.wait(self.poll_interval)
+                    self.wakeup.clear()
+        finally:
+            if self.pool is not None:
+                self.pool.shutdown()
+            close_old_connections()
+
+    def stop(self):
+        self.stopping.set()
+        self.wakeup.set()
@@ -0,0 +1,19 @@
+from django import template
+
+from core import pagecache
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def pagehole(context, name, **kwargs):
+    """{% pagehole 'header' %}, {% pagehole 'comment_form' post_id=post.pk %}
+
+    При рендере страницы для общего кэша оставляет метку, которую
+    `core.pagecache` заполнит для каждого запроса; иначе сразу выводит
+    содержимое дырки.
+    """
+    request = context['request']
+    if getattr(request, 'page_holes', False):
+        return pagecache.marker(name, kwargs)
+    return pagecache.render_hole(name, request, kwargs)
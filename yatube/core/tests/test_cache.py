@@ -0,0 +1,76 @@
+import os
+import tempfile
+import time
+
+from django.test import SimpleTestCase
+
+from ..cache import SQLiteCache
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'cache.sqlite3')
+
+    def backend(self, **options):
+        return SQLiteCache(self.path, {'OPTIONS': options})
+
+    def test_basic_operations(self):
+        """set/get/add/incr/delete и истечение срока"""
+        cache = self.backend()
+        cache.set('page', {'html': '<p>Пост</p>'})
+        self.assertEqual(cache.get('page'), {'html': '<p>Пост</p>'})
+        self.assertFalse(cache.add('page', 'другое'))
+        self.assertTrue(cache.add('counter', 1))
+        self.assertEqual(cache.incr('counter', 5), 6)
+        with self.assertRaises(ValueError):
+            cache.incr('missing')
+        cache.set('short', 1, 0.01)
+        time.sleep(0.02)
+        self.assertIsNone(cache.get('short'))
+        cache.delete('page')
+        self.assertIsNone(cache.get('page'))
+
+    def test_shared_between_instances(self):
+        """Запись одного процесса видна другому"""
+        self.backend().set('key', 'value')
+        self.assertEqual(self.backend().get('key'), 'value')
+
+    def test_lru_eviction(self):
+        """Вытесняются давно не читанные записи, свежая остается"""
+        cache = self.backend(MAX_ENTRIES=10, CULL_EVERY=1,
+                             ACCESS_RESOLUTION=0)
+        cache.set('hot', 'value')
+        for number in range(20):
+            cache.set('key%d' % number, number)
+            cache.get('hot')
+        self.assertEqual(cache.get('hot'), 'value')
+        self.assertIsNone(cache.get('key0'))
+        count, = cache.connection.execute(
+            'SELECT count(*) FROM cache').fetchone()
+        self.assertLessEqual(count, 10)
+
+    def test_size_cap(self):
+        """Суммарный размер значений не превышает MAX_SIZE"""
+        cache = self.backend(MAX_SIZE=10000, CULL_EVERY=1)
+        for number in range(20):
+            cache.set('key%d' % number, 'x' * 1000)
+        size, = cache.connection.execute(
+            'SELECT total(size) FROM cache').fetchone()
+        self.assertLessEqual(size, 10000)
+
+    def test_local_tier_invalidated(self):
+        """Значение в памяти процесса сбрасывается записью другого"""
+        writer = self.backend(LOCAL_ENTRIES=100)
+        reader = self.backend(LOCAL_ENTRIES=100)
+        writer.set('generation', 1)
+        self.assertEqual(reader.get('generation'), 1)
+        writer.incr('generation')
+        self.assertEqual(reader.get('generation'), 2)
+        writer.delete('generation')
+        self.assertIsNone(reader.get('generation'))
+        reader.set('page', 'old')
+        self.assertEqual(reader.get('page'), 'old')
+        writer.clear()
+        self.assertIsNone(reader.get('page'))
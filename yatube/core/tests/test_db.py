@@ -0,0 +1,112 @@
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.http import HttpResponse
+from django.test import (Client, RequestFactory, SimpleTestCase, TestCase,
+                         override_settings)
+from django.urls import reverse
+
+from posts.models import Comment, Post
+
+from ..db import PIN_COOKIE, ReplicaMiddleware, ReplicaRouter
+from ..groupcommit import GroupCommit, Pending
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRouterTest(TestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def run_request(self, request, write=False):
+        """Пропускает запрос через middleware и возвращает базы,
+        выбранные для чтения до и после записи."""
+        chosen = []
+
+        def view(request):
+            chosen.append(self.router.db_for_read(Post))
+            if write:
+                self.router.db_for_write(Post)
+            chosen.append(self.router.db_for_read(Post))
+            return HttpResponse()
+
+        response = ReplicaMiddleware(view)(request)
+        return chosen, response
+
+    def test_get_reads_from_replica(self):
+        """GET без записи читает с реплики и не ставит cookie"""
+        chosen, response = self.run_request(self.factory.get('/'))
+        self.assertEqual(chosen, ['replica1', 'replica1'])
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_write_pins_request_to_primary(self):
+        """После записи запрос читает с основной базы и ставит cookie"""
+        chosen, response = self.run_request(self.factory.get('/'), write=True)
+        self.assertEqual(chosen, ['replica1', 'default'])
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+    def test_pinned_and_unsafe_requests_read_primary(self):
+        """Cookie привязки и POST читают с основной базы"""
+        pinned = self.factory.get('/')
+        pinned.COOKIES[PIN_COOKIE] = '1'
+        for request in (pinned, self.factory.post('/')):
+            chosen, _ = self.run_request(request)
+            self.assertEqual(chosen, ['default', 'default'])
+
+    def test_outside_request_reads_primary(self):
+        """Вне запроса чтение идет в основную базу"""
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_add_comment_sets_pin_cookie(self):
+        """Комментарий привязывает пользователя к основной базе"""
+        user = User.objects.create_user(username='reader')
+        post = Post.objects.create(author=user, text='Текст поста')
+        client = Client()
+        client.force_login(user)
+        response = client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+            {'text': 'Комментарий'},
+        )
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+    @override_settings(COMMENT_WRITE_BATCHING=True)
+    def test_batched_comment_sets_pin_cookie(self):
+        """Комментарий пишет ведущий поток группы, но cookie получает
+        запрос, который его сохранял"""
+        self.test_add_comment_sets_pin_cookie()
+        self.assertEqual(Comment.objects.count(), 1)
+
+
+class GroupCommitTest(TestCase):
+    def test_failed_object_does_not_roll_back_batch(self):
+        """Ошибка одного объекта не откатывает остальные в группе"""
+        user = User.objects.create_user(username='writer')
+        post = Post.objects.create(author=user, text='Текст поста')
+        good = Pending(Comment(post=post, author=user, text='Комментарий'))
+        bad = Pending(Comment(post=post, author=user, text=None))
+        GroupCommit().write([bad, good])
+        self.assertIsNotNone(bad.error)
+        self.assertIsNone(good.error)
+        self.assertTrue(Comment.objects.filter(pk=good.obj.pk).exists())
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+
+class SQLitePragmaTest(SimpleTestCase):
+    def test_file_connection_is_tuned(self):
+        """Новое соединение с файлом получает PRAGMA из настроек"""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_dict = dict(connections['default'].settings_dict,
+                             NAME=os.path.join(directory.name, 'db.sqlite3'))
+        tuned = type(connections['default'])(settings_dict, alias='tuned')
+        self.addCleanup(tuned.close)
+        with tuned.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 10000)
@@ -0,0 +1,97 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+
+from ..metrics import (Histogram, Recorder, TimedTemplate, recording,
+                       registry)
+
+User = get_user_model()
+
+
+class MetricsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        registry.clear()
+
+    def view_metrics(self, view):
+        return registry.snapshot()['views'][view]
+
+    def test_index_recorded(self):
+        """Время, запросы, шаблоны и кэш главной попадают в метрики"""
+        client = Client()
+        client.get(reverse('posts:index'))
+        client.get(reverse('posts:index'))
+        metrics = self.view_metrics('posts:index')
+        self.assertEqual(metrics['total_ms']['count'], 2)
+        self.assertGreaterEqual(metrics['queries']['max'], 1)
+        self.assertGreater(metrics['template_ms']['max'], 0)
+        # первый запрос не находит ни страницу, ни фрагмент ленты,
+        # второй отдает страницу целиком
+        self.assertEqual(metrics['cache_misses']['mean'], 1)
+        self.assertEqual(metrics['cache_hits']['mean'], 0.5)
+
+    @override_settings(METRICS_SQL_SAMPLE_RATE=1)
+    def test_sql_trace_sampled(self):
+        """При выборке 1 запрос сохраняет SQL-трассу"""
+        Client().get(reverse('posts:index'))
+        trace = registry.snapshot()['sql_traces'][-1]
+        self.assertEqual(trace['view'], 'posts:index')
+        self.assertIn('posts_post', trace['sql'][0]['sql'])
+
+    def test_report_only_for_staff(self):
+        """Отчет метрик доступен только персоналу"""
+        client = Client()
+        response = client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 302)
+        client.force_login(User.objects.create_user(username='staff',
+                                                    is_staff=True))
+        response = client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('views', response.json())
+
+    def test_streaming_recorded_on_close(self):
+        """Время и SQL ленты учитываются, когда тело ответа дочитано"""
+        user = User.objects.create_user(username='author')
+        Post.objects.create(author=user, text='Пост')
+        url = reverse('posts:index_feed', args=['atom'])
+        response = Client().get(url)
+        self.assertNotIn('posts:index_feed', registry.snapshot()['views'])
+        started = time.perf_counter()
+        b''.join(response.streaming_content)
+        elapsed = (time.perf_counter() - started) * 1000
+        metrics = self.view_metrics('posts:index_feed')
+        self.assertEqual(metrics['total_ms']['count'], 1)
+        self.assertGreaterEqual(metrics['total_ms']['max'], elapsed)
+        self.assertGreaterEqual(metrics['queries']['max'], 1)
+
+    def test_nested_render_counted_once(self):
+        """Вложенный render() не удваивает время шаблонов"""
+        class Slow:
+            def __init__(self, inner=None):
+                self.inner = inner
+
+            def render(self, context=None, request=None):
+                time.sleep(0.02)
+                if self.inner is not None:
+                    self.inner.render()
+                return ''
+
+        recorder = Recorder()
+        with recording(recorder):
+            TimedTemplate(Slow(TimedTemplate(Slow()))).render()
+        self.assertLess(recorder.template, 0.055)
+        self.assertGreaterEqual(recorder.template, 0.04)
+
+    def test_histogram_percentiles(self):
+        """Перцентили гистограммы по границам корзин"""
+        histogram = Histogram()
+        for value in [0.5] * 90 + [40] * 9 + [9000]:
+            histogram.add(value)
+        self.assertEqual(histogram.percentile(0.5), 1)
+        self.assertEqual(histogram.percentile(0.95), 50)
+        self.assertEqual(histogram.percentile(1), 9000)
@@ -0,0 +1,30 @@
+import copy
+
+from django.conf import settings
+from django.template import engines
+from django.test import SimpleTestCase, override_settings
+
+from ..precompile import precompile
+
+CACHED = copy.deepcopy(settings.TEMPLATES)
+CACHED[0]['OPTIONS']['loaders'] = [
+    ('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]),
+]
+
+
+class PrecompileTest(SimpleTestCase):
+    @override_settings(TEMPLATES=CACHED)
+    def test_templates_are_cached_at_startup(self):
+        """Все шаблоны сайта лежат в cached.Loader до первого запроса"""
+        self.assertGreater(precompile(), 0)
+        loader = engines.all()[0].engine.template_loaders[0]
+        self.assertIn('posts/index.html', loader.get_template_cache)
+        self.assertIn('posts/includes/paginator.html',
+                      loader.get_template_cache)
+
+    def test_without_cached_loader(self):
+        """Без cached.Loader компилировать некуда"""
+        self.assertEqual(precompile(), 0)
@@ -0,0 +1,87 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import (RequestFactory, SimpleTestCase, TestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Post
+
+from .. import ratelimit
+
+User = get_user_model()
+
+LIMITS = {'test': {'user': '2/m', 'ip': '3/m'}}
+COMMENT_LIMITS = {'posts.comment': {'user': '2/m'}}
+
+
+@override_settings(RATE_LIMITS=LIMITS)
+class RateLimitTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.now = 1000000
+
+    def request(self, user_id=None, ip='10.0.0.1'):
+        request = RequestFactory().post('/', REMOTE_ADDR=ip)
+        request.session = {}
+        if user_id is not None:
+            request.session['_auth_user_id'] = str(user_id)
+        return request
+
+    def check(self, request):
+        with mock.patch.object(ratelimit, '_now_ms', lambda: self.now):
+            return ratelimit.check(request, 'test')
+
+    def test_bucket_refills(self):
+        """Запас ведра тратится и восстанавливается со временем"""
+        request = self.request(user_id=1)
+        self.assertEqual(self.check(request), 0)
+        self.assertEqual(self.check(request), 0)
+        self.assertEqual(self.check(request), 30)
+        self.now += 30000
+        self.assertEqual(self.check(request), 0)
+        self.assertEqual(self.check(request), 30)
+
+    def test_user_and_ip_buckets(self):
+        """Пользователи делят ведро IP; отказ не тратит их токены"""
+        first, second = self.request(user_id=1), self.request(user_id=2)
+        self.assertEqual(self.check(first), 0)
+        self.assertEqual(self.check(first), 0)
+        self.assertEqual(self.check(second), 0)
+        self.assertGreater(self.check(second), 0)
+        self.assertEqual(self.check(self.request(user_id=3,
+                                                 ip='10.0.0.2')), 0)
+        self.now += 20000
+        self.assertEqual(self.check(second), 0)
+
+    def test_request_without_session(self):
+        """Запрос без сессии лимитируется только по IP"""
+        request = RequestFactory().post('/', REMOTE_ADDR='10.0.0.3')
+        for i in range(3):
+            self.assertEqual(self.check(request), 0)
+        self.assertGreater(self.check(request), 0)
+
+
+@override_settings(RATE_LIMITS=COMMENT_LIMITS)
+class CommentRateLimitTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='spammer')
+        self.post = Post.objects.create(author=self.user, text='Пост')
+        self.client.force_login(self.user)
+
+    def test_comment_throttled_before_database(self):
+        """429 отдается без формы и без запросов к таблицам постов"""
+        url = reverse('posts:add_comment', args=[self.post.pk])
+        for i in range(2):
+            self.client.post(url, {'text': 'Спам'})
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.post(url, {'text': 'Спам'})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertFalse([query for query in captured
+                          if 'posts_' in query['sql']])
+        self.assertEqual(Comment.objects.count(), 2)
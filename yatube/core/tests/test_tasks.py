@@ -0,0 +1,77 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+
+from posts import search
+from posts.models import Post
+
+from .. import tasks
+from ..models import Task
+
+User = get_user_model()
+
+calls = []
+
+
+@tasks.task('tests.collect', batch=True)
+def collect(items):
+    calls.append(sorted(item['number'] for item in items))
+
+
+@tasks.task('tests.fail', retries=1)
+def fail():
+    raise RuntimeError('не вышло')
+
+
+class TasksTest(TestCase):
+    def setUp(self):
+        calls.clear()
+        self.worker = tasks.Worker(batch_size=10)
+
+    def test_batch_runs_once_and_is_deleted(self):
+        """Пачка задач выполняется одним вызовом и удаляется"""
+        for number in range(3):
+            tasks.enqueue('tests.collect', number=number)
+        self.assertEqual(tasks.stats()['ready'], 3)
+        self.assertEqual(self.worker.run_once(), 3)
+        self.assertEqual(calls, [[0, 1, 2]])
+        self.assertFalse(Task.objects.exists())
+
+    def test_failed_task_retried_then_kept(self):
+        """Упавшая задача повторяется, затем остается помеченной"""
+        tasks.enqueue('tests.fail')
+        with self.assertLogs('core.tasks', 'ERROR'):
+            self.worker.run_once()
+        task = Task.objects.get()
+        self.assertFalse(task.failed)
+        self.assertGreater(task.run_at, timezone.now())
+        self.assertIn('не вышло', task.last_error)
+        Task.objects.update(run_at=timezone.now())
+        with self.assertLogs('core.tasks', 'ERROR'):
+            self.worker.run_once()
+        self.assertTrue(Task.objects.get().failed)
+        self.assertEqual(tasks.stats()['failed'], 1)
+
+    def test_expired_lease_is_taken_again(self):
+        """Задачу с истекшей арендой забирает другой воркер"""
+        tasks.enqueue('tests.collect', number=1)
+        Task.objects.update(run_at=timezone.now() - timedelta(minutes=1),
+                            lock='crashed')
+        self.assertGreater(tasks.stats()['lag_seconds'], 59)
+        self.worker.run_once()
+        self.assertEqual(calls, [[1]])
+
+    def test_post_side_effects_run_by_worker(self):
+        """Пост сразу в базе, а в поиске — после задачи воркера"""
+        user = User.objects.create_user(username='writer')
+        post = Post.objects.create(author=user, text='Очередь задач')
+        self.assertFalse(self.found('очередь'))
+        self.assertTrue(Task.objects.filter(name='posts.index').exists())
+        self.worker.run_once()
+        self.assertEqual(self.found('очередь'), [post.pk])
+
+    def found(self, query):
+        return list(Post.objects.filter(
+            pk__in=search.matching_ids(query)).values_list('pk', flat=True))
@@ -1,5 +1,16 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
 from django.shortcuts import render
 
+from . import metrics, tasks
+
 
 def page_not_found(request, exception):
-    return render(request, 'core/404.html', {'path': request.path}, status=404)
\ No newline at end of file
+    return render(request, 'core/404.html', {'path': request.path}, status=404)
+
+
+@staff_member_required
+def metrics_report(request):
+    report = metrics.registry.snapshot()
+    report['tasks'] = tasks.stats()
+    return JsonResponse(report, json_dumps_params={'ensure_ascii': False})
@@ -1,15 +1,28 @@
 from django.contrib import admin
+from . import search
+from .forms import PostAdminForm
 from .models import Post
-from .models import Group
+from .models import Follow, Group
 
 
 class PostAdmin(admin.ModelAdmin):
+    form = PostAdminForm
     list_display = ('pk', 'text', 'pub_date', 'author', 'group')
     list_editable = ('group',)
     search_fields = ('text',)
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # вместо LIKE '%...%' по всей таблице — поиск по индексу FTS5
+        if not search_term or not search.available():
+            return super().get_search_results(request, queryset,
+                                              search_term)
+        if not search.match_expression(search_term):
+            # одна пунктуация: пустой MATCH — синтаксическая ошибка FTS5
+            return queryset.none(), False
+        return queryset.filter(pk__in=search.matching_ids(search_term)), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ('title', 'description', 'slug')
@@ -19,5 +32,11 @@ class GroupAdmin(admin.ModelAdmin):
     prepopulated_fields = {"slug": ("title",)}
 
 
+class FollowAdmin(admin.ModelAdmin):
+    list_display = ('user', 'author')
+    raw_id_fields = ('user', 'author')
+
+
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group, GroupAdmin)
+admin.site.register(Follow, FollowAdmin)
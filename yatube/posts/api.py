@@ -0,0 +1,333 @@
+"""JSON API постов, групп и комментариев для мобильных клиентов.
+
+Повторяет `posts.views`: ленты (общая, группы, автора), пост,
+создание, редактирование и комментарии. Ответ собирается из строк
+`.values()` одним запросом с JOIN автора и группы, без объектов
+моделей. Списки листаются курсором (`?cursor=` из `next`/`previous`),
+`?fields=id,text` оставляет только нужные поля, `?ids=1,2,3` отдает
+несколько постов одним запросом.
+
+Запись идет от пользователя сессии и, как формы сайта, требует
+CSRF-токен и подчиняется тем же лимитам `RATE_LIMITS`.
+"""
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.http import Http404, JsonResponse, QueryDict
+from django.shortcuts import get_object_or_404
+
+from core import ratelimit
+
+from . import cache
+from .forms import CommentForm, PostForm
+from .models import Comment, Group, Post
+from .paginator import CursorPaginator
+from .writes import save_comment
+
+User = get_user_model()
+
+API_PAGE_SIZE = getattr(settings, 'API_PAGE_SIZE', 20)
+API_MAX_PAGE_SIZE = getattr(settings, 'API_MAX_PAGE_SIZE', 100)
+API_MAX_IDS = 100
+
+# публичное имя поля -> поле для .values()
+POST_FIELDS = {
+    'id': 'pk',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'updated': 'updated',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'thumbnail': 'thumbnail_url',
+    'comments_count': 'comments_count',
+}
+COMMENT_FIELDS = {
+    'id': 'pk',
+    'post': 'post_id',
+    'author': 'author__username',
+    'text': 'text',
+    'created': 'created',
+}
+GROUP_FIELDS = {
+    'slug': 'slug',
+    'title': 'title',
+    'description': 'description',
+    'posts_count': 'posts_count',
+}
+POST_ORDERING = ('-pub_date', '-pk')
+COMMENT_ORDERING = ('created', 'pk')
+GROUP_ORDERING = ('title', 'pk')
+
+
+class ApiError(Exception):
+    def __init__(self, status, detail, **extra):
+        super().__init__(detail)
+        self.status = status
+        self.body = dict(detail=detail, **extra)
+
+
+def api_view(*methods):
+    """Разрешает методы и превращает ошибки в JSON-ответы."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            try:
+                if request.method not in methods:
+                    raise ApiError(405, 'Метод не поддерживается')
+                return view(request, *args, **kwargs)
+            except Http404:
+                return error(404, 'Не найдено')
+            except ApiError as exc:
+                response = error(exc.status, exc.body)
+                if 'retry_after' in exc.body:
+                    response['Retry-After'] = str(exc.body['retry_after'])
+                return response
+        return wrapper
+    return decorator
+
+
+def error(status, body):
+    if isinstance(body, str):
+        body = {'detail': body}
+    return respond(body, status)
+
+
+def respond(data, status=200):
+    return JsonResponse(data, status=status,
+                        json_dumps_params={'ensure_ascii': False})
+
+
+def requested_fields(request, available):
+    raw = request.GET.get('fields')
+    if not raw:
+        return list(available)
+    names = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise ApiError(400, 'Неизвестные поля', fields=unknown)
+    return names
+
+
+def page_size(request):
+    try:
+        size = int(request.GET.get('limit', API_PAGE_SIZE))
+    except ValueError:
+        raise ApiError(400, 'limit должен быть числом')
+    return max(1, min(size, API_MAX_PAGE_SIZE))
+
+
+def convert(column, value):
+    if column == 'image':
+        return default_storage.url(value) if value else None
+    if column == 'thumbnail_url':
+        # миниатюра еще не готова
+        return value or None
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+class Serializer:
+    """Строки `.values()` -> словари с выбранными публичными полями."""
+
+    def __init__(self, request, available, ordering=()):
+        names = requested_fields(request, available)
+        self.fields = [(name, available[name]) for name in names]
+        columns = [column for name, column in self.fields]
+        for name in ordering:
+            if name.lstrip('-') not in columns:
+                columns.append(name.lstrip('-'))
+        self.columns = columns
+
+    def rows(self, queryset):
+        return queryset.values(*self.columns)
+
+    def __call__(self, row):
+        return {name: convert(column, row[column])
+                for name, column in self.fields}
+
+
+def page(request, queryset, available, ordering):
+    serializer = Serializer(request, available, ordering)
+    paginator = CursorPaginator(serializer.rows(queryset), page_size(request),
+                                ordering=ordering)
+    cursor = request.GET.get('cursor')
+    if cursor and paginator.decode_cursor(cursor) is None:
+        raise ApiError(400, 'Неверный курсор')
+    current = paginator.get_page(cursor=cursor)
+    return respond({
+        'results': [serializer(row) for row in current],
+        'next': current.next_cursor,
+        'previous': current.previous_cursor,
+    })
+
+
+def detail(request, queryset, available):
+    serializer = Serializer(request, available)
+    row = serializer.rows(queryset).first()
+    if row is None:
+        raise Http404
+    return respond(serializer(row))
+
+
+def payload(request):
+    """Данные запроса: JSON-объект или поля формы. Django разбирает
+    форму только у POST, поэтому тело PATCH в urlencoded читается
+    здесь, а multipart с файлом принимается только в POST."""
+    if request.content_type != 'application/json':
+        if request.method == 'POST':
+            return request.POST.dict()
+        if request.content_type == 'application/x-www-form-urlencoded':
+            return QueryDict(request.body,
+                             encoding=request.encoding).dict()
+        raise ApiError(415, 'Ожидается JSON или форма urlencoded')
+    try:
+        data = json.loads(request.body.decode() or '{}')
+    except (UnicodeDecodeError, ValueError):
+        raise ApiError(400, 'Тело запроса — не JSON')
+    if not isinstance(data, dict):
+        raise ApiError(400, 'Ожидается JSON-объект')
+    return data
+
+
+def post_data(request, post=None):
+    """Поля формы поста; группа передается slug, как в ответах. При
+    правке недостающие поля берутся из поста."""
+    data = {}
+    if post is not None:
+        data = {'text': post.text, 'group': post.group_id}
+    sent = payload(request)
+    data.update((name, sent[name]) for name in ('text', 'group')
+                if name in sent)
+    if 'group' in sent:
+        slug = sent['group']
+        data['group'] = slug and cache.object_id(Group, 'slug', slug)
+        if slug and data['group'] is None:
+            raise ApiError(400, 'Неверные данные', errors={
+                'group': [{'message': 'Группа не найдена',
+                           'code': 'invalid_choice'}]})
+    return data
+
+
+def throttle(request, name):
+    retry_after = ratelimit.check(request, name)
+    if retry_after:
+        raise ApiError(429, 'Слишком много запросов',
+                       retry_after=retry_after)
+
+
+def authenticated(request):
+    if not request.user.is_authenticated:
+        raise ApiError(401, 'Нужна авторизация')
+
+
+def invalid(form):
+    return ApiError(400, 'Неверные данные', errors=form.errors.get_json_data())
+
+
+def post_queryset(request):
+    queryset = Post.objects.all()
+    group = request.GET.get('group')
+    if group:
+        group_id = cache.object_id(Group, 'slug', group)
+        if group_id is None:
+            raise Http404
+        queryset = queryset.filter(group_id=group_id)
+    author = request.GET.get('author')
+    if author:
+        author_id = cache.object_id(User, 'username', author)
+        if author_id is None:
+            raise Http404
+        queryset = queryset.filter(author_id=author_id)
+    return queryset
+
+
+def batch(request, raw):
+    try:
+        ids = [int(value) for value in raw.split(',') if value.strip()]
+    except ValueError:
+        ids = None
+    # больше 64 бит драйвер SQLite не передаст: OverflowError
+    if ids is None or any(not 0 < pk < 2 ** 63 for pk in ids):
+        raise ApiError(400, 'ids — список чисел через запятую')
+    if len(ids) > API_MAX_IDS:
+        raise ApiError(400, 'Не больше %d ids за запрос' % API_MAX_IDS)
+    serializer = Serializer(request, POST_FIELDS, ('pk',))
+    rows = {row['pk']: row
+            for row in serializer.rows(Post.objects.filter(pk__in=ids))}
+    return respond({
+        'results': [serializer(rows[pk]) for pk in ids if pk in rows],
+    })
+
+
+@api_view('GET', 'POST')
+def posts(request):
+    if request.method == 'POST':
+        throttle(request, 'posts.create')
+        authenticated(request)
+        form = PostForm(post_data(request), request.FILES or None)
+        if not form.is_valid():
+            raise invalid(form)
+        post = form.save(commit=False)
+        post.author = request.user
+        post.save()
+        response = detail(request, Post.objects.filter(pk=post.pk),
+                          POST_FIELDS)
+        response.status_code = 201
+        return response
+    if request.GET.get('ids'):
+        return batch(request, request.GET['ids'])
+    return page(request, post_queryset(request), POST_FIELDS, POST_ORDERING)
+
+
+@api_view('GET', 'PATCH', 'POST')
+def post(request, post_id):
+    if request.method == 'GET':
+        return detail(request, Post.objects.filter(pk=post_id), POST_FIELDS)
+    authenticated(request)
+    instance = get_object_or_404(Post, pk=post_id)
+    if instance.author_id != request.user.pk:
+        raise ApiError(403, 'Править пост может только автор')
+    form = PostForm(post_data(request, instance), request.FILES or None,
+                    instance=instance)
+    if not form.is_valid():
+        raise invalid(form)
+    form.save()
+    return detail(request, Post.objects.filter(pk=post_id), POST_FIELDS)
+
+
+@api_view('GET', 'POST')
+def comments(request, post_id):
+    if request.method == 'POST':
+        throttle(request, 'posts.comment')
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    if request.method == 'POST':
+        authenticated(request)
+        form = CommentForm(payload(request))
+        if not form.is_valid():
+            raise invalid(form)
+        comment = form.save(commit=False)
+        comment.author = request.user
+        comment.post_id = post_id
+        save_comment(comment)
+        response = detail(request, Comment.objects.filter(pk=comment.pk),
+                          COMMENT_FIELDS)
+        response.status_code = 201
+        return response
+    return page(request, Comment.objects.filter(post_id=post_id),
+                COMMENT_FIELDS, COMMENT_ORDERING)
+
+
+@api_view('GET')
+def groups(request):
+    return page(request, Group.objects.all(), GROUP_FIELDS, GROUP_ORDERING)
+
+
+@api_view('GET')
+def group(request, slug):
+    return detail(request, Group.objects.filter(slug=slug), GROUP_FIELDS)
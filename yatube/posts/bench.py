@@ -0,0 +1,98 @@
+"""Общие помощники для команд-бенчмарков: временная база, наполнение
+и перцентили."""
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .models import Comment, Group, Post
+from .transfer import batches, explicit_dates
+
+User = get_user_model()
+
+
+@contextmanager
+def bench_database(path=None):
+    """Временная база с примененными миграциями, как у тестов.
+
+    `path` — файл вместо базы в памяти: с ним могут работать несколько
+    потоков и процессов.
+    """
+    old_name = connection.settings_dict['NAME']
+    test_settings = connection.settings_dict['TEST']
+    old_test_name = test_settings.get('NAME')
+    if path:
+        test_settings['NAME'] = path
+    connection.creation.create_test_db(verbosity=0, autoclobber=True,
+                                       serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        test_settings['NAME'] = old_test_name
+
+
+def seed(users=100, groups=20, posts=1000, comments=0, batch_size=5000,
+         seed_value=0):
+    """Наполняет базу пачками bulk_create; посты разнесены по времени
+    на минуту друг от друга, треть без группы."""
+    rnd = random.Random(seed_value)
+    User.objects.bulk_create(
+        User(username='bench%d' % i) for i in range(users))
+    Group.objects.bulk_create(
+        Group(title='Группа %d' % i, slug='bench-%d' % i, description='')
+        for i in range(groups))
+    user_ids = list(User.objects.values_list('pk', flat=True))
+    group_ids = list(Group.objects.values_list('pk', flat=True)) + [None] * (
+        groups // 2)
+    start = timezone.now() - timedelta(minutes=posts)
+    post_rows = (
+        Post(text='Пост номер %d' % i, author_id=rnd.choice(user_ids),
+             group_id=rnd.choice(group_ids),
+             pub_date=start + timedelta(minutes=i))
+        for i in range(posts)
+    )
+    with explicit_dates(Post._meta.get_field('pub_date'),
+                        Comment._meta.get_field('created')):
+        for batch in batches(post_rows, batch_size):
+            Post.objects.bulk_create(batch)
+        if comments:
+            bounds = Post.objects.aggregate(first=Min('pk'), last=Max('pk'))
+            comment_rows = (
+                Comment(text='Комментарий %d' % i,
+                        author_id=rnd.choice(user_ids),
+                        post_id=rnd.randint(bounds['first'], bounds['last']),
+                        created=start + timedelta(seconds=i))
+                for i in range(comments)
+            )
+            for batch in batches(comment_rows, batch_size):
+                Comment.objects.bulk_create(batch)
+
+
+def measure(func, repeat=20):
+    """Запускает func repeat раз и возвращает p50/p95/max в миллисекундах."""
+    timings = []
+    for i in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return summarize(timings)
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    index = min(int(round(share * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def summarize(timings):
+    return {
+        'p50_ms': round(percentile(timings, 0.5), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'max_ms': round(max(timings), 3),
+    }
@@ -0,0 +1,149 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from core import metrics
+
+FEED_CACHE_TIMEOUT = getattr(settings, 'FEED_CACHE_TIMEOUT', 60 * 5)
+# поколение и id по slug в кэше процесса не сбросить из другого
+# воркера: они истекают вместе со страницами
+KEY_TIMEOUT = (None if getattr(settings, 'FEED_CACHE_SHARED', False)
+               else FEED_CACHE_TIMEOUT)
+STATS_KEYS = ('hits', 'misses')
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+def generation(scope):
+    """Поколение ленты `scope` ('index', 'group:1', 'profile:1', 'post:1',
+    'trending', 'trending:1', 'groups').
+
+    Если счетчик вытеснен из кэша, новое значение берется из часов,
+    чтобы оно было больше любого уже выданного и старые страницы
+    не ожили.
+    """
+    key = 'feed:gen:%s' % scope
+    value = cache.get(key)
+    if value is None:
+        cache.add(key, _now_ms(), KEY_TIMEOUT)
+        value = cache.get(key)
+    return value
+
+
+def bump(*scopes):
+    """Сдвигает поколения лент. Внутри транзакции записи — еще раз после
+    коммита: страница, которую параллельный запрос успел отрисовать по
+    новому поколению, но из незакоммиченных строк, тоже устареет."""
+    _bump(scopes)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _bump(scopes))
+
+
+def _bump(scopes):
+    for scope in scopes:
+        key = 'feed:gen:%s' % scope
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _now_ms(), KEY_TIMEOUT)
+
+
+def post_scopes(post):
+    """Ленты, в которых виден пост, включая группу до переноса."""
+    scopes = {'index', 'trending', 'profile:%s' % post.author_id,
+              'post:%s' % post.pk}
+    for group_id in (post.group_id, post.loaded_group_id):
+        if group_id is not None:
+            scopes.add('group:%s' % group_id)
+            scopes.add('trending:%s' % group_id)
+            # каталог групп: число постов, последний пост и активность
+            scopes.add('groups')
+    return scopes
+
+
+def _position(request):
+    return request.GET.get('cursor') or request.GET.get('page') or ''
+
+
+def feed_key(scope, request):
+    """Ключ страницы ленты: (лента, группа/автор, курсор, поколение)."""
+    digest = hashlib.md5(_position(request).encode()).hexdigest()
+    return 'feed:page:%s:%s:%s' % (scope, generation(scope), digest)
+
+
+def feed_etag(scope, request):
+    """ETag страницы ленты без запросов к базе: поколение ленты, курсор
+    и пользователь (шапка и кнопки зависят от него)."""
+    raw = '%s:%s:%s:%s' % (scope, generation(scope), _position(request),
+                           request.user.pk)
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def page_key(scope, request):
+    """Ключ целой страницы для `core.pagecache.cached_page`."""
+    digest = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return 'feed:full:%s:%s:%s' % (scope, generation(scope), digest)
+
+
+def _id_key(model, value):
+    digest = hashlib.md5(str(value).encode()).hexdigest()
+    return 'feed:id:%s:%s' % (model._meta.label_lower, digest)
+
+
+def object_id(model, field, value):
+    """id объекта по slug/username без запроса к базе при попадании.
+
+    Отсутствующие объекты не кэшируются, чтобы созданные позже сразу
+    находились.
+    """
+    key = _id_key(model, value)
+    pk = cache.get(key)
+    if pk is None:
+        pk = model.objects.filter(**{field: value}).values_list(
+            'pk', flat=True).first()
+        if pk is not None:
+            cache.set(key, pk, KEY_TIMEOUT)
+    return pk
+
+
+def forget_id(model, value):
+    key = _id_key(model, value)
+    cache.delete(key)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: cache.delete(key))
+
+
+def _count(name):
+    key = 'feed:stats:%s' % name
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, None)
+
+
+def get_or_render(key, render):
+    value = cache.get(key)
+    if value is not None:
+        _count('hits')
+        metrics.count('cache_hits')
+        return value
+    _count('misses')
+    metrics.count('cache_misses')
+    value = render()
+    cache.set(key, value, FEED_CACHE_TIMEOUT)
+    return value
+
+
+def stats():
+    values = cache.get_many(['feed:stats:%s' % name for name in STATS_KEYS])
+    result = {
+        name: values.get('feed:stats:%s' % name, 0) for name in STATS_KEYS
+    }
+    total = result['hits'] + result['misses']
+    result['hit_rate'] = result['hits'] / total if total else 0.0
+    return result
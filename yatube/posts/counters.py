@@ -0,0 +1,95 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import AuthorStats, Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+def add(queryset, field, delta, **values):
+    """Атомарно сдвигает счетчик (и записывает `values` тем же UPDATE);
+    ниже нуля не уходит даже при дрейфе."""
+    if delta < 0:
+        queryset = queryset.filter(**{field + '__gte': -delta})
+    return queryset.update(**{field: F(field) + delta}, **values)
+
+
+def add_author(user_id, field, delta):
+    stats = AuthorStats.objects.filter(user_id=user_id)
+    if not add(stats, field, delta) and delta > 0:
+        AuthorStats.objects.get_or_create(user_id=user_id)
+        add(stats, field, delta)
+
+
+def add_group(group_id, delta):
+    if group_id is not None:
+        add(Group.objects.filter(pk=group_id), 'posts_count', delta)
+
+
+def touch_group(group_id, latest_post=None, moment=None):
+    """Обновляет сводку группы для каталога: последний пост заново
+    по индексу или переданный `latest_post` и время активности."""
+    if group_id is None:
+        return
+    values = {}
+    if latest_post is None:
+        values['latest_post'] = Subquery(
+            Post.objects.filter(group_id=group_id)
+            .order_by('-pub_date', '-pk').values('pk')[:1])
+    else:
+        values['latest_post'] = latest_post
+    if moment is not None:
+        values['last_activity'] = moment
+    Group.objects.filter(pk=group_id).update(**values)
+
+
+def touch_post_group(post_id, moment):
+    """Комментарий — тоже активность группы поста."""
+    Group.objects.filter(
+        pk=Subquery(Post.objects.filter(pk=post_id).values('group_id')),
+    ).update(last_activity=moment)
+
+
+def _group_summary():
+    latest = Post.objects.filter(group=OuterRef('pk')).order_by(
+        '-pub_date', '-pk')
+    last_comment = Subquery(
+        Comment.objects.filter(post__group=OuterRef('pk'))
+        .order_by('-created').values('created')[:1])
+    last_post = Subquery(latest.values('pub_date')[:1])
+    return {
+        'latest_post': Subquery(latest.values('pk')[:1]),
+        'last_activity': Coalesce(
+            Greatest(Coalesce(last_comment, last_post),
+                     Coalesce(last_post, last_comment)),
+            F('last_activity')),
+    }
+
+
+def _count_of(model, field):
+    rows = (model.objects.filter(**{field: OuterRef('pk')})
+            .order_by().values(field).annotate(total=Count('pk'))
+            .values('total'))
+    return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+
+def recount():
+    """Пересчитывает все счетчики и сводки групп с нуля (починка после
+    bulk-операций)."""
+    with transaction.atomic():
+        existing = AuthorStats.objects.values_list('user_id', flat=True)
+        AuthorStats.objects.bulk_create([
+            AuthorStats(user_id=user_id)
+            for user_id in User.objects.exclude(pk__in=existing)
+            .values_list('pk', flat=True)
+        ])
+        Post.objects.update(comments_count=_count_of(Comment, 'post'))
+        Group.objects.update(posts_count=_count_of(Post, 'group'),
+                             **_group_summary())
+        AuthorStats.objects.update(
+            posts_count=_count_of(Post, 'author'),
+            comments_count=_count_of(Comment, 'author'),
+            followers_count=_count_of(Follow, 'author'),
+        )
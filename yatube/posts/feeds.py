@@ -0,0 +1,217 @@
+"""Ленты постов в Atom, RSS и JSON Feed.
+
+Документ пишется потоком: строки постов читаются `.values_list()`
+одним запросом с JOIN автора и группы через `.iterator()` и сразу
+превращаются в текст, без шаблонов и объектов моделей. Готовый
+документ до `FEED_CACHE_MAX_SIZE` байт заодно собирается в кэш под
+поколением ленты, поэтому повторные запросы базу не трогают.
+"""
+import hashlib
+import json
+from email.utils import format_datetime
+from xml.sax.saxutils import escape, quoteattr
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.text import Truncator
+
+from .cache import FEED_CACHE_TIMEOUT, generation
+
+FEED_ITEMS = getattr(settings, 'FEED_ITEMS', 50)
+FEED_MAX_ITEMS = getattr(settings, 'FEED_MAX_ITEMS', 200)
+FEED_CACHE_MAX_SIZE = getattr(settings, 'FEED_CACHE_MAX_SIZE', 1024 * 1024)
+CHUNK_SIZE = 100
+# заглушка id для шаблона адреса поста
+POST_ID = 987654321
+TITLE_WORDS = 10
+
+FIELDS = ('pk', 'text', 'pub_date', 'updated', 'image', 'author__username',
+          'group__slug', 'group__title')
+
+
+def limit(request):
+    try:
+        value = int(request.GET.get('limit', FEED_ITEMS))
+    except ValueError:
+        return FEED_ITEMS
+    return max(1, min(value, FEED_MAX_ITEMS))
+
+
+def document_key(scope, request):
+    """Ключ документа: лента, ее поколение и полный URL (хост входит
+    в абсолютные ссылки, формат и limit — в путь и параметры)."""
+    digest = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    return 'feed:doc:%s:%s:%s' % (scope, generation(scope), digest)
+
+
+def etag(scope, request):
+    return hashlib.md5(document_key(scope, request).encode()).hexdigest()
+
+
+class Item:
+    __slots__ = FIELDS + ('url', 'title', 'author_url')
+
+    def __init__(self, feed, row):
+        for name, value in zip(FIELDS, row):
+            setattr(self, name, value)
+        self.url = feed.post_url % self.pk
+        self.author_url = feed.author_url(self.author__username)
+        self.title = Truncator(' '.join(self.text.split())).words(TITLE_WORDS)
+
+
+def atom(feed, items):
+    yield ('<?xml version="1.0" encoding="utf-8"?>\n'
+           '<feed xmlns="http://www.w3.org/2005/Atom">'
+           '<title>%s</title><link href=%s rel="alternate"/>'
+           '<link href=%s rel="self"/><id>%s</id><updated>%s</updated>\n' % (
+               escape(feed.title), quoteattr(feed.link),
+               quoteattr(feed.url), escape(feed.url),
+               feed.updated.isoformat()))
+    for item in items:
+        category = ''
+        if item.group__slug:
+            category = '<category term=%s label=%s/>' % (
+                quoteattr(item.group__slug), quoteattr(item.group__title))
+        yield ('<entry><title>%s</title><link href=%s rel="alternate"/>'
+               '<id>%s</id><published>%s</published><updated>%s</updated>'
+               '<author><name>%s</name><uri>%s</uri></author>%s'
+               '<content type="text">%s</content></entry>\n' % (
+                   escape(item.title), quoteattr(item.url), escape(item.url),
+                   item.pub_date.isoformat(), item.updated.isoformat(),
+                   escape(item.author__username), escape(item.author_url),
+                   category, escape(item.text)))
+    yield '</feed>\n'
+
+
+def rss(feed, items):
+    yield ('<?xml version="1.0" encoding="utf-8"?>\n'
+           '<rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom" '
+           'xmlns:dc="http://purl.org/dc/elements/1.1/"><channel>'
+           '<title>%s</title><link>%s</link><description>%s</description>'
+           '<atom:link href=%s rel="self"/><lastBuildDate>%s</lastBuildDate>'
+           '\n' % (escape(feed.title), escape(feed.link), escape(feed.title),
+                   quoteattr(feed.url), format_datetime(feed.updated)))
+    for item in items:
+        category = ''
+        if item.group__slug:
+            category = '<category>%s</category>' % escape(item.group__title)
+        yield ('<item><title>%s</title><link>%s</link>'
+               '<guid isPermaLink="true">%s</guid><pubDate>%s</pubDate>'
+               '<dc:creator>%s</dc:creator>%s<description>%s</description>'
+               '</item>\n' % (
+                   escape(item.title), escape(item.url), escape(item.url),
+                   format_datetime(item.pub_date),
+                   escape(item.author__username), category,
+                   escape(item.text)))
+    yield '</channel></rss>\n'
+
+
+def json_feed(feed, items):
+    head = json.dumps({
+        'version': 'https://jsonfeed.org/version/1.1',
+        'title': feed.title,
+        'home_page_url': feed.link,
+        'feed_url': feed.url,
+    }, ensure_ascii=False)
+    yield head[:-1] + ', "items": [\n'
+    separator = ''
+    for item in items:
+        data = {
+            'id': item.url,
+            'url': item.url,
+            'title': item.title,
+            'content_text': item.text,
+            'date_published': item.pub_date.isoformat(),
+            'date_modified': item.updated.isoformat(),
+            'authors': [{'name': item.author__username,
+                         'url': item.author_url}],
+        }
+        if item.group__slug:
+            data['tags'] = [item.group__title]
+        if item.image:
+            data['image'] = feed.request.build_absolute_uri(
+                default_storage.url(item.image))
+        yield separator + json.dumps(data, ensure_ascii=False)
+        separator = ',\n'
+    yield '\n]}\n'
+
+
+FORMATS = {
+    'atom': ('application/atom+xml; charset=utf-8', atom),
+    'rss': ('application/rss+xml; charset=utf-8', rss),
+    'json': ('application/feed+json; charset=utf-8', json_feed),
+}
+
+
+class Feed:
+    def __init__(self, request, title, link, queryset):
+        self.request = request
+        self.title = title
+        self.link = request.build_absolute_uri(link)
+        self.url = request.build_absolute_uri()
+        self.rows = queryset.order_by('-pub_date', '-pk').values_list(
+            *FIELDS)[:limit(request)].iterator(chunk_size=CHUNK_SIZE)
+        self.updated = None
+        # reverse() на каждый пост дороже всего остального: адрес поста
+        # собирается по шаблону, адреса авторов запоминаются
+        self.post_url = request.build_absolute_uri(reverse(
+            'posts:post_detail', args=[POST_ID])).replace(
+                str(POST_ID), '%d')
+        self.author_urls = {}
+
+    def author_url(self, username):
+        url = self.author_urls.get(username)
+        if url is None:
+            url = self.author_urls[username] = self.request.build_absolute_uri(
+                reverse('posts:profile', args=[username]))
+        return url
+
+    def items(self):
+        """Первая строка читается заранее: ее `updated` идет в шапку
+        документа, которая пишется до постов."""
+        first = next(self.rows, None)
+        self.updated = first[3] if first else timezone.now()
+        return self._items(first)
+
+    def _items(self, first):
+        if first is None:
+            return
+        yield Item(self, first)
+        for row in self.rows:
+            yield Item(self, row)
+
+
+def _collect(chunks, key):
+    """Отдает куски дальше и кладет документ в кэш, если он не больше
+    `FEED_CACHE_MAX_SIZE`."""
+    parts = []
+    size = 0
+    for chunk in chunks:
+        data = chunk.encode()
+        if parts is not None:
+            size += len(data)
+            if size > FEED_CACHE_MAX_SIZE:
+                parts = None
+            else:
+                parts.append(data)
+        yield data
+    if parts is not None:
+        cache.set(key, b''.join(parts), FEED_CACHE_TIMEOUT)
+
+
+def response(request, scope, format, title, link, queryset):
+    if format not in FORMATS:
+        raise Http404('Неизвестный формат ленты')
+    content_type, render = FORMATS[format]
+    key = document_key(scope, request)
+    document = cache.get(key)
+    if document is not None:
+        return HttpResponse(document, content_type=content_type)
+    feed = Feed(request, title, link, queryset)
+    items = feed.items()
+    return StreamingHttpResponse(_collect(render(feed, items), key),
+                                 content_type=content_type)
@@ -1,4 +1,5 @@
 from .models import Post, Comment
+from .uploads import LimitedImageField
 from django.forms import ModelForm
 
 
@@ -6,6 +7,16 @@ class PostForm(ModelForm):
     class Meta:
         model = Post
         fields = ['text', 'group', 'image']
+        field_classes = {'image': LimitedImageField}
+
+
+class PostAdminForm(ModelForm):
+    """Форма админки: те же ограничения загрузки, что у PostForm."""
+
+    class Meta:
+        model = Post
+        fields = '__all__'
+        field_classes = {'image': LimitedImageField}
 
 
 class CommentForm(ModelForm):
@@ -0,0 +1,39 @@
+"""Части страниц постов, которые зависят от пользователя.
+
+Страницы кэшируются целиком (см. `core.pagecache`), а эти фрагменты
+рендерятся для каждого запроса. Анонимному посетителю они пустые
+и не обращаются к базе.
+"""
+from django.template.loader import render_to_string
+
+from core.pagecache import hole
+
+from .forms import CommentForm
+from .models import Follow
+
+
+@hole('comment_form')
+def comment_form(request, post_id):
+    if not request.user.is_authenticated:
+        return ''
+    return render_to_string('posts/includes/comment_form.html',
+                            {'form': CommentForm(), 'post_id': post_id},
+                            request=request)
+
+
+@hole('post_edit_link')
+def post_edit_link(request, post_id, author_id):
+    if request.user.pk != author_id:
+        return ''
+    return render_to_string('posts/includes/post_edit_link.html',
+                            {'post_id': post_id})
+
+
+@hole('follow_button')
+def follow_button(request, author_id, username):
+    user = request.user
+    if not user.is_authenticated or user.pk == author_id:
+        return ''
+    following = Follow.objects.filter(user=user, author_id=author_id).exists()
+    return render_to_string('posts/includes/follow_button.html',
+                            {'following': following, 'username': username})
@@ -0,0 +1,106 @@
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.cache import SQLiteCache
+from posts import bench
+
+# типичные значения: поколение ленты и отрисованная страница
+VALUES = {
+    'generation': 1234567890123,
+    'page': '<article>%s</article>' % ('Текст поста. ' * 2500),
+}
+
+
+def backends(path):
+    return {
+        'locmem': lambda: LocMemCache('bench', {}),
+        'sqlite': lambda: SQLiteCache(
+            path, {'OPTIONS': {'MAX_ENTRIES': 100000}}),
+        'sqlite+local': lambda: SQLiteCache(
+            path, {'OPTIONS': {'MAX_ENTRIES': 100000,
+                               'LOCAL_ENTRIES': 1000}}),
+    }
+
+
+def hit_rate(factory, worker, workers, keys, barrier, queue):
+    """Процесс кладет свою долю ключей и читает все: у общего кэша
+    попадают и ключи соседей."""
+    cache = factory()
+    for number in range(worker, keys, workers):
+        cache.set('shared:%d' % number, number)
+    barrier.wait()
+    hits = sum(cache.get('shared:%d' % number) is not None
+               for number in range(keys))
+    queue.put(hits / keys)
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает время попадания в LocMemCache и в общий кэш '
+            'SQLite (с памятью процесса и без) и долю попаданий, когда '
+            'ключи кладут разные процессы.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20000)
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--keys', type=int, default=1000)
+        parser.add_argument('--output', help='Файл для результатов в JSON')
+
+    def handle(self, *args, **options):
+        results = {}
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'cache.sqlite3')
+            for name, factory in backends(path).items():
+                cache = factory()
+                cache.clear()
+                result = results[name] = {}
+                for value_name, value in VALUES.items():
+                    result[value_name] = self.latency(
+                        cache, value_name, value, options['repeat'])
+                cache.clear()
+                result['hit_rate'] = self.shared_hits(factory, options)
+                self.stdout.write(
+                    '%-13s generation p50=%6.1f us p95=%6.1f us  '
+                    'page p50=%6.1f us p95=%6.1f us  hits across %d '
+                    'processes=%.0f%%' % (
+                        name, result['generation']['p50_us'],
+                        result['generation']['p95_us'],
+                        result['page']['p50_us'], result['page']['p95_us'],
+                        options['processes'], result['hit_rate'] * 100))
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2)
+
+    def latency(self, cache, key, value, repeat):
+        cache.set(key, value, None)
+        timings = []
+        for i in range(repeat):
+            started = time.perf_counter()
+            cache.get(key)
+            timings.append((time.perf_counter() - started) * 1e6)
+        return {
+            'p50_us': round(bench.percentile(timings, 0.5), 2),
+            'p95_us': round(bench.percentile(timings, 0.95), 2),
+        }
+
+    def shared_hits(self, factory, options):
+        context = multiprocessing.get_context('fork')
+        workers = options['processes']
+        barrier = context.Barrier(workers)
+        queue = context.Queue()
+        processes = [
+            context.Process(target=hit_rate, args=(
+                factory, worker, workers, options['keys'], barrier, queue))
+            for worker in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        rates = [queue.get() for process in processes]
+        for process in processes:
+            process.join()
+        return sum(rates) / len(rates)
@@ -0,0 +1,83 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from posts import bench
+from posts.models import Comment, Post
+from posts.paginator import BACKWARD, FORWARD, CursorPaginator
+
+FEED_INDEXES = {
+    Post: ['post_feed_idx', 'post_group_feed_idx', 'post_author_feed_idx'],
+    Comment: ['comment_post_created_idx'],
+}
+
+
+class Command(BaseCommand):
+    help = ('Наполняет временную базу и сравнивает планы EXPLAIN и время '
+            'запросов лент с составными индексами и без них.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1000000)
+        parser.add_argument('--comments', type=int, default=100000)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--output', help='Файл для результатов в JSON')
+
+    def handle(self, *args, **options):
+        with bench.bench_database():
+            self.stdout.write('Наполнение: %(posts)d постов, '
+                              '%(comments)d комментариев' % options)
+            bench.seed(users=options['users'], groups=options['groups'],
+                       posts=options['posts'], comments=options['comments'])
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+            queries = self.feed_queries()
+            results = {'indexed': self.run(queries, options['repeat'])}
+            self.drop_indexes()
+            results['unindexed'] = self.run(queries, options['repeat'])
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2, ensure_ascii=False)
+
+    def feed_queries(self):
+        sample = Post.objects.exclude(group=None).order_by('pk')[
+            Post.objects.count() // 2]
+        feed = CursorPaginator(Post.objects.all(), 10)
+        return {
+            'index': lambda: feed.window(FORWARD, None),
+            'index_deep': lambda: feed.window(
+                FORWARD, [sample.pub_date, sample.pk]),
+            'index_last': lambda: feed.window(BACKWARD, None),
+            'group': lambda: CursorPaginator(
+                Post.objects.filter(group_id=sample.group_id), 10
+            ).window(FORWARD, None),
+            'profile': lambda: CursorPaginator(
+                Post.objects.filter(author_id=sample.author_id), 10
+            ).window(FORWARD, None),
+            'comments': lambda: CursorPaginator(
+                Comment.objects.filter(post_id=sample.pk).order_by(
+                    'created', 'pk'), 20,
+                ordering=('created', 'pk')
+            ).window(FORWARD, None),
+        }
+
+    def run(self, queries, repeat):
+        results = {}
+        for name, make_query in queries.items():
+            plan = make_query().explain()
+            timing = bench.measure(lambda: list(make_query()), repeat)
+            results[name] = dict(timing, plan=plan)
+            self.stdout.write('%-12s p50=%8.3f ms p95=%8.3f ms\n    %s' % (
+                name, timing['p50_ms'], timing['p95_ms'],
+                plan.replace('\n', '\n    ')))
+        return results
+
+    def drop_indexes(self):
+        self.stdout.write(self.style.WARNING('Без составных индексов:'))
+        with connection.schema_editor() as editor:
+            for model, names in FEED_INDEXES.items():
+                for index in model._meta.indexes:
+                    if index.name in names:
+                        editor.remove_index(model, index)
@@ -0,0 +1,67 @@
+import json
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from posts import bench, counters
+from posts.models import Group, Post
+from posts.paginator import FORWARD, CursorPaginator
+from posts.views import GROUP_ORDERINGS, GROUPS_PER_PAGE
+
+
+class Command(BaseCommand):
+    help = ('Каталог групп: страница из сводки в строке группы против '
+            'агрегатов по постам в запросе (annotate Count/Max и '
+            'подзапрос последнего поста) — первая и глубокая страница, '
+            'затем ответ /groups/ без кэша и из кэша.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--groups', type=int, default=100000)
+        parser.add_argument('--posts', type=int, default=200000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--output', help='Файл для результатов в JSON')
+
+    def handle(self, *args, **options):
+        results = {}
+        with bench.bench_database():
+            bench.seed(groups=options['groups'], posts=options['posts'])
+            counters.recount()
+            latest = Post.objects.filter(group=OuterRef('pk')).order_by(
+                '-pub_date', '-pk')
+            aggregated = Group.objects.annotate(
+                total=Count('posts'), active=Max('posts__pub_date'),
+                latest_text=Subquery(latest.values('text')[:1]),
+            ).order_by('-active', '-pk')
+            summary = Group.objects.select_related('latest_post')
+            paginator = CursorPaginator(summary, GROUPS_PER_PAGE,
+                                        GROUP_ORDERINGS['active'])
+            middle = paginator.encode_cursor(
+                FORWARD, paginator.object_list[options['groups'] // 2])
+            cases = {
+                'aggregate first': lambda: list(
+                    aggregated[:GROUPS_PER_PAGE]),
+                'summary first': lambda: list(paginator.get_page(None)),
+                'summary deep': lambda: list(
+                    paginator.get_page(cursor=middle)),
+            }
+            for name, func in cases.items():
+                results[name] = bench.measure(func, options['repeat'])
+            url = reverse('posts:groups')
+            client = Client()
+            with override_settings(DEBUG=False,
+                                   ALLOWED_HOSTS=['testserver']):
+                results['view'] = bench.measure(
+                    lambda: (cache.clear(), client.get(url)),
+                    options['repeat'])
+                client.get(url)
+                results['view cached'] = bench.measure(
+                    lambda: client.get(url), options['repeat'])
+        for name, timings in results.items():
+            self.stdout.write('%-16s p50=%8.2f ms p95=%8.2f ms' % (
+                name, timings['p50_ms'], timings['p95_ms']))
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2)
@@ -0,0 +1,161 @@
+import json
+import os
+import multiprocessing
+import tempfile
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from posts import bench
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+
+class Stats:
+    def __init__(self):
+        self.timings = {}
+        self.errors = 0
+
+    def add(self, status, elapsed):
+        self.timings.setdefault(status, []).append(elapsed * 1000)
+
+    def merge(self, other):
+        for status, timings in other.timings.items():
+            self.timings.setdefault(status, []).extend(timings)
+        self.errors += other.errors
+
+    @property
+    def requests(self):
+        return sum(map(len, self.timings.values())) + self.errors
+
+    def summary(self, status):
+        timings = self.timings.get(status)
+        if not timings:
+            return {'count': 0}
+        return dict(bench.summarize(timings), count=len(timings))
+
+
+def post(client, url, stats, ip):
+    started = time.perf_counter()
+    try:
+        response = client.post(url, {'text': 'Комментарий'}, REMOTE_ADDR=ip)
+    except Exception:
+        stats.errors += 1
+    else:
+        stats.add(response.status_code, time.perf_counter() - started)
+
+
+def logged_in(user):
+    client = Client()
+    client.force_login(user)
+    return client
+
+
+def flood(url, user, ip, deadline, queue):
+    """Процесс спамера: комментарии без пауз до `deadline`."""
+    client = logged_in(user)
+    stats = Stats()
+    while time.monotonic() < deadline:
+        post(client, url, stats, ip)
+    connections.close_all()
+    queue.put(stats)
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный тест лимитов записи: процессы спамера шлют '
+            'комментарии с разных IP, а обычный пользователь пишет '
+            'комментарий раз в --interval секунд. Кэш — общий '
+            'SQLiteCache, база — файл. Сравнивает запуск без RATE_LIMITS '
+            'и с лимитами из настроек: сколько записей дошло до базы, '
+            'цена ответа 429 и задержка записей обычного пользователя.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--spammers', type=int, default=4)
+        parser.add_argument('--duration', type=float, default=10)
+        parser.add_argument('--interval', type=float, default=1)
+        parser.add_argument('--output', help='Файл для результатов в JSON')
+
+    def handle(self, *args, **options):
+        results = {}
+        with tempfile.TemporaryDirectory() as directory, \
+                bench.bench_database(os.path.join(directory, 'db.sqlite3')), \
+                override_settings(DEBUG=False, ALLOWED_HOSTS=['testserver'],
+                                  CACHES={'default': {
+                                      'BACKEND': 'core.cache.SQLiteCache',
+                                      'LOCATION': os.path.join(
+                                          directory, 'cache.sqlite3'),
+                                  }}):
+            bench.seed(users=10, groups=2, posts=100)
+            spammer, user = User.objects.order_by('pk')[:2]
+            post_id = Post.objects.order_by('pk').values_list(
+                'pk', flat=True).first()
+            url = reverse('posts:add_comment', args=[post_id])
+            for name, limits in (('off', {}),
+                                 ('on', settings.RATE_LIMITS)):
+                with override_settings(RATE_LIMITS=limits):
+                    cache.clear()
+                    results[name] = self.run(url, spammer, user, options)
+                result = results[name]
+                self.stdout.write(
+                    'limits %-3s spam %5d req (%4d written, %5d 429, '
+                    '%d errors)  429 p50=%6.2f ms  user writes %d/%d '
+                    'p50=%6.2f ms p95=%6.2f ms max=%7.2f ms' % (
+                        name, result['spam']['requests'],
+                        result['spam']['written']['count'],
+                        result['spam']['throttled']['count'],
+                        result['spam']['errors'],
+                        result['spam']['throttled'].get('p50_ms', 0),
+                        result['user']['written']['count'],
+                        result['user']['requests'],
+                        result['user']['written'].get('p50_ms', 0),
+                        result['user']['written'].get('p95_ms', 0),
+                        result['user']['written'].get('max_ms', 0)))
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2)
+
+    def run(self, url, spammer, user, options):
+        before = Comment.objects.count()
+        deadline = time.monotonic() + options['duration']
+        context = multiprocessing.get_context('fork')
+        queue = context.Queue()
+        # дочерние процессы не должны делить соединения родителя
+        connections.close_all()
+        processes = [
+            context.Process(target=flood, args=(
+                url, spammer, '10.0.0.%d' % (number + 1), deadline, queue))
+            for number in range(options['spammers'])
+        ]
+        for process in processes:
+            process.start()
+        client = logged_in(user)
+        legit = Stats()
+        while time.monotonic() < deadline:
+            post(client, url, legit, '10.1.0.1')
+            time.sleep(options['interval'])
+        spam = Stats()
+        for process in processes:
+            spam.merge(queue.get())
+        for process in processes:
+            process.join()
+        return {
+            'spam': {
+                'requests': spam.requests,
+                'written': spam.summary(302),
+                'throttled': spam.summary(429),
+                'errors': spam.errors,
+            },
+            'user': {
+                'requests': legit.requests,
+                'written': legit.summary(302),
+                'errors': legit.errors,
+            },
+            'comments_written': Comment.objects.count() - before,
+        }
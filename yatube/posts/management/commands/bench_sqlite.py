@@ -0,0 +1,167 @@
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections
+from django.db.models import Max, Min
+from django.test import override_settings
+
+from posts import bench
+from posts.models import Comment, Post
+from posts.writes import save_comment
+
+# режим SQLite по умолчанию: журнал отката, fsync на каждый коммит и
+# таймаут модуля sqlite3
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'delete',
+    'synchronous': 'full',
+    'busy_timeout': 5000,
+}
+
+
+class Worker:
+    """Потоки одного процесса: пишут комментарии или читают ленту."""
+
+    def __init__(self, bounds, users, deadline):
+        self.bounds = bounds
+        self.users = users
+        self.deadline = deadline
+        self.lock = threading.Lock()
+        self.timings = []
+        self.errors = 0
+
+    def record(self, started, failed=False):
+        elapsed = (time.perf_counter() - started) * 1000
+        with self.lock:
+            if failed:
+                self.errors += 1
+            else:
+                self.timings.append(elapsed)
+
+    def write(self):
+        rnd = random.Random()
+        while time.monotonic() < self.deadline:
+            comment = Comment(post_id=rnd.randint(*self.bounds),
+                              author_id=rnd.choice(self.users),
+                              text='Комментарий из бенчмарка')
+            started = time.perf_counter()
+            try:
+                save_comment(comment)
+            except OperationalError:
+                self.record(started, failed=True)
+            else:
+                self.record(started)
+
+    def read(self):
+        rnd = random.Random()
+        while time.monotonic() < self.deadline:
+            started = time.perf_counter()
+            try:
+                list(Post.objects.for_feed()[:10])
+                list(Comment.objects.for_post().filter(
+                    post_id=rnd.randint(*self.bounds))[:20])
+            except OperationalError:
+                self.record(started, failed=True)
+            else:
+                self.record(started)
+
+    def run(self, target, threads):
+        def loop():
+            try:
+                target()
+            finally:
+                connections.close_all()
+
+        workers = [threading.Thread(target=loop) for i in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return {'timings': self.timings, 'errors': self.errors}
+
+
+def write_process(bounds, users, deadline, threads, queue):
+    worker = Worker(bounds, users, deadline)
+    queue.put(worker.run(worker.write, threads))
+
+
+class Command(BaseCommand):
+    help = ('Параллельная запись комментариев (процессы по нескольку '
+            'потоков) и чтение ленты в файловой SQLite-базе. Сравнивает '
+            'режим SQLite по умолчанию, SQLITE_PRAGMAS и SQLITE_PRAGMAS с '
+            'групповой записью комментариев: записей в секунду, ошибки '
+            '«database is locked» и задержка чтения.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--threads', type=int, default=8,
+                            help='Пишущих потоков в каждом процессе')
+        parser.add_argument('--readers', type=int, default=2)
+        parser.add_argument('--duration', type=float, default=5)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--output', help='Файл для результатов в JSON')
+
+    def handle(self, *args, **options):
+        modes = {
+            'default': (DEFAULT_PRAGMAS, False),
+            'default+batching': (DEFAULT_PRAGMAS, True),
+            'tuned': (settings.SQLITE_PRAGMAS, False),
+            'tuned+batching': (settings.SQLITE_PRAGMAS, True),
+        }
+        results = {}
+        with tempfile.TemporaryDirectory() as directory, \
+                bench.bench_database(os.path.join(directory, 'db.sqlite3')):
+            bench.seed(users=100, groups=10, posts=options['posts'],
+                       comments=options['posts'])
+            bounds = tuple(Post.objects.aggregate(
+                first=Min('pk'), last=Max('pk')).values())
+            users = list(Comment.objects.values_list(
+                'author_id', flat=True).distinct())
+            for name, (pragmas, batching) in modes.items():
+                with override_settings(SQLITE_PRAGMAS=pragmas,
+                                       COMMENT_WRITE_BATCHING=batching):
+                    # новые соединения получат PRAGMA режима
+                    connections.close_all()
+                    result = results[name] = self.run(bounds, users,
+                                                      options)
+                self.stdout.write(
+                    '%-16s writes %6.0f/s (errors %d) write p95=%7.2f ms  '
+                    'read p50=%6.2f ms p95=%7.2f ms (errors %d)' % (
+                        name, result['writes_per_second'],
+                        result['write_errors'], result['write']['p95_ms'],
+                        result['read']['p50_ms'], result['read']['p95_ms'],
+                        result['read_errors']))
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2)
+
+    def run(self, bounds, users, options):
+        deadline = time.monotonic() + options['duration']
+        context = multiprocessing.get_context('fork')
+        queue = context.Queue()
+        processes = [
+            context.Process(target=write_process, args=(
+                bounds, users, deadline, options['threads'], queue))
+            for number in range(options['processes'])
+        ]
+        for process in processes:
+            process.start()
+        readers = Worker(bounds, users, deadline)
+        reads = readers.run(readers.read, options['readers'])
+        writes = [queue.get() for process in processes]
+        for process in processes:
+            process.join()
+        timings = [value for part in writes for value in part['timings']]
+        return {
+            'writes_per_second': len(timings) / options['duration'],
+            'write_errors': sum(part['errors'] for part in writes),
+            'write': bench.summarize(timings or [0]),
+            'read': bench.summarize(reads['timings'] or [0]),
+            'read_errors': reads['errors'],
+        }
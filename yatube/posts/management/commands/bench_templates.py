@@ -0,0 +1,118 @@
+import copy
+import json
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.template.context import Context
+from django.template.loader import render_to_string
+from django.test import Client, override_settings
+from django.test.utils import (ContextList, setup_test_environment,
+                               teardown_test_environment)
+from django.urls import reverse
+
+from core.precompile import precompile
+from posts import bench, counters, search
+from posts.models import Group, Post
+
+User = get_user_model()
+
+LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+MODES = {
+    'filesystem': LOADERS,
+    'cached': [('django.template.loaders.cached.Loader', LOADERS)],
+}
+
+
+def templates_with(loaders):
+    templates = copy.deepcopy(settings.TEMPLATES)
+    for backend in templates:
+        backend.pop('APP_DIRS', None)
+        backend.setdefault('OPTIONS', {})['loaders'] = loaders
+    return templates
+
+
+class Command(BaseCommand):
+    help = ('Измеряет время отрисовки шаблонов страниц без запросов к '
+            'базе: контекст view снимается один раз, затем шаблон '
+            'рендерится с загрузчиками из файлов и с cached.Loader '
+            'после precompile().')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--comments', type=int, default=2000)
+        parser.add_argument('--repeat', type=int, default=200)
+        parser.add_argument('--output', help='Файл для результатов в JSON')
+
+    def handle(self, *args, **options):
+        sizes = {name: options[name]
+                 for name in ('users', 'groups', 'posts', 'comments')}
+        with bench.bench_database(), override_settings(
+                DEBUG=False, ALLOWED_HOSTS=['testserver']):
+            bench.seed(**sizes)
+            counters.recount()
+            if search.available():
+                search.rebuild()
+            results = {}
+            for name, url in self.views().items():
+                template_name, context, request = self.capture(url)
+                result = results[name] = {'template': template_name}
+                for mode, loaders in MODES.items():
+                    with override_settings(TEMPLATES=templates_with(loaders)):
+                        if mode == 'cached':
+                            precompile()
+                        result[mode] = bench.measure(
+                            lambda: render_to_string(template_name, context,
+                                                     request),
+                            options['repeat'])
+                self.stdout.write(
+                    '%-12s filesystem p50=%6.2f ms p95=%6.2f ms  '
+                    'cached p50=%6.2f ms p95=%6.2f ms' % (
+                        name, result['filesystem']['p50_ms'],
+                        result['filesystem']['p95_ms'],
+                        result['cached']['p50_ms'],
+                        result['cached']['p95_ms']))
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump({'dataset': sizes, 'views': results}, output,
+                          indent=2)
+
+    def views(self):
+        group = Group.objects.order_by('-posts_count').first()
+        author = User.objects.order_by('-stats__posts_count').first()
+        post = Post.objects.annotate(total=Count('comments')).order_by(
+            '-total').first()
+        return {
+            'index': reverse('posts:index'),
+            'group_list': reverse('posts:group', args=[group.slug]),
+            'profile': reverse('posts:profile', args=[author.username]),
+            'post_detail': reverse('posts:post_detail', args=[post.pk]),
+            # номерная пагинация: страница из середины длинной выдачи
+            'search': reverse('posts:search') + '?q=Пост&page=50',
+        }
+
+    def capture(self, url):
+        """Шаблон, контекст и запрос страницы; инструментирование
+        тестового окружения на время замеров снимается."""
+        cache.clear()
+        client = Client()
+        client.force_login(User.objects.order_by('pk').first())
+        setup_test_environment(debug=False)
+        try:
+            response = client.get(url)
+        finally:
+            teardown_test_environment()
+        assert response.status_code == 200, response.status_code
+        context = response.context
+        if isinstance(context, ContextList):
+            context = context[0]
+        if isinstance(context, Context):
+            context = context.flatten()
+        return response.templates[0].name, context, response.wsgi_request
@@ -0,0 +1,69 @@
+import json
+import time
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, Max, Q
+from django.utils import timezone
+
+from posts import bench
+from posts.models import Comment, Group, Post
+from posts.trending import TrendingPaginator
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает первую страницу «Обсуждаемого» из таблицы оценок '
+            'с подсчетом комментариев окна через annotate(Count) для общей '
+            'ленты и ленты группы; печатает время update_trending.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=300000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--output', help='Файл для результатов в JSON')
+
+    def handle(self, *args, **options):
+        with bench.bench_database():
+            bench.seed(groups=50, posts=options['posts'],
+                       comments=options['comments'])
+            # комментарии seed идут раз в секунду с начала постов:
+            # сдвигаем их так, чтобы последний был написан сейчас
+            last = Comment.objects.aggregate(last=Max('created'))['last']
+            Comment.objects.update(
+                created=F('created') + (timezone.now() - last))
+            started = time.perf_counter()
+            call_command('update_trending', '--all', stdout=StringIO())
+            results = {'update_trending_s': round(
+                time.perf_counter() - started, 3)}
+            group_id = Group.objects.values_list('pk', flat=True).first()
+            since = timezone.now() - timedelta(
+                seconds=settings.TRENDING_WINDOW)
+            for scope, posts, group in (
+                    ('all', Post.objects.all(), None),
+                    ('group', Post.objects.filter(group_id=group_id),
+                     group_id)):
+                recent = Count('comments',
+                               filter=Q(comments__created__gte=since))
+                baseline = posts.annotate(recent=recent).filter(
+                    recent__gt=0).select_related('author', 'group').order_by(
+                    '-recent', '-pk')
+                paginator = TrendingPaginator(10, group)
+                results[scope] = {
+                    'annotate': bench.measure(
+                        lambda: list(baseline[:10]), options['repeat']),
+                    'score_table': bench.measure(
+                        lambda: list(paginator.get_page(None)),
+                        options['repeat']),
+                }
+                for name, timings in results[scope].items():
+                    self.stdout.write('%-6s %-12s p50=%8.2f ms p95=%8.2f ms'
+                                      % (scope, name, timings['p50_ms'],
+                                         timings['p95_ms']))
+            self.stdout.write('update_trending: %.2f s'
+                              % results['update_trending_s'])
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2)
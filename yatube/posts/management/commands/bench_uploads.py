@@ -0,0 +1,86 @@
+import io
+import json
+import os
+import tempfile
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+from PIL import Image
+
+from posts import bench, views
+
+User = get_user_model()
+
+DEFAULT_HANDLERS = [
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+LIMITED_HANDLERS = ['posts.uploads.LimitedImageUploadHandler']
+
+
+def png(size, noise=False):
+    if noise:
+        image = Image.frombytes('RGB', size, os.urandom(size[0] * size[1] * 3))
+    else:
+        image = Image.new('RGB', size)
+    content = io.BytesIO()
+    image.save(content, 'PNG')
+    return content.getvalue()
+
+
+class Command(BaseCommand):
+    help = ('Измеряет пиковую память запроса post_create при загрузке '
+            'картинок со стандартными обработчиками и с потоковым.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='Файл для результатов в JSON')
+
+    def handle(self, *args, **options):
+        cases = {
+            'small': png((800, 600), noise=True),
+            'too_many_bytes': png((2000, 2000), noise=True),
+            'too_many_pixels': png((20000, 20000)),
+        }
+        results = {}
+        media = tempfile.TemporaryDirectory()
+        with bench.bench_database(), override_settings(MEDIA_ROOT=media.name):
+            user = User.objects.create_user(username='uploader')
+            for name, content in cases.items():
+                results[name] = {'bytes': len(content)}
+                for mode, handlers in (('default', DEFAULT_HANDLERS),
+                                       ('limited', LIMITED_HANDLERS)):
+                    peak, status = self.upload(user, content, handlers)
+                    results[name][mode] = {'peak_kb': peak // 1024,
+                                           'status': status}
+                self.stdout.write(
+                    '%-16s %6d KB  пик: стандартный %6d KB (%d), '
+                    'потоковый %6d KB (%d)' % (
+                        name, len(content) // 1024,
+                        results[name]['default']['peak_kb'],
+                        results[name]['default']['status'],
+                        results[name]['limited']['peak_kb'],
+                        results[name]['limited']['status'],
+                    ))
+        media.cleanup()
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2)
+
+    def upload(self, user, content, handlers):
+        upload = io.BytesIO(content)
+        upload.name = 'bench.png'
+        request = RequestFactory().post('/create/', {'text': 'Бенчмарк',
+                                                     'image': upload})
+        request.user = user
+        # лимиты записи ответили бы 429 раньше, чем дело дойдет до файла
+        with override_settings(FILE_UPLOAD_HANDLERS=handlers,
+                               RATE_LIMITS={}):
+            tracemalloc.start()
+            try:
+                response = views.post_create(request)
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+        return peak, response.status_code
@@ -0,0 +1,175 @@
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import bench, counters, search
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+            text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ('Наполняет временную базу и измеряет время (p50/p95), число '
+            'запросов и пиковую память view постов через тестовый клиент. '
+            'Результаты пишутся в JSON для сравнения между коммитами.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--memory-repeat', type=int, default=5,
+                            help='Запросов под tracemalloc (он медленный)')
+        parser.add_argument('--output', help='Файл для результатов в JSON')
+        parser.add_argument('--compare',
+                            help='JSON прошлого запуска для сравнения')
+
+    def handle(self, *args, **options):
+        sizes = {name: options[name]
+                 for name in ('users', 'groups', 'posts', 'comments')}
+        with bench.bench_database(), override_settings(
+                DEBUG=False, ALLOWED_HOSTS=['testserver']):
+            self.stdout.write('Наполнение: %s' % sizes)
+            bench.seed(**sizes)
+            counters.recount()
+            if search.available():
+                search.rebuild()
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+            views = self.views()
+            results = {}
+            for name, (method, url, data) in views.items():
+                for warm in (False, True):
+                    if warm and method != 'get':
+                        continue
+                    key = name + (':warm' if warm else '')
+                    results[key] = self.measure(method, url, data, warm,
+                                                options)
+                    self.stdout.write(
+                        '%-22s p50=%7.2f ms p95=%7.2f ms queries=%-3d '
+                        'peak=%d KB' % (key, results[key]['p50_ms'],
+                                        results[key]['p95_ms'],
+                                        results[key]['queries'],
+                                        results[key]['peak_kb']))
+        report = {
+            'commit': git_commit(),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'dataset': sizes,
+            'repeat': options['repeat'],
+            'views': results,
+        }
+        if options['compare']:
+            with open(options['compare']) as previous:
+                self.compare(json.load(previous), report)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+
+    def views(self):
+        """URL самых нагруженных страниц: крупная группа, активный автор,
+        пост с комментариями."""
+        group = Group.objects.order_by('-posts_count').first()
+        author = User.objects.order_by('-stats__posts_count').first()
+        post = Post.objects.annotate(total=Count('comments')).order_by(
+            '-total').first()
+        return {
+            'index': ('get', reverse('posts:index'), None),
+            'group_list': ('get', reverse('posts:group',
+                                          args=[group.slug]), None),
+            'profile': ('get', reverse('posts:profile',
+                                       args=[author.username]), None),
+            'post_detail': ('get', reverse('posts:post_detail',
+                                           args=[post.pk]), None),
+            # JSON API на тех же данных: страница того же размера, что
+            # и HTML, и страница на 100 постов для пропускной способности
+            'api_posts': ('get', reverse('posts:api_posts') + '?limit=10',
+                          None),
+            'api_posts_100': ('get',
+                              reverse('posts:api_posts') + '?limit=100',
+                              None),
+            'api_post': ('get', reverse('posts:api_post', args=[post.pk]),
+                         None),
+            'post_create': ('post', reverse('posts:post_create'),
+                            {'text': 'Пост из бенчмарка',
+                             'group': group.pk}),
+            'add_comment': ('post', reverse('posts:add_comment',
+                                            args=[post.pk]),
+                            {'text': 'Комментарий из бенчмарка'}),
+        }
+
+    def measure(self, method, url, data, warm, options):
+        client = Client()
+        client.force_login(User.objects.order_by('pk').first())
+        request = getattr(client, method)
+
+        def call():
+            if not warm:
+                cache.clear()
+            response = request(url, data)
+            assert response.status_code in (200, 302), response.status_code
+
+        call()
+        queries = []
+        timings = []
+        for i in range(options['repeat']):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                call()
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured))
+        peaks = []
+        for i in range(options['memory_repeat']):
+            tracemalloc.start()
+            try:
+                call()
+                peaks.append(tracemalloc.get_traced_memory()[1])
+            finally:
+                tracemalloc.stop()
+        result = bench.summarize(timings)
+        result['queries'] = max(queries)
+        result['peak_kb'] = max(peaks, default=0) // 1024
+        return result
+
+    def compare(self, previous, report):
+        since = previous.get('commit') or 'прошлым запуском'
+        self.stdout.write('Сравнение с %s:' % since)
+        for name, current in report['views'].items():
+            old = previous.get('views', {}).get(name)
+            if not old:
+                continue
+            self.stdout.write('%-22s p50 %+6.1f%%  p95 %+6.1f%%  '
+                              'queries %+d' % (
+                                  name,
+                                  self.change(old['p50_ms'],
+                                              current['p50_ms']),
+                                  self.change(old['p95_ms'],
+                                              current['p95_ms']),
+                                  current['queries'] - old['queries']))
+
+    def change(self, old, new):
+        return (new - old) / old * 100 if old else 0.0
@@ -0,0 +1,37 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from posts import thumbnails
+from posts.models import Post
+
+
+def build_in_thread(post_id):
+    try:
+        return thumbnails.build(post_id)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Строит миниатюры для постов с картинкой, у которых их еще нет.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Перестроить и уже готовые миниатюры')
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Потоков; 1 — строить в текущем потоке')
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='')
+        if not options['all']:
+            posts = posts.filter(thumbnail_url='')
+        ids = list(posts.values_list('pk', flat=True))
+        if options['workers'] > 1:
+            with ThreadPoolExecutor(options['workers']) as executor:
+                built = sum(executor.map(build_in_thread, ids))
+        else:
+            built = sum(map(thumbnails.build, ids))
+        self.stdout.write(self.style.SUCCESS(
+            'Построено миниатюр: %d из %d' % (built, len(ids))))
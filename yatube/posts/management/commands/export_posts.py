@@ -0,0 +1,42 @@
+import time
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = ('Выгружает группы, посты и комментарии потоком в NDJSON или '
+            'CSV (можно .gz, "-" — stdout).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=transfer.FORMATS,
+                            help='По умолчанию — по расширению файла')
+        parser.add_argument('--media',
+                            help='Каталог, куда скопировать картинки')
+        parser.add_argument('--progress', type=int, default=100000,
+                            help='Сообщать о ходе каждые N строк')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or transfer.guess_format(path)
+        media = options['media'] and transfer.media_storage(options['media'])
+        started = time.perf_counter()
+        written = 0
+        with transfer.open_stream(path, 'w') as stream:
+            for row in transfer.write_records(stream, transfer.records(),
+                                              fmt):
+                if media and row.get('image'):
+                    transfer.copy_image(row['image'], default_storage, media)
+                written += 1
+                if written % options['progress'] == 0:
+                    self.report(written, started)
+        self.report(written, started, self.style.SUCCESS)
+
+    def report(self, rows, started, style=str):
+        # stdout может быть занят самой выгрузкой
+        elapsed = time.perf_counter() - started
+        self.stderr.write(style('Выгружено строк: %d за %.1f с (%d строк/с)'
+                                % (rows, elapsed, rows / (elapsed or 1))))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts import cache
+
+
+class Command(BaseCommand):
+    help = 'Показывает попадания и промахи кэша лент.'
+
+    def handle(self, *args, **options):
+        stats = cache.stats()
+        self.stdout.write(
+            'hits={hits} misses={misses} hit_rate={hit_rate:.2%}'.format(
+                **stats)
+        )
@@ -0,0 +1,58 @@
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from posts import counters, search, transfer
+
+
+class Command(BaseCommand):
+    help = ('Загружает группы, посты и комментарии из NDJSON или CSV '
+            'пачками bulk_create, затем пересчитывает счетчики и индекс.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=transfer.FORMATS,
+                            help='По умолчанию — по расширению файла')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--media',
+                            help='Каталог с картинками из export_posts')
+        parser.add_argument('--ignore-conflicts', action='store_true',
+                            help='Пропускать посты и комментарии с занятым id')
+        parser.add_argument('--progress', type=int, default=100000,
+                            help='Сообщать о ходе каждые N строк')
+        parser.add_argument('--skip-derived', action='store_true',
+                            help='Не пересчитывать счетчики и индекс')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or transfer.guess_format(path)
+        media = options['media'] and transfer.media_storage(options['media'])
+        importer = transfer.Importer(
+            batch_size=options['batch_size'], media=media,
+            ignore_conflicts=options['ignore_conflicts'],
+        )
+        started = time.perf_counter()
+        reported = 0
+        with transfer.open_stream(path, 'r') as stream:
+            for totals in importer.run(transfer.read_records(stream, fmt)):
+                if sum(totals.values()) - reported >= options['progress']:
+                    reported = sum(totals.values())
+                    self.report(totals, started)
+        if not options['skip_derived']:
+            counters.recount()
+            if search.available():
+                search.rebuild(options['batch_size'])
+        # загруженные посты есть почти во всех лентах
+        cache.clear()
+        self.report(totals, started, self.style.SUCCESS)
+        self.stdout.write('Миниатюры достроит команда build_thumbnails.')
+
+    def report(self, totals, started, style=str):
+        rows = sum(totals.values())
+        elapsed = time.perf_counter() - started
+        self.stdout.write(style(
+            'Загружено: групп %d, постов %d, комментариев %d; '
+            '%.1f с (%d строк/с)' % (totals['group'], totals['post'],
+                                     totals['comment'], elapsed,
+                                     rows / (elapsed or 1))))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Строит поисковый индекс постов заново.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if not search.available():
+            raise CommandError('Поисковый индекс есть только у SQLite.')
+        search.rebuild(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('Индекс перестроен'))
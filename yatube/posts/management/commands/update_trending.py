@@ -0,0 +1,44 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts import cache, trending
+from posts.models import Comment, PostScore
+from posts.transfer import batches
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает оценки «Обсуждаемого» по комментариям окна '
+            'TRENDING_WINDOW пачками постов и удаляет затухшие строки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Сначала очистить таблицу оценок')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--window', type=int,
+                            default=settings.TRENDING_WINDOW,
+                            help='Окно комментариев в секундах')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        since = now - timedelta(seconds=options['window'])
+        if options['all']:
+            PostScore.objects.all().delete()
+        post_ids = Comment.objects.filter(created__gte=since).order_by(
+            'post_id').values_list('post_id', flat=True).distinct()
+        updated = 0
+        # список читается до записей: на SQLite курсор по таблице
+        # комментариев не живет поперек транзакций пересчета
+        for batch in batches(list(post_ids), options['batch_size']):
+            updated += trending.recompute(batch, since)
+        # группы берутся до удаления: их ленты тоже изменятся
+        groups = PostScore.objects.exclude(group_id=None).order_by(
+        ).values_list('group_id', flat=True).distinct()
+        scopes = ['trending:%s' % group_id for group_id in groups]
+        pruned = trending.prune(now)
+        cache.bump('trending', *scopes)
+        message = 'Оценки пересчитаны: %d, удалено затухших: %d' % (
+            updated, pruned)
+        self.stdout.write(self.style.SUCCESS(message))
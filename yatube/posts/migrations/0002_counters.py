@@ -0,0 +1,66 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:04
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+
+    def count_of(model, field):
+        rows = (model.objects.filter(**{field: models.OuterRef('pk')})
+                .order_by().values(field)
+                .annotate(total=models.Count('pk')).values('total'))
+        return Coalesce(
+            models.Subquery(rows, output_field=models.IntegerField()), 0)
+
+    AuthorStats.objects.bulk_create([
+        AuthorStats(user_id=pk)
+        for pk in User.objects.values_list('pk', flat=True)
+    ])
+    Post.objects.update(comments_count=count_of(Comment, 'post'))
+    Group.objects.update(posts_count=count_of(Post, 'group'))
+    AuthorStats.objects.update(
+        posts_count=count_of(Post, 'author'),
+        comments_count=count_of(Comment, 'author'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('posts_count', models.PositiveIntegerField(default=0)),
+                ('comments_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Статистика автора',
+                'verbose_name_plural': 'Статистика авторов',
+            },
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='posts_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
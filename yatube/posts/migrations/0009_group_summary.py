@@ -0,0 +1,54 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:29
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce, Greatest
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def fill_summary(apps, schema_editor):
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    latest = Post.objects.filter(group=models.OuterRef('pk')).order_by(
+        '-pub_date', '-pk')
+    last_comment = models.Subquery(
+        Comment.objects.filter(post__group=models.OuterRef('pk'))
+        .order_by('-created').values('created')[:1])
+    last_post = models.Subquery(latest.values('pub_date')[:1])
+    Group.objects.update(
+        latest_post=models.Subquery(latest.values('pk')[:1]),
+        last_activity=Coalesce(
+            Greatest(Coalesce(last_comment, last_post),
+                     Coalesce(last_post, last_comment)),
+            models.F('last_activity')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_post_score'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='last_activity',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='latest_post',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='posts.Post'),
+        ),
+        migrations.AddIndex(
+            model_name='group',
+            index=models.Index(fields=['-last_activity', '-id'], name='group_activity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='group',
+            index=models.Index(fields=['title', 'id'], name='group_title_idx'),
+        ),
+        migrations.RunPython(fill_summary, migrations.RunPython.noop),
+    ]
@@ -1,13 +1,47 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 User = get_user_model()
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Все, что шаблоны лент читают у поста, одним запросом."""
+        return self.select_related('author', 'group')
+
+    def for_detail(self):
+        return self.select_related('author__stats', 'group')
+
+
+class CommentQuerySet(models.QuerySet):
+    def for_post(self):
+        return self.select_related('author')
+
+
 class Group(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField()
     slug = models.SlugField(max_length=20, unique=True, db_index=True)
+    posts_count = models.PositiveIntegerField(default=0, editable=False)
+    # сводка для каталога групп, ее ведут сигналы (posts.counters):
+    # время последнего поста или комментария и последний пост
+    last_activity = models.DateTimeField(default=timezone.now,
+                                         editable=False)
+    latest_post = models.ForeignKey(
+        'Post',
+        null=True,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        editable=False,
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-last_activity', '-id'],
+                         name='group_activity_idx'),
+            models.Index(fields=['title', 'id'], name='group_title_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -34,15 +68,61 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True,
     )
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+    # время последнего изменения поста или его комментариев: входит в ETag
+    updated = models.DateTimeField(auto_now=True)
+    thumbnail_url = models.CharField(max_length=255, blank=True,
+                                     editable=False)
+    thumbnail_width = models.PositiveIntegerField(null=True, editable=False)
+    thumbnail_height = models.PositiveIntegerField(null=True, editable=False)
+
+    objects = PostQuerySet.as_manager()
+
+    # группа и картинка, с которыми пост был загружен из базы: нужны,
+    # чтобы при переносе сбросить кэш старой группы, а при замене
+    # картинки — перестроить миниатюру
+    loaded_group_id = None
+    loaded_image = None
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        # ленты сортируются по (pub_date, id) и фильтруются по группе
+        # или автору: индексы отдают страницу без сортировки в памяти
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_feed_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_feed_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_feed_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.loaded_group_id = instance.__dict__.get('group_id')
+        instance.loaded_image = instance.__dict__.get('image')
+        return instance
+
+    @property
+    def image_changed(self):
+        return (self.image.name or None) != (self.loaded_image or None)
+
+    def save(self, *args, **kwargs):
+        if self.image_changed:
+            self.thumbnail_url = ''
+            self.thumbnail_width = self.thumbnail_height = None
+        # счетчики обновляются обработчиками post_save в той же транзакции
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+        self.loaded_group_id = self.group_id
+        self.loaded_image = self.image.name
+
 
 class Comment(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE,
@@ -55,3 +135,92 @@ class Comment(models.Model):
     )
 
     created = models.DateTimeField(auto_now_add=True)
+
+    objects = CommentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'created', 'id'],
+                         name='comment_post_created_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+class AuthorStats(models.Model):
+    """Счетчики пользователя, чтобы не считать их при каждом показе."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    comments_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    # у автора слишком много подписчиков: его посты не раскладываются
+    # по лентам, а читаются при показе ленты (см. posts.timeline)
+    pull_feed = models.BooleanField(default=False, db_index=True)
+
+    class Meta:
+        verbose_name = 'Статистика автора'
+        verbose_name_plural = 'Статистика авторов'
+
+
+class Follow(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name='follower')
+    author = models.ForeignKey(User, on_delete=models.CASCADE,
+                               related_name='following')
+
+    class Meta:
+        verbose_name = 'Подписка'
+        verbose_name_plural = 'Подписки'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'author'],
+                                    name='unique_follow'),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """Пост в ленте подписок пользователя, разложенный при публикации."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name='timeline')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name='+')
+    # копии полей поста: сортировка и отписка без соединения с постами
+    author = models.ForeignKey(User, on_delete=models.CASCADE,
+                               related_name='+')
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_timeline_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='timeline_user_feed_idx'),
+            models.Index(fields=['user', 'author'],
+                         name='timeline_user_author_idx'),
+        ]
+
+
+class PostScore(models.Model):
+    """Обсуждаемость поста по недавним комментариям (см. posts.trending)."""
+    post = models.OneToOneField(Post, on_delete=models.CASCADE,
+                                primary_key=True, related_name='trending')
+    # копия группы поста: лента группы читается одним индексом
+    group = models.ForeignKey(Group, null=True, on_delete=models.SET_NULL,
+                              related_name='+')
+    score = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-score', '-post'],
+                         name='post_score_idx'),
+            models.Index(fields=['group', '-score', '-post'],
+                         name='post_score_group_idx'),
+        ]
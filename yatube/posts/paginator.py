@@ -0,0 +1,214 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+
+FORWARD = 'n'
+BACKWARD = 'p'
+# OFFSET в SQLite — 64-битное целое со знаком
+MAX_OFFSET = 2 ** 63 - 1
+
+
+class CursorPage(Page):
+    """Страница keyset-пагинации: знает только соседей, но не общее число
+    страниц."""
+
+    def __init__(self, object_list, number, paginator, cursor=None,
+                 has_next=False, has_previous=False):
+        super().__init__(object_list, number, paginator)
+        self.cursor = cursor
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        if self.cursor is not None:
+            return '<Page %s>' % self.cursor
+        return '<Page %s>' % self.number
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        return self.paginator.encode_cursor(FORWARD, self.object_list[-1])
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        return self.paginator.encode_cursor(BACKWARD, self.object_list[0])
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор по ключу сортировки (по умолчанию `(pub_date, id)`).
+
+    Страница выбирается условием `WHERE key < cursor ... LIMIT n + 1`,
+    поэтому глубина страницы не влияет на время запроса и `COUNT(*)`
+    не выполняется. Номер страницы `?page=N` поддерживается для старых
+    ссылок через `OFFSET`.
+    """
+
+    is_cursor = True
+
+    def __init__(self, object_list, per_page,
+                 ordering=('-pub_date', '-pk')):
+        super().__init__(object_list.order_by(*ordering), per_page)
+        self.ordering = tuple(ordering)
+        self.fields = [name.lstrip('-') for name in self.ordering]
+
+    @property
+    def last_cursor(self):
+        return self._encode(BACKWARD, None)
+
+    def encode_cursor(self, direction, obj):
+        # строки .values() — словари, в них должны быть поля сортировки
+        if isinstance(obj, dict):
+            values = [obj[name] for name in self.fields]
+        else:
+            values = [getattr(obj, name) for name in self.fields]
+        return self._encode(direction, values)
+
+    def _encode(self, direction, values):
+        if values is not None:
+            values = [value.isoformat() if hasattr(value, 'isoformat')
+                      else str(value) for value in values]
+        raw = json.dumps([direction, values]).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Возвращает `(direction, values)` или None для битого курсора."""
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direction, values = json.loads(raw.decode())
+        except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+            return None
+        if direction not in (FORWARD, BACKWARD):
+            return None
+        if values is None:
+            return direction, None
+        if not isinstance(values, list) or len(values) != len(self.fields):
+            return None
+        # курсор пишет значения строками; None и вложенные структуры
+        # сломали бы условие _after
+        if any(isinstance(value, bool)
+               or not isinstance(value, (str, int)) for value in values):
+            return None
+        model = self.object_list.model
+        try:
+            values = [
+                model._meta.pk.to_python(value) if name == 'pk'
+                else model._meta.get_field(name).to_python(value)
+                for name, value in zip(self.fields, values)
+            ]
+        except (ValidationError, TypeError, ValueError):
+            return None
+        if None in values:
+            return None
+        return direction, values
+
+    def get_page(self, number=None, cursor=None):
+        position = self.decode_cursor(cursor) if cursor else None
+        if position is not None:
+            return self.page_from(*position)
+        try:
+            number = max(int(number), 1)
+        except (TypeError, ValueError):
+            number = 1
+        return self.page_by_number(number)
+
+    def page_by_number(self, number):
+        """Страница по номеру; номер за концом ленты — последняя
+        страница, как у `Paginator.get_page`."""
+        queryset = self.object_list.order_by(*self.ordering)
+        number = min(number, (MAX_OFFSET - self.per_page) // self.per_page)
+        bottom = (number - 1) * self.per_page
+        items = list(queryset[bottom:bottom + self.per_page + 1])
+        if not items and number > 1:
+            # COUNT только для номеров за концом ленты
+            last = max(1, -(-queryset.count() // self.per_page))
+            return self.page_by_number(min(last, number - 1))
+        return CursorPage(items[:self.per_page], number, self,
+                          has_next=len(items) > self.per_page,
+                          has_previous=number > 1)
+
+    def window(self, direction, values):
+        """Запрос страницы после курсора (с запасом в одну строку)."""
+        return self.slice(self.object_list, self.ordering, direction, values)
+
+    def slice(self, queryset, ordering, direction, values):
+        if direction == BACKWARD:
+            ordering = tuple(self._flip(name) for name in ordering)
+        queryset = queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self._after(ordering, values))
+        return queryset[:self.per_page + 1]
+
+    def page_from(self, direction, values):
+        items = list(self.window(direction, values))
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        cursor = self._encode(direction, values)
+        if direction == BACKWARD:
+            items.reverse()
+            return CursorPage(items, None, self, cursor,
+                              has_next=values is not None,
+                              has_previous=has_more)
+        return CursorPage(items, None, self, cursor,
+                          has_next=has_more, has_previous=True)
+
+    def _flip(self, name):
+        return name[1:] if name.startswith('-') else '-' + name
+
+    def _after(self, ordering, values):
+        """Условие «строго после values» для составного ключа.
+
+        Лишнее условие на первое поле (`pub_date <= x`) позволяет базе
+        начать чтение индекса сразу с курсора, а не сканировать его
+        с начала.
+        """
+        condition = Q()
+        equal = {}
+        for name, value in zip(ordering, values):
+            field = name.lstrip('-')
+            lookup = '__lt' if name.startswith('-') else '__gt'
+            condition |= Q(**equal, **{field + lookup: value})
+            equal[field] = value
+        first = ordering[0]
+        lookup = '__lte' if first.startswith('-') else '__gte'
+        return Q(**{first.lstrip('-') + lookup: values[0]}) & condition
+
+
+ELLIPSIS = '…'
+
+
+def elided_page_range(paginator, number, on_each_side=3, on_ends=2):
+    """Номера страниц вокруг текущей и по краям, пропуски — `ELLIPSIS`.
+
+    Как `Paginator.get_elided_page_range` из Django 3.2: число ссылок
+    не зависит от числа страниц.
+    """
+    num_pages = paginator.num_pages
+    if num_pages <= (on_each_side + on_ends) * 2:
+        return list(paginator.page_range)
+    pages = []
+    if number > 1 + on_each_side + on_ends + 1:
+        pages.extend(range(1, on_ends + 1))
+        pages.append(ELLIPSIS)
+        pages.extend(range(number - on_each_side, number + 1))
+    else:
+        pages.extend(range(1, number + 1))
+    if number < num_pages - on_each_side - on_ends - 1:
+        pages.extend(range(number + 1, number + on_each_side + 1))
+        pages.append(ELLIPSIS)
+        pages.extend(range(num_pages - on_ends + 1, num_pages + 1))
+    else:
+        pages.extend(range(number + 1, num_pages + 1))
+    return pages
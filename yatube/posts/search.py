@@ -0,0 +1,148 @@
+"""Полнотекстовый поиск по постам.
+
+Индекс — таблица SQLite FTS5 `posts_post_fts` с основами слов текста
+поста (rowid совпадает с id поста). Она обновляется задачей
+`posts.index` (см. `posts.tasks`) после сохранения и удаления поста.
+Команда `rebuild_search_index` строит индекс заново. На других базах
+поиск работает через LIKE.
+
+bm25 приходится считать для каждого совпадения, поэтому ранжируются
+только `SEARCH_RANK_WINDOW` самых свежих найденных постов: время
+запроса не растет вместе с числом совпадений.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+from .stemmer import stems
+
+TABLE = 'posts_post_fts'
+RANK_WINDOW = getattr(settings, 'SEARCH_RANK_WINDOW', 1000)
+
+
+def available():
+    return connection.vendor == 'sqlite'
+
+
+def document(text):
+    return ' '.join(stems(text))
+
+
+def match_expression(query):
+    """Запрос FTS5: все основы слов через И, с поиском по префиксу.
+
+    Основы состоят только из букв и цифр, поэтому кавычки защищают
+    от синтаксиса FTS5 в пользовательском вводе.
+    """
+    return ' '.join('"%s"*' % word for word in stems(query))
+
+
+def reindex(post_ids):
+    """Обновляет индекс для постов `post_ids`; удаленные посты из него
+    выбрасываются."""
+    if not available():
+        return
+    post_ids = list(post_ids)
+    rows = Post.objects.filter(pk__in=post_ids).values_list('pk', 'text')
+    with connection.cursor() as cursor:
+        cursor.executemany('DELETE FROM %s WHERE rowid = %%s' % TABLE,
+                           [(pk,) for pk in post_ids])
+        cursor.executemany('INSERT INTO %s (rowid, body) VALUES (%%s, %%s)'
+                           % TABLE, [(pk, document(text))
+                                     for pk, text in rows])
+
+
+def rebuild(batch_size=5000):
+    # одна транзакция: в autocommit каждая вставка ждала бы записи на диск
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('DELETE FROM %s' % TABLE)
+        rows = Post.objects.order_by().values_list('pk', 'text').iterator(
+            chunk_size=batch_size)
+        batch = []
+        for pk, text in rows:
+            batch.append((pk, document(text)))
+            if len(batch) == batch_size:
+                cursor.executemany('INSERT INTO %s (rowid, body) VALUES '
+                                   '(%%s, %%s)' % TABLE, batch)
+                batch = []
+        if batch:
+            cursor.executemany('INSERT INTO %s (rowid, body) VALUES '
+                               '(%%s, %%s)' % TABLE, batch)
+        cursor.execute("INSERT INTO %s (%s) VALUES ('optimize')"
+                       % (TABLE, TABLE))
+
+
+def matching_ids(query):
+    """Подзапрос с id найденных постов, для `filter(pk__in=...)`."""
+    return RawSQL('SELECT rowid FROM %s WHERE %s MATCH %%s' % (TABLE, TABLE),
+                  [match_expression(query)])
+
+
+class SearchResults:
+    """Результаты поиска, отсортированные по bm25, для Paginator.
+
+    Страница — один запрос к индексу с LIMIT/OFFSET и один `in_bulk`
+    за постами этой страницы.
+    """
+
+    def __init__(self, query, queryset=None, window=RANK_WINDOW):
+        self.match = match_expression(query)
+        if queryset is None:
+            queryset = Post.objects.for_feed()
+        self.queryset = queryset
+        self.window = window
+        self._count = None
+
+    def count(self):
+        if not self.match:
+            return 0
+        if self._count is None:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT COUNT(*) FROM (SELECT 1 FROM %s WHERE %s '
+                    'MATCH %%s ORDER BY rowid DESC LIMIT %%s)'
+                    % (TABLE, TABLE), [self.match, self.window])
+                self._count = cursor.fetchone()[0]
+        return self._count
+
+    @property
+    def capped(self):
+        return self.count() >= self.window
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        if not self.match:
+            return []
+        start = key.start or 0
+        with connection.cursor() as cursor:
+            # нижняя граница rowid отсекает все, что старше окна
+            cursor.execute(
+                'SELECT rowid FROM {table} WHERE {table} MATCH %s '
+                'AND rowid >= COALESCE((SELECT rowid FROM {table} '
+                'WHERE {table} MATCH %s ORDER BY rowid DESC '
+                'LIMIT 1 OFFSET %s), 0) '
+                'ORDER BY bm25({table}), rowid DESC LIMIT %s OFFSET %s'
+                .format(table=TABLE),
+                [self.match, self.match, self.window - 1,
+                 key.stop - start, start])
+            ids = [row[0] for row in cursor.fetchall()]
+        posts = self.queryset.in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+def search(query):
+    if available():
+        return SearchResults(query)
+    words = query.split()
+    if not words:
+        return Post.objects.none()
+    condition = Q()
+    for word in words:
+        condition &= Q(text__icontains=word)
+    return Post.objects.for_feed().filter(condition)
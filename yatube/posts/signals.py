@@ -0,0 +1,138 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core import tasks
+
+from . import cache, counters, timeline, trending
+from .models import AuthorStats, Comment, Follow, Group, Post
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_feeds(sender, instance, **kwargs):
+    cache.bump(*cache.post_scopes(instance))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group(sender, instance, **kwargs):
+    # slug мог перейти к другой группе, а заголовок и описание есть
+    # на странице группы; старый slug дальше не найдет группу во view
+    cache.forget_id(Group, instance.slug)
+    cache.bump('group:%s' % instance.pk, 'groups')
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_user(sender, instance, **kwargs):
+    cache.forget_id(sender, instance.username)
+    cache.bump('profile:%s' % instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comments(sender, instance, **kwargs):
+    # в лентах показывается число комментариев поста
+    try:
+        cache.bump(*cache.post_scopes(instance.post))
+    except Post.DoesNotExist:
+        cache.bump('post:%s' % instance.post_id)
+
+
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, **kwargs):
+    if created:
+        counters.add_author(instance.author_id, 'posts_count', 1)
+        counters.add_group(instance.group_id, 1)
+        counters.touch_group(instance.group_id, latest_post=instance,
+                             moment=instance.pub_date)
+    elif instance.group_id != instance.loaded_group_id:
+        counters.add_group(instance.loaded_group_id, -1)
+        counters.add_group(instance.group_id, 1)
+        # перенесенный пост мог быть последним в старой группе и не
+        # быть самым новым в новой
+        counters.touch_group(instance.loaded_group_id)
+        counters.touch_group(instance.group_id)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    counters.add_author(instance.author_id, 'posts_count', -1)
+    counters.add_group(instance.group_id, -1)
+    counters.touch_group(instance.group_id)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, **kwargs):
+    if created:
+        counters.add(Post.objects.filter(pk=instance.post_id),
+                     'comments_count', 1, updated=timezone.now())
+        counters.add_author(instance.author_id, 'comments_count', 1)
+        counters.touch_post_group(instance.post_id, instance.created)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    counters.add(Post.objects.filter(pk=instance.post_id),
+                 'comments_count', -1, updated=timezone.now())
+    counters.add_author(instance.author_id, 'comments_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def score_comment(sender, instance, created, **kwargs):
+    if created:
+        trending.add_comment(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def unscore_comment(sender, instance, **kwargs):
+    trending.remove_comment(instance)
+
+
+@receiver(post_save, sender=Post)
+def move_post_score(sender, instance, created, **kwargs):
+    if not created and instance.group_id != instance.loaded_group_id:
+        trending.move_post(instance)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def create_author_stats(sender, instance, created, **kwargs):
+    if created:
+        AuthorStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def index_post(sender, instance, **kwargs):
+    tasks.enqueue('posts.index', post_id=instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def build_thumbnail(sender, instance, **kwargs):
+    if instance.image_changed and instance.image:
+        tasks.enqueue('posts.thumbnail', post_id=instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    if created:
+        tasks.enqueue('posts.fan_out', post_id=instance.pk)
+
+
+@receiver(post_save, sender=Follow)
+def follow_author(sender, instance, created, **kwargs):
+    if created:
+        counters.add_author(instance.author_id, 'followers_count', 1)
+        cache.bump('profile:%s' % instance.author_id)
+        timeline.mark_popular(instance.author_id)
+        tasks.enqueue('posts.backfill', user_id=instance.user_id,
+                      author_id=instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def unfollow_author(sender, instance, **kwargs):
+    counters.add_author(instance.author_id, 'followers_count', -1)
+    cache.bump('profile:%s' % instance.author_id)
+    timeline.forget(instance.user_id, instance.author_id)
@@ -0,0 +1,114 @@
+"""Стеммер русского языка по алгоритму Snowball (Портер).
+
+Используется поисковым индексом: в индекс и в запрос попадают основы
+слов, поэтому «котами» находит «кот» и «коты».
+"""
+import re
+
+VOWELS = 'аеиоуыэюя'
+WORD_RE = re.compile(r'\w+')
+
+PERFECTIVE_GERUND = (
+    (('в', 'вши', 'вшись'), True),
+    (('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'), False),
+)
+ADJECTIVE = ((
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+    'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+    'ая', 'яя', 'ою', 'ею',
+), False),
+PARTICIPLE = (
+    (('ем', 'нн', 'вш', 'ющ', 'щ'), True),
+    (('ивш', 'ывш', 'ующ'), False),
+)
+REFLEXIVE = (('ся', 'сь'), False),
+VERB = (
+    (('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но',
+      'ет', 'ют', 'ны', 'ть', 'ешь', 'нно'), True),
+    (('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей',
+      'уй', 'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят', 'ует',
+      'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'), False),
+)
+NOUN = ((
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и',
+    'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам', 'ом', 'о',
+    'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия', 'ья', 'я',
+), False),
+DERIVATIONAL = ('ост', 'ость')
+SUPERLATIVE = (('ейш', 'ейше'), False),
+
+
+def _strip(word, groups):
+    """Отрезает самое длинное подходящее окончание или возвращает None.
+
+    В группах с флагом окончание засчитывается, только если перед ним
+    стоит «а» или «я».
+    """
+    best = None
+    for suffixes, after_a in groups:
+        for suffix in suffixes:
+            if not word.endswith(suffix):
+                continue
+            if after_a and not word[:-len(suffix)].endswith(('а', 'я')):
+                continue
+            if best is None or len(suffix) > len(best):
+                best = suffix
+    return None if best is None else word[:-len(best)]
+
+
+def _region(word, start=0):
+    for i in range(start + 1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            return i + 1
+    return len(word)
+
+
+def _step1(rv):
+    stem = _strip(rv, PERFECTIVE_GERUND)
+    if stem is not None:
+        return stem
+    stem = _strip(rv, REFLEXIVE)
+    if stem is not None:
+        rv = stem
+    stem = _strip(rv, ADJECTIVE)
+    if stem is not None:
+        participle = _strip(stem, PARTICIPLE)
+        return stem if participle is None else participle
+    for groups in (VERB, NOUN):
+        stem = _strip(rv, groups)
+        if stem is not None:
+            return stem
+    return rv
+
+
+def _step4(rv):
+    if rv.endswith('нн'):
+        return rv[:-1]
+    stem = _strip(rv, SUPERLATIVE)
+    if stem is not None:
+        return stem[:-1] if stem.endswith('нн') else stem
+    if rv.endswith('ь'):
+        return rv[:-1]
+    return rv
+
+
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    start = next((i + 1 for i, char in enumerate(word) if char in VOWELS),
+                 None)
+    if start is None:
+        return word
+    prefix, rv = word[:start], word[start:]
+    rv = _step1(rv)
+    if rv.endswith('и'):
+        rv = rv[:-1]
+    r2 = max(_region(word, _region(word)) - start, 0)
+    for suffix in DERIVATIONAL:
+        if rv.endswith(suffix) and len(rv) - len(suffix) >= r2:
+            rv = rv[:-len(suffix)]
+            break
+    return prefix + _step4(rv)
+
+
+def stems(text):
+    return [stem(word) for word in WORD_RE.findall(text)]
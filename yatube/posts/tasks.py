@@ -0,0 +1,35 @@
+"""Побочные работы записи постов, вынесенные в очередь `core.tasks`.
+
+Счетчики и сброс кэша остаются в сигналах: они должны меняться в одной
+транзакции с записью. Индекс поиска, миниатюры и ленты подписчиков
+обновляются воркером через долю секунды после ответа.
+"""
+from core.tasks import task
+
+from . import search, thumbnails, timeline
+from .models import Follow, Post
+
+
+@task('posts.index', batch=True)
+def index_posts(items):
+    search.reindex({item['post_id'] for item in items})
+
+
+@task('posts.thumbnail')
+def build_thumbnail(post_id):
+    thumbnails.build(post_id)
+
+
+@task('posts.fan_out')
+def fan_out(post_id):
+    post = Post.objects.filter(pk=post_id).only(
+        'pk', 'author', 'pub_date').first()
+    if post is not None:
+        timeline.fan_out(post)
+
+
+@task('posts.backfill')
+def backfill(user_id, author_id):
+    # подписку могли отменить, пока задача ждала в очереди
+    if Follow.objects.filter(user_id=user_id, author_id=author_id).exists():
+        timeline.backfill(user_id, author_id)
@@ -0,0 +1,34 @@
+from django import template
+
+from posts import cache
+
+register = template.Library()
+
+
+class FeedCacheNode(template.Node):
+    def __init__(self, nodelist, key):
+        self.nodelist = nodelist
+        self.key = key
+
+    def render(self, context):
+        key = self.key.resolve(context)
+        if not key:
+            return self.nodelist.render(context)
+        return cache.get_or_render(key, lambda: self.nodelist.render(context))
+
+
+@register.tag('feedcache')
+def do_feedcache(parser, token):
+    """{% feedcache feed_key %}...{% endfeedcache %}
+
+    Кэширует фрагмент под ключом из `posts.cache.feed_key`: ключ уже
+    содержит поколение ленты, поэтому запись поста или комментария
+    сразу делает старый фрагмент недостижимым.
+    """
+    bits = token.split_contents()
+    if len(bits) != 2:
+        raise template.TemplateSyntaxError(
+            "'%s' tag requires exactly one argument." % bits[0])
+    nodelist = parser.parse(('endfeedcache',))
+    parser.delete_first_token()
+    return FeedCacheNode(nodelist, parser.compile_filter(bits[1]))
@@ -0,0 +1,12 @@
+from django import template
+
+from posts.paginator import elided_page_range
+
+register = template.Library()
+
+
+@register.filter
+def page_window(page_obj):
+    """{% for i in page_obj|page_window %}: окно номеров страниц вместо
+    всего `paginator.page_range`; пропуск приходит строкой «…»."""
+    return elided_page_range(page_obj.paginator, page_obj.number)
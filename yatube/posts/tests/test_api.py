@@ -0,0 +1,120 @@
+import base64
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class ApiTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.group = Group.objects.create(title='Группа', slug='group',
+                                          description='Описание')
+        self.posts = [
+            Post.objects.create(author=self.author, text='Пост %d' % number,
+                                group=self.group if number % 2 else None)
+            for number in range(5)
+        ]
+        self.client = Client()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def send(self, client, method, url, data):
+        return getattr(client, method)(url, json.dumps(data),
+                                       content_type='application/json')
+
+    def test_list_pages_with_one_query(self):
+        """Список листается курсором, страница — один запрос"""
+        url = reverse('posts:api_posts')
+        texts = []
+        cursor = ''
+        while cursor is not None:
+            with self.assertNumQueries(1):
+                data = self.client.get(url, {'limit': 2, 'cursor': cursor,
+                                             'fields': 'id,text'}).json()
+            texts.extend(post['text'] for post in data['results'])
+            cursor = data['next']
+        self.assertEqual(texts, ['Пост %d' % n for n in reversed(range(5))])
+        self.assertEqual(set(data['results'][0]), {'id', 'text'})
+
+    def test_crafted_cursor(self):
+        """Курсор с неверными типами значений — 400, а не 500"""
+        url = reverse('posts:api_posts')
+        for values in ([123, 1], [None, 1]):
+            cursor = base64.urlsafe_b64encode(
+                json.dumps(['n', values]).encode()).decode()
+            response = self.client.get(url, {'cursor': cursor})
+            self.assertEqual(response.status_code, 400)
+
+    def test_filters_and_batch(self):
+        """Фильтр по группе, пакет по ids и проверка полей"""
+        url = reverse('posts:api_posts')
+        data = self.client.get(url, {'group': 'group'}).json()
+        self.assertEqual(len(data['results']), 2)
+        self.assertEqual(data['results'][0]['group'], 'group')
+        ids = [self.posts[3].pk, self.posts[0].pk, 999]
+        with self.assertNumQueries(1):
+            data = self.client.get(
+                url, {'ids': ','.join(map(str, ids))}).json()
+        self.assertEqual([post['id'] for post in data['results']], ids[:2])
+        self.assertEqual(self.client.get(url, {'fields': 'password'})
+                         .status_code, 400)
+        for ids in ('1,x', '99999999999999999999', '-1'):
+            self.assertEqual(self.client.get(url, {'ids': ids})
+                             .status_code, 400)
+
+    def test_create_edit_comment(self):
+        """Создание, правка и комментарий: права и валидация"""
+        url = reverse('posts:api_posts')
+        self.assertEqual(self.send(self.client, 'post', url,
+                                   {'text': 'Новый'}).status_code, 401)
+        response = self.send(self.author_client, 'post', url,
+                             {'text': 'Новый', 'group': 'group'})
+        self.assertEqual(response.status_code, 201)
+        created = response.json()
+        self.assertEqual((created['author'], created['group']),
+                         ('author', 'group'))
+        post_url = reverse('posts:api_post', args=[created['id']])
+        response = self.send(self.author_client, 'patch', post_url,
+                             {'text': 'Исправленный'})
+        self.assertEqual(response.json()['text'], 'Исправленный')
+        self.assertEqual(response.json()['group'], 'group')
+        other = Client()
+        other.force_login(User.objects.create_user(username='other'))
+        self.assertEqual(self.send(other, 'patch', post_url,
+                                   {'text': 'Чужой'}).status_code, 403)
+        self.assertEqual(self.send(self.author_client, 'patch', post_url,
+                                   {'text': ''}).status_code, 400)
+        comments_url = reverse('posts:api_comments', args=[created['id']])
+        response = self.send(other, 'post', comments_url,
+                             {'text': 'Комментарий'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Comment.objects.get().author.username, 'other')
+        data = self.client.get(comments_url).json()
+        self.assertEqual(data['results'][0]['text'], 'Комментарий')
+
+    def test_patch_form_and_unsupported_type(self):
+        """PATCH формой правит пост, другие типы тела — 415"""
+        url = reverse('posts:api_post', args=[self.posts[0].pk])
+        response = self.author_client.patch(
+            url, 'text=%D0%A4%D0%BE%D1%80%D0%BC%D0%B0',
+            content_type='application/x-www-form-urlencoded')
+        self.assertEqual(response.json()['text'], 'Форма')
+        response = self.author_client.patch(url, 'text',
+                                            content_type='text/plain')
+        self.assertEqual(response.status_code, 415)
+
+    def test_groups(self):
+        """Список групп со счетчиком и 404 для неизвестной"""
+        data = self.client.get(reverse('posts:api_groups')).json()
+        self.assertEqual(data['results'][0]['posts_count'], 2)
+        response = self.client.get(reverse('posts:api_group',
+                                           args=['missing']))
+        self.assertEqual(response.status_code, 404)
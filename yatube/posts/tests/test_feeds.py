@@ -0,0 +1,64 @@
+import json
+from xml.etree import ElementTree
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Group, Post
+
+User = get_user_model()
+
+ATOM = '{http://www.w3.org/2005/Atom}'
+
+
+class FeedsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.group = Group.objects.create(title='Группа <&>', slug='group',
+                                          description='Описание')
+        Post.objects.bulk_create([
+            Post(author=self.author, text='Пост %d <b>' % number,
+                 group=self.group if number % 2 else None)
+            for number in range(5)
+        ])
+        self.client = Client()
+
+    def content(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_formats(self):
+        """Лента отдается в Atom, RSS и JSON Feed"""
+        url = reverse('posts:index_feed', args=['atom'])
+        atom = ElementTree.fromstring(self.content(self.client.get(url)))
+        self.assertEqual(len(atom.findall(ATOM + 'entry')), 5)
+        url = reverse('posts:index_feed', args=['rss'])
+        rss = ElementTree.fromstring(self.content(self.client.get(url)))
+        self.assertEqual(len(rss.findall('channel/item')), 5)
+        url = reverse('posts:profile_feed', args=['author', 'json'])
+        data = json.loads(self.content(self.client.get(url)))
+        self.assertEqual(len(data['items']), 5)
+        self.assertTrue(data['items'][0]['title'].startswith('Пост'))
+
+    def test_group_feed_and_limit(self):
+        """Лента группы с тегом группы и ?limit="""
+        url = reverse('posts:group_feed', args=['group', 'json'])
+        data = json.loads(self.content(self.client.get(url, {'limit': 1})))
+        self.assertEqual(len(data['items']), 1)
+        self.assertEqual(data['items'][0]['tags'], ['Группа <&>'])
+
+    def test_cached_and_not_modified(self):
+        """Лента из кэша без запросов, 304 до новой записи"""
+        url = reverse('posts:index_feed', args=['atom'])
+        first = self.client.get(url)
+        body = self.content(first)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).content, body)
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        Post.objects.create(author=self.author, text='Новый пост')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Новый пост'.encode(), self.content(response))
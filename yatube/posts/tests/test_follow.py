@@ -0,0 +1,83 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import timeline
+from ..models import AuthorStats, Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+# ленты подписок заполняются задачами: здесь они выполняются сразу
+@override_settings(TASKS_EAGER=True)
+class FollowTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def follow(self, author):
+        self.client.get(reverse('posts:profile_follow',
+                                kwargs={'username': author.username}))
+
+    def feed(self, **params):
+        response = self.client.get(reverse('posts:follow_index'), params)
+        return response.context['page_obj']
+
+    def test_follow_and_unfollow(self):
+        """Подписка на себя запрещена, отписка чистит ленту"""
+        old = Post.objects.create(author=self.author, text='До подписки')
+        self.follow(self.author)
+        self.follow(self.reader)
+        self.assertEqual(
+            list(Follow.objects.values_list('user', 'author')),
+            [(self.reader.pk, self.author.pk)],
+        )
+        self.assertEqual(AuthorStats.objects.get(
+            user=self.author).followers_count, 1)
+        self.assertEqual(list(self.feed()), [old])
+        self.client.get(reverse('posts:profile_unfollow',
+                                kwargs={'username': self.author.username}))
+        self.assertFalse(Follow.objects.exists())
+        self.assertEqual(list(self.feed()), [])
+
+    def test_new_post_fanned_out_to_followers(self):
+        """Новый пост раскладывается только подписчикам"""
+        stranger = User.objects.create_user(username='stranger')
+        self.follow(self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertEqual(list(self.feed()), [post])
+        self.assertFalse(TimelineEntry.objects.filter(user=stranger).exists())
+
+    def test_popular_author_read_on_demand(self):
+        """Посты популярного автора читаются при показе ленты"""
+        other = User.objects.create_user(username='other')
+        self.follow(other)
+        with mock.patch.object(timeline, 'FANOUT_LIMIT', 0):
+            self.follow(self.author)
+        self.assertTrue(AuthorStats.objects.get(user=self.author).pull_feed)
+        posts = [
+            Post.objects.create(author=author, text='Пост %d' % i)
+            for i, author in enumerate([self.author, other] * 3)
+        ]
+        self.assertFalse(TimelineEntry.objects.filter(
+            author=self.author).exists())
+        with mock.patch('posts.views.POSTS_PER_PAGE', 4):
+            first = self.feed()
+            second = self.feed(cursor=first.next_cursor)
+        self.assertEqual(list(first) + list(second), posts[::-1])
+
+    def test_query_count_does_not_depend_on_followees(self):
+        """Число запросов ленты не зависит от числа подписок"""
+        for count in (1, 20):
+            for i in range(count):
+                author = User.objects.create_user(
+                    username='author%d-%d' % (count, i))
+                Follow.objects.create(user=self.reader, author=author)
+                Post.objects.create(author=author, text='Пост')
+            # сессия, пользователь, авторы с pull_feed, страница ленты
+            with self.assertNumQueries(4):
+                self.feed()
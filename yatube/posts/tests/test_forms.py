@@ -1,12 +1,24 @@
+import io
+import shutil
+import tempfile
+from unittest import mock
+
+from PIL import Image
+
+from .. import uploads
+from ..forms import PostForm
 from ..models import Group, Post
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
 
 User = get_user_model()
 
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
 
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class PostCreateFormTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -19,6 +31,11 @@ class PostCreateFormTests(TestCase):
 
         )
 
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
     def setUp(self):
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
@@ -54,7 +71,8 @@ class PostCreateFormTests(TestCase):
         last_post = Post.objects.latest('id')
         self.assertEqual(last_post.text, form_data['text'])
         self.assertEqual(last_post.group.id, form_data['group'])
-        self.assertEqual(last_post.image.name.split('/')[1].split('_')[0],
+        stem = last_post.image.name.split('/')[1].split('.')[0]
+        self.assertEqual(stem.split('_')[0],
                          form_data['image'].name.split('.')[0])
         self.assertEqual(last_post.author,
                          PostCreateFormTests.user)
@@ -78,3 +96,50 @@ class PostCreateFormTests(TestCase):
         )
         edited_post = Post.objects.get(id=post.id)
         self.assertEqual(edited_post.text, edited_form_data['text'])
+
+    def image_file(self, name, size):
+        content = io.BytesIO()
+        Image.new('RGB', size).save(content, 'PNG')
+        return SimpleUploadedFile(name, content.getvalue(),
+                                  content_type='image/png')
+
+    def test_too_many_pixels_rejected(self):
+        """Картинка с огромными размерами отклоняется по заголовку"""
+        posts_count = Post.objects.count()
+        with mock.patch.object(uploads, 'MAX_PIXELS', 100):
+            response = self.authorized_client.post(
+                reverse('posts:post_create'),
+                data={'text': 'Большая картинка',
+                      'image': self.image_file('big.png', (20, 20))},
+            )
+        self.assertFormError(
+            response, 'form', 'image',
+            'Слишком большая картинка: 20×20, допустимо не больше '
+            '100 пикселей.')
+        self.assertEqual(Post.objects.count(), posts_count)
+
+    def test_too_large_file_rejected_while_streaming(self):
+        """Слишком большой файл обрывается обработчиком загрузки"""
+        handler = uploads.LimitedImageUploadHandler()
+        handler.new_file('image', 'big.png', 'image/png', None)
+        with mock.patch.object(uploads, 'MAX_BYTES', 10):
+            handler.receive_data_chunk(b'x' * 20, 0)
+        rejected = handler.file_complete(20)
+        self.assertIsInstance(rejected, uploads.RejectedUpload)
+        form = PostForm(data={'text': 'Текст'}, files={'image': rejected})
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors['image'], ['Файл больше 10\xa0байт.'])
+
+    def test_admin_shows_upload_limit(self):
+        """Админка показывает причину отказа, а не «файл пуст»"""
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        self.authorized_client.force_login(admin)
+        with mock.patch.object(uploads, 'MAX_BYTES', 10):
+            response = self.authorized_client.post(
+                reverse('admin:posts_post_add'),
+                data={'text': 'Текст', 'author': admin.pk,
+                      'image': self.image_file('big.png', (20, 20))},
+            )
+        self.assertEqual(
+            response.context['adminform'].form.errors['image'],
+            ['Файл больше 10\xa0байт.'])
@@ -0,0 +1,87 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import counters
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class GroupSummaryTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='author')
+        self.first = Group.objects.create(title='Первая', slug='first',
+                                          description='Описание')
+        self.second = Group.objects.create(title='Вторая', slug='second',
+                                           description='Описание')
+
+    def summary(self, group):
+        group.refresh_from_db()
+        return group.posts_count, group.latest_post_id
+
+    def test_signals_keep_summary(self):
+        """Создание, комментарий, перенос и удаление поста меняют сводку"""
+        old = Post.objects.create(author=self.user, text='Старый',
+                                  group=self.first)
+        new = Post.objects.create(author=self.user, text='Новый',
+                                  group=self.first)
+        self.assertEqual(self.summary(self.first), (2, new.pk))
+        comment = Comment.objects.create(post=old, author=self.user,
+                                         text='Да')
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.last_activity, comment.created)
+        new.group = self.second
+        new.save()
+        self.assertEqual(self.summary(self.first), (1, old.pk))
+        self.assertEqual(self.summary(self.second), (1, new.pk))
+        new.delete()
+        self.assertEqual(self.summary(self.second), (0, None))
+
+    def test_recount_rebuilds_summary(self):
+        """recount собирает сводку заново из постов и комментариев"""
+        post = Post.objects.create(author=self.user, text='Пост',
+                                   group=self.first)
+        moment = post.pub_date + timedelta(hours=1)
+        Comment.objects.create(post=post, author=self.user, text='Да')
+        Comment.objects.update(created=moment)
+        Group.objects.update(posts_count=0, latest_post=None,
+                             last_activity=moment - timedelta(days=1))
+        counters.recount()
+        self.assertEqual(self.summary(self.first), (1, post.pk))
+        self.assertEqual(self.first.last_activity, moment)
+
+
+class GroupDirectoryTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='author')
+        Group.objects.bulk_create(
+            Group(title='Группа %02d' % number, slug='group-%d' % number,
+                  description='')
+            for number in range(60))
+        self.active = Group.objects.get(slug='group-7')
+        self.post = Post.objects.create(author=self.user, text='Свежий пост',
+                                        group=self.active)
+
+    def test_directory(self):
+        """Каталог читает сводку одним запросом и обновляется по поколению"""
+        url = reverse('posts:groups')
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        page = list(response.context['page_obj'])
+        self.assertEqual(len(page), 50)
+        self.assertEqual(page[0], self.active)
+        self.assertContains(response, 'Свежий пост')
+        response = self.client.get(url, {'sort': 'title'})
+        self.assertEqual(response.context['page_obj'][0].title, 'Группа 00')
+        self.assertContains(response, 'sort=title&amp;cursor=')
+        with self.assertNumQueries(0):
+            self.client.get(url)
+        self.post.text = 'Исправленный пост'
+        self.post.save()
+        self.assertContains(self.client.get(url), 'Исправленный пост')
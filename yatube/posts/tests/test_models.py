@@ -1,9 +1,18 @@
+import shutil
+import tempfile
+from io import StringIO
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase
-from ..models import Group, Post
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from .. import thumbnails
+from ..models import AuthorStats, Comment, Group, Post
 
 User = get_user_model()
 
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
 
 class PostModelTest(TestCase):
     @classmethod
@@ -37,3 +46,108 @@ class GroupModelTest(TestCase):
         group = GroupModelTest.group
         group_object_name = str(group)
         self.assertEqual(group_object_name, group.title)
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='counted')
+        cls.group = Group.objects.create(title='Первая', slug='first')
+        cls.other_group = Group.objects.create(title='Вторая', slug='second')
+
+    def assertCounters(self, author_posts, first, second):
+        self.assertEqual(AuthorStats.objects.get(user=self.user).posts_count,
+                         author_posts)
+        self.assertEqual(Group.objects.get(pk=self.group.pk).posts_count,
+                         first)
+        self.assertEqual(
+            Group.objects.get(pk=self.other_group.pk).posts_count, second)
+
+    def test_post_counters(self):
+        """Счетчики постов меняются при создании, переносе и удалении"""
+        post = Post.objects.create(author=self.user, group=self.group,
+                                   text='Пост')
+        self.assertCounters(1, 1, 0)
+        post.group = self.other_group
+        post.save()
+        self.assertCounters(1, 0, 1)
+        post.delete()
+        self.assertCounters(0, 0, 0)
+
+    def test_comment_counters(self):
+        """Счетчик комментариев поста и автора"""
+        post = Post.objects.create(author=self.user, text='Пост')
+        comment = Comment.objects.create(post=post, author=self.user,
+                                         text='Коммент')
+        self.assertEqual(Post.objects.get(pk=post.pk).comments_count, 1)
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.user).comments_count, 1)
+        comment.delete()
+        self.assertEqual(Post.objects.get(pk=post.pk).comments_count, 0)
+
+    def test_recount_repairs_drift(self):
+        """Команда recount_counters чинит счетчики после bulk-операций"""
+        Post.objects.bulk_create([
+            Post(author=self.user, group=self.group, text='Пост')
+            for i in range(3)
+        ])
+        self.assertCounters(0, 0, 0)
+        call_command('recount_counters', stdout=StringIO())
+        self.assertCounters(3, 3, 0)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='painter')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def image(self, name):
+        small_gif = (
+            b'\x47\x49\x46\x38\x39\x61\x01\x00\x01\x00\x00\x00\x00\x21\xf9\x04'
+            b'\x01\x0a\x00\x01\x00\x2c\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02'
+            b'\x02\x4c\x01\x00\x3b'
+        )
+        return SimpleUploadedFile(name=name, content=small_gif,
+                                  content_type='image/gif')
+
+    def test_build_stores_thumbnail(self):
+        """Миниатюра строится заранее и хранится в посте"""
+        post = Post.objects.create(author=self.user, text='С картинкой',
+                                   image=self.image('thumb.gif'))
+        self.assertTrue(thumbnails.build(post.pk))
+        post = Post.objects.get(pk=post.pk)
+        self.assertTrue(post.thumbnail_url)
+        self.assertEqual((post.thumbnail_width, post.thumbnail_height),
+                         (960, 339))
+
+    def test_new_image_resets_thumbnail(self):
+        """Замена картинки сбрасывает старую миниатюру"""
+        post = Post.objects.create(author=self.user, text='С картинкой',
+                                   image=self.image('first.gif'))
+        thumbnails.build(post.pk)
+        post = Post.objects.get(pk=post.pk)
+        post.image = self.image('second.gif')
+        post.save()
+        self.assertEqual(Post.objects.get(pk=post.pk).thumbnail_url, '')
+        post.text = 'Только текст'
+        post.save()
+        thumbnails.build(post.pk)
+        post = Post.objects.get(pk=post.pk)
+        post.text = 'Снова текст'
+        post.save()
+        self.assertNotEqual(Post.objects.get(pk=post.pk).thumbnail_url, '')
+
+    def test_backfill_command(self):
+        """Команда build_thumbnails достраивает миниатюры"""
+        post = Post.objects.create(author=self.user, text='С картинкой',
+                                   image=self.image('old.gif'))
+        call_command('build_thumbnails', workers=1, stdout=StringIO())
+        self.assertTrue(Post.objects.get(pk=post.pk).thumbnail_url)
@@ -1,7 +1,15 @@
+import base64
+import json
+
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from ..models import Group, Post
+from ..paginator import ELLIPSIS, elided_page_range
 
 User = get_user_model()
 
@@ -21,6 +29,7 @@ class TaskPagesTests(TestCase):
                                  group=cls.group) for i in range(13)])
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
 
     def test_first_page_contains_ten_records(self):
@@ -50,3 +59,66 @@ class TaskPagesTests(TestCase):
             with self.subTest(url=url):
                 response = self.guest_client.get(url + '?page=2')
                 self.assertEqual(len(response.context['page_obj']), 3)
+
+    def test_cursor_pages(self):
+        """Курсор ведет на следующую страницу и обратно"""
+        url = reverse('posts:index')
+        first = self.guest_client.get(url).context['page_obj']
+        response = self.guest_client.get(url, {'cursor': first.next_cursor})
+        second = response.context['page_obj']
+        self.assertEqual(len(second), 3)
+        self.assertFalse(second.has_next())
+        response = self.guest_client.get(url,
+                                         {'cursor': second.previous_cursor})
+        self.assertEqual(list(response.context['page_obj']), list(first))
+
+    def test_feed_does_not_count_posts(self):
+        """Лента не считает все посты и не использует OFFSET"""
+        url = reverse('posts:index')
+        first = self.guest_client.get(url).context['page_obj']
+        with CaptureQueriesContext(connection) as queries:
+            self.guest_client.get(url, {'cursor': first.next_cursor})
+        for query in queries.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'].upper())
+            self.assertNotIn('OFFSET', query['sql'].upper())
+
+    def test_huge_page_number_shows_last_page(self):
+        """Номер страницы за концом ленты — последняя страница, а не 500"""
+        huge = '99999999999999999999'
+        for url in (reverse('posts:index'),
+                    reverse('posts:group', args=['test-slug']),
+                    reverse('posts:profile', args=['author'])):
+            response = self.guest_client.get(url, {'page': huge})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.context['page_obj'].number, 2)
+            self.assertEqual(len(response.context['page_obj']), 3)
+        response = self.guest_client.get(reverse('posts:groups'),
+                                         {'page': huge})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['page_obj']), [self.group])
+
+    def test_broken_cursor_shows_first_page(self):
+        """Битый курсор не ломает страницу"""
+        response = self.guest_client.get(reverse('posts:index'),
+                                         {'cursor': 'broken'})
+        self.assertEqual(len(response.context['page_obj']), 10)
+
+    def test_crafted_cursor_shows_first_page(self):
+        """Курсор с числами, null и лишними значениями — первая страница"""
+        for values in ([123, 1], [None, 1], [[1], 1], ['x'], True):
+            cursor = base64.urlsafe_b64encode(
+                json.dumps(['n', values]).encode()).decode()
+            response = self.guest_client.get(reverse('posts:index'),
+                                             {'cursor': cursor})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.context['page_obj']), 10)
+
+    def test_elided_page_range(self):
+        """Номера страниц вокруг текущей и по краям, не все страницы"""
+        paginator = Paginator(range(1000), 10)
+        self.assertEqual(elided_page_range(paginator, 50), [
+            1, 2, ELLIPSIS, 47, 48, 49, 50, 51, 52, 53, ELLIPSIS, 99, 100])
+        self.assertEqual(elided_page_range(paginator, 1),
+                         [1, 2, 3, 4, ELLIPSIS, 99, 100])
+        self.assertEqual(elided_page_range(Paginator(range(50), 10), 3),
+                         [1, 2, 3, 4, 5])
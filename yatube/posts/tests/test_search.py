@@ -0,0 +1,81 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from ..admin import PostAdmin
+from ..models import Post
+from ..stemmer import stem
+from django.contrib.admin.sites import site
+
+User = get_user_model()
+
+
+# индекс поиска обновляется задачей: здесь она выполняется сразу
+@override_settings(TASKS_EAGER=True)
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='searcher')
+        cls.cats = Post.objects.create(author=cls.user,
+                                       text='Коты любят спать на солнце')
+        cls.dogs = Post.objects.create(author=cls.user,
+                                       text='Собака гуляет во дворе')
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def found(self, query):
+        response = self.guest_client.get(reverse('posts:search'),
+                                         {'q': query})
+        return list(response.context['page_obj'])
+
+    def test_stemmer(self):
+        """Разные формы слова дают одну основу"""
+        self.assertEqual(stem('котами'), stem('коты'))
+        self.assertEqual(stem('красивейший'), stem('красивая'))
+
+    def test_search_finds_word_forms(self):
+        """Поиск находит пост по другой форме слова"""
+        self.assertEqual(self.found('котами'), [SearchTest.cats])
+        self.assertEqual(self.found('собаку во дворе'), [SearchTest.dogs])
+        self.assertEqual(self.found('кошка'), [])
+
+    def test_search_ranks_by_relevance(self):
+        """Пост, где слово встречается чаще, выше в выдаче"""
+        best = Post.objects.create(author=self.user,
+                                   text='Коты, коты и еще раз коты')
+        self.assertEqual(self.found('коты')[0], best)
+
+    def test_index_follows_edit_and_delete(self):
+        """Индекс обновляется при правке и удалении поста"""
+        post = Post.objects.create(author=self.user, text='Черепаха')
+        self.assertEqual(self.found('черепаха'), [post])
+        post.text = 'Улитка'
+        post.save()
+        self.assertEqual(self.found('черепаха'), [])
+        self.assertEqual(self.found('улитка'), [post])
+        post.delete()
+        self.assertEqual(self.found('улитка'), [])
+
+    def test_query_syntax_is_escaped(self):
+        """Спецсимволы FTS в запросе не ломают поиск"""
+        response = self.guest_client.get(reverse('posts:search'),
+                                         {'q': '"коты" OR * NEAR('})
+        self.assertEqual(response.status_code, 200)
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке находит посты через индекс"""
+        admin = PostAdmin(Post, site)
+        queryset, distinct = admin.get_search_results(
+            None, Post.objects.all(), 'солнцем')
+        self.assertEqual(list(queryset), [SearchTest.cats])
+
+    def test_admin_search_punctuation_only(self):
+        """Запрос из одних знаков в админке — пустой список, а не 500"""
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        self.guest_client.force_login(admin)
+        for term in ('!!!', '"', '*'):
+            response = self.guest_client.get(
+                reverse('admin:posts_post_changelist'), {'q': term})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.context['cl'].result_count, 0)
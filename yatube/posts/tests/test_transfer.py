@@ -0,0 +1,62 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import AuthorStats, Comment, Group, Post
+
+User = get_user_model()
+
+
+class TransferTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.group = Group.objects.create(title='Группа', slug='group',
+                                          description='Описание')
+        self.post = Post.objects.create(author=self.author, group=self.group,
+                                        text='Пост, с "кавычками"\nи строкой')
+        self.lonely = Post.objects.create(author=self.author,
+                                          text='Без группы')
+        self.reader = User.objects.create_user(username='reader')
+        Comment.objects.create(post=self.post, author=self.reader,
+                               text='Комментарий')
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def snapshot(self):
+        return (
+            list(Group.objects.values_list('slug', 'title', 'description')),
+            list(Post.objects.order_by('pk').values_list(
+                'pk', 'author__username', 'group__slug', 'text', 'pub_date')),
+            list(Comment.objects.values_list(
+                'pk', 'post_id', 'author__username', 'text', 'created')),
+        )
+
+    def round_trip(self, name):
+        path = os.path.join(self.dir.name, name)
+        before = self.snapshot()
+        call_command('export_posts', path, stderr=StringIO())
+        Group.objects.all().delete()
+        User.objects.all().delete()
+        call_command('import_posts', path, '--batch-size', '1',
+                     stdout=StringIO())
+        self.assertEqual(self.snapshot(), before)
+
+    def test_ndjson_round_trip(self):
+        """Экспорт и импорт NDJSON с gzip без потерь"""
+        self.round_trip('posts.ndjson.gz')
+
+    def test_csv_round_trip(self):
+        """Экспорт и импорт CSV без потерь"""
+        self.round_trip('posts.csv')
+
+    def test_import_recounts_counters(self):
+        """После импорта счетчики пересчитаны"""
+        self.round_trip('posts.ndjson')
+        stats = AuthorStats.objects.get(user__username='author')
+        self.assertEqual(stats.posts_count, 2)
+        self.assertEqual(Group.objects.get().posts_count, 1)
+        self.assertEqual(Post.objects.get(pk=self.post.pk).comments_count, 1)
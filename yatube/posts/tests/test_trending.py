@@ -0,0 +1,75 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import trending
+from ..models import Comment, Group, Post, PostScore
+
+User = get_user_model()
+
+
+class TrendingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='author')
+        self.group = Group.objects.create(title='Группа', slug='group',
+                                          description='Описание')
+        self.quiet, self.busy, self.grouped = (
+            Post.objects.create(author=self.user, text='Тихий'),
+            Post.objects.create(author=self.user, text='Обсуждаемый'),
+            Post.objects.create(author=self.user, text='В группе',
+                                group=self.group),
+        )
+
+    def comment(self, post, count=1):
+        for number in range(count):
+            Comment.objects.create(post=post, author=self.user, text='Да')
+
+    def test_order_by_comments(self):
+        """Лента упорядочена по активности, группа видит только свои"""
+        self.comment(self.quiet)
+        self.comment(self.busy, 3)
+        self.comment(self.grouped, 2)
+        response = self.client.get(reverse('posts:trending'))
+        self.assertEqual(list(response.context['page_obj']),
+                         [self.busy, self.grouped, self.quiet])
+        response = self.client.get(reverse('posts:group_hot',
+                                           args=['group']))
+        self.assertEqual(list(response.context['page_obj']), [self.grouped])
+
+    def test_delete_comment_and_move_post(self):
+        """Удаление комментария и перенос поста меняют таблицу оценок"""
+        self.comment(self.busy, 2)
+        Comment.objects.filter(post=self.busy).first().delete()
+        self.assertAlmostEqual(
+            PostScore.objects.get(post=self.busy).score,
+            trending.weight(Comment.objects.get(post=self.busy).created))
+        Comment.objects.filter(post=self.busy).delete()
+        self.assertFalse(PostScore.objects.filter(post=self.busy).exists())
+        self.comment(self.grouped)
+        self.grouped.group = None
+        self.grouped.save()
+        self.assertIsNone(PostScore.objects.get(post=self.grouped).group_id)
+
+    def test_command_recomputes_and_prunes(self):
+        """Пересчет по часам близок к оценке из сигналов, старое удаляется"""
+        self.comment(self.busy, 3)
+        self.comment(self.quiet)
+        Comment.objects.filter(post=self.quiet).update(
+            created=timezone.now() - timedelta(days=5))
+        incremental = PostScore.objects.get(post=self.busy).score
+        call_command('update_trending', '--all', '--batch-size', '1',
+                     stdout=StringIO())
+        # середина часовой корзины отличается от времени не больше чем
+        # на полчаса
+        self.assertAlmostEqual(PostScore.objects.get(post=self.busy).score,
+                               incremental,
+                               delta=1800 / trending.setting(
+                                   'TRENDING_HALF_LIFE', 12 * 3600))
+        self.assertFalse(PostScore.objects.filter(post=self.quiet).exists())
@@ -1,15 +1,24 @@
+import shutil
+import tempfile
+
 from django.contrib.auth import get_user_model
 from django.http import response
-from django.test import Client, TestCase
+from django.db import transaction
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
-from ..models import Group, Post, Comment
+from ..models import Comment, Follow, Group, Post
 from django import forms
 from django.core.cache import cache
+from .. import cache as feed_cache
 
 User = get_user_model()
 
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
 
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class ViewsTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -38,7 +47,13 @@ class ViewsTest(TestCase):
             image=cls.new_image,
         )
 
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.authorized_client = Client()
         self.authorized_client.force_login(ViewsTest.authoruser)
@@ -178,15 +193,226 @@ class ViewsTest(TestCase):
         self.assertEqual(comment_from_response, text)
 
     def test_cache(self):
-        """Берем респонз с главной страницы, запиливаем новый пост,
-        обновляем респонз с главной страницы, смотрим, появился ли он там,
-        если нет - ок. Дальше чистим кэш и снова далем запрос - пост появился-
-        кэш работает.
+        """Главная страница берется из кэша, пока посты не меняются через
+        модель: update() сигналов не шлет, и страница остается прежней.
+        Новый пост сбрасывает кэш ленты сразу.
         """
+        cache.clear()
         response_old = self.guest_client.get(reverse('posts:index'))
-        Post.objects.create(text='test2', author=ViewsTest.authoruser)
+        Post.objects.filter(pk=ViewsTest.post.pk).update(text='Без сигнала')
+        response_cached = self.guest_client.get(reverse('posts:index'))
+        self.assertEqual(response_old.content, response_cached.content)
+        Post.objects.create(text='Новый пост', author=ViewsTest.authoruser)
         response_new = self.guest_client.get(reverse('posts:index'))
+        self.assertNotEqual(response_old.content, response_new.content)
+        self.assertContains(response_new, 'Новый пост')
+
+    def test_group_cache_invalidated_on_move(self):
+        """Пост, перенесенный в другую группу, пропадает со страницы
+        старой группы"""
         cache.clear()
-        response_cash_clr = self.guest_client.get(reverse('posts:index'))
-        self.assertEqual(response_old.content, response_new.content)
-        self.assertNotEqual(response_new.content, response_cash_clr.content)
+        url = reverse('posts:group', kwargs={'slug': ViewsTest.group.slug})
+        post = Post.objects.create(text='Переезжающий пост',
+                                   author=ViewsTest.authoruser,
+                                   group=ViewsTest.group)
+        self.assertContains(self.guest_client.get(url), 'Переезжающий пост')
+        post = Post.objects.get(pk=post.pk)
+        post.group = Group.objects.create(title='Другая', slug='other')
+        post.save()
+        self.assertNotContains(self.guest_client.get(url),
+                               'Переезжающий пост')
+
+
+class ViewsQueryCountTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='counter')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='count-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(author=cls.user, group=cls.group,
+                                       text='Первый пост')
+        Comment.objects.create(post=cls.post, author=cls.user,
+                               text='Комментарий')
+
+    def setUp(self):
+        self.guest_client = Client()
+        cache.clear()
+
+    def add_rows(self, count):
+        Post.objects.bulk_create([
+            Post(author=self.user, group=self.group, text='Еще пост')
+            for i in range(count)
+        ])
+        Comment.objects.bulk_create([
+            Comment(post=self.post, author=self.user, text='Еще коммент')
+            for i in range(count)
+        ])
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        """Число запросов не растет вместе с числом постов на странице
+        (для групп и профилей один из них — поиск id по slug/username,
+        для поста — валидатор ETag)"""
+        pages = {
+            reverse('posts:index'): 1,
+            reverse('posts:group', kwargs={'slug': self.group.slug}): 3,
+            reverse('posts:profile',
+                    kwargs={'username': self.user.username}): 3,
+            reverse('posts:post_detail',
+                    kwargs={'post_id': self.post.pk}): 3,
+        }
+        for rows in (0, 20):
+            self.add_rows(rows)
+            for url, queries in pages.items():
+                with self.subTest(url=url, rows=rows):
+                    cache.clear()
+                    with self.assertNumQueries(queries):
+                        self.guest_client.get(url)
+
+
+class CommentPagesTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='commenter')
+        self.post = Post.objects.create(author=self.user, text='Пост')
+        Comment.objects.bulk_create([
+            Comment(post=self.post, author=self.user, text='Коммент %d' % i)
+            for i in range(45)
+        ])
+
+    def test_post_page_shows_first_comments(self):
+        """На странице поста первые 20 комментариев"""
+        response = Client().get(reverse('posts:post_detail',
+                                        kwargs={'post_id': self.post.pk}))
+        comments = response.context['comments']
+        self.assertEqual(len(comments), 20)
+        self.assertEqual(comments[0].text, 'Коммент 0')
+        self.assertTrue(comments.has_next())
+
+    def test_more_comments_json(self):
+        """Остальные комментарии подгружаются курсором в JSON"""
+        url = reverse('posts:comments_more', kwargs={'post_id': self.post.pk})
+        texts = []
+        cursor = ''
+        while cursor is not None:
+            data = Client().get(url, {'cursor': cursor}).json()
+            texts.extend(comment['text'] for comment in data['comments'])
+            cursor = data['next_cursor']
+        self.assertEqual(texts, ['Коммент %d' % i for i in range(45)])
+        self.assertEqual(data['comments'][0]['author'], 'commenter')
+
+
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader')
+        self.post = Post.objects.create(author=self.user, text='Пост')
+        self.client = Client()
+
+    def revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_feed_not_modified(self):
+        """Лента отвечает 304 без запросов до новой записи"""
+        url = reverse('posts:index')
+        response = self.client.get(url)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.revalidate(url, response).status_code, 304)
+        Post.objects.create(author=self.user, text='Еще пост')
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_post_not_modified(self):
+        """Пост отвечает 304 до нового комментария"""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        response = self.client.get(url)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.revalidate(url, response).status_code, 304)
+        Comment.objects.create(post=self.post, author=self.user,
+                               text='Комментарий')
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_post_modified_by_author_posts(self):
+        """Новый пост автора меняет ответ страницы поста"""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        response = self.client.get(url)
+        self.assertFalse(response.has_header('Last-Modified'))
+        Post.objects.create(author=self.user, text='Еще пост')
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE='Sun, 18 Oct 2099 00:00:00 GMT')
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_user(self):
+        """ETag анонима не подходит вошедшему пользователю"""
+        url = reverse('posts:index')
+        anonymous = self.client.get(url)
+        self.client.force_login(self.user)
+        self.assertEqual(self.revalidate(url, anonymous).status_code, 200)
+
+
+class PageCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.post = Post.objects.create(author=self.author, text='Пост')
+        self.url = reverse('posts:post_detail',
+                           kwargs={'post_id': self.post.pk})
+
+    def test_anonymous_page_without_queries(self):
+        """Анониму страница из кэша отдается без запросов"""
+        url = reverse('posts:index')
+        Client().get(url)
+        with self.assertNumQueries(0):
+            response = Client().get(url)
+        self.assertContains(response, 'Пост')
+
+    def test_cached_page_filled_per_user(self):
+        """Общая страница из кэша получает шапку, форму комментария
+        и ссылку редактирования текущего пользователя"""
+        guest = Client().get(self.url)
+        self.assertNotContains(guest, 'Добавить комментарий')
+        reader = Client()
+        reader.force_login(self.reader)
+        response = reader.get(self.url)
+        self.assertContains(response, 'Добавить комментарий')
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertNotContains(response, 'редактировать')
+        self.assertNotContains(response, 'pagehole')
+        author = Client()
+        author.force_login(self.author)
+        self.assertContains(author.get(self.url), 'редактировать')
+        self.assertNotContains(Client().get(self.url), 'Добавить комментарий')
+
+    def test_follow_button_per_user(self):
+        """Кнопка подписки в кэшированном профиле своя у каждого"""
+        url = reverse('posts:profile', kwargs={'username': 'author'})
+        Client().get(url)
+        reader = Client()
+        reader.force_login(self.reader)
+        self.assertContains(reader.get(url), 'Подписаться')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertContains(reader.get(url), 'Отписаться')
+
+    def test_comment_invalidates_page(self):
+        """Новый комментарий сбрасывает страницу поста"""
+        Client().get(self.url)
+        Comment.objects.create(post=self.post, author=self.reader,
+                               text='Новый комментарий')
+        self.assertContains(Client().get(self.url), 'Новый комментарий')
+
+
+class InvalidationOnCommitTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_page_rendered_before_commit_is_dropped(self):
+        """Страница из незакоммиченных строк устаревает после коммита"""
+        user = User.objects.create_user(username='author')
+        with transaction.atomic():
+            Post.objects.create(author=user, text='Пост')
+            inside = feed_cache.generation('index')
+        self.assertGreater(feed_cache.generation('index'), inside)
@@ -0,0 +1,35 @@
+"""Миниатюры картинок постов, построенные заранее.
+
+После сохранения поста с новой картинкой миниатюра строится задачей
+`posts.thumbnail` в очереди `core.tasks`. Её адрес и размеры записываются
+в пост, поэтому шаблоны не обращаются к sorl-thumbnail при показе.
+Команда `build_thumbnails` достраивает миниатюры для старых постов.
+"""
+from django.utils import timezone
+from sorl.thumbnail import get_thumbnail
+
+from . import cache
+from .models import Post
+
+GEOMETRY = '960x339'
+OPTIONS = {'crop': 'center', 'upscale': True}
+
+
+def build(post_id):
+    """Строит миниатюру и записывает ее в пост; возвращает True, если
+    пост обновлен."""
+    post = Post.objects.filter(pk=post_id).only(
+        'image', 'author', 'group').first()
+    if post is None or not post.image:
+        return False
+    thumbnail = get_thumbnail(post.image, GEOMETRY, **OPTIONS)
+    # картинку могли заменить, пока строилась миниатюра
+    updated = Post.objects.filter(pk=post_id, image=post.image.name).update(
+        thumbnail_url=thumbnail.url,
+        thumbnail_width=thumbnail.width,
+        thumbnail_height=thumbnail.height,
+        updated=timezone.now(),
+    )
+    if updated:
+        cache.bump(*cache.post_scopes(post))
+    return bool(updated)
@@ -0,0 +1,111 @@
+"""Лента подписок: посты раскладываются по лентам при публикации.
+
+Новый пост записывается строкой `TimelineEntry` каждому подписчику
+автора (fan-out on write), поэтому страница ленты — один запрос по
+индексу `(user, pub_date, post)`, сколько бы авторов ни было в
+подписках.
+
+Авторы, у которых подписчиков больше `FOLLOW_FANOUT_LIMIT`, помечаются
+`pull_feed`: их посты не раскладываются, а читаются при показе ленты
+отдельным запросом на автора по индексу `(author, pub_date, id)` и
+сливаются со страницей ленты (fan-out on read). Метка не снимается,
+когда подписчиков становится меньше: иначе посты, опубликованные
+без раскладки, пропали бы из лент.
+"""
+from django.conf import settings
+from django.utils.functional import cached_property
+
+from .models import AuthorStats, Follow, Post, TimelineEntry
+from .paginator import FORWARD, CursorPage, CursorPaginator
+from .transfer import batches
+
+FANOUT_LIMIT = getattr(settings, 'FOLLOW_FANOUT_LIMIT', 10000)
+# сколько последних постов автора попадает в ленту при подписке
+BACKFILL_POSTS = getattr(settings, 'FOLLOW_BACKFILL_POSTS', 1000)
+BATCH_SIZE = 1000
+
+
+def pulls(author_id):
+    return AuthorStats.objects.filter(user_id=author_id,
+                                      pull_feed=True).exists()
+
+
+def mark_popular(author_id):
+    AuthorStats.objects.filter(
+        user_id=author_id, followers_count__gt=FANOUT_LIMIT, pull_feed=False,
+    ).update(pull_feed=True)
+
+
+def _insert(entries):
+    for batch in batches(entries, BATCH_SIZE):
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if pulls(post.author_id):
+        return
+    followers = Follow.objects.filter(author_id=post.author_id).values_list(
+        'user_id', flat=True).iterator()
+    _insert(
+        TimelineEntry(user_id=user_id, post_id=post.pk,
+                      author_id=post.author_id, pub_date=post.pub_date)
+        for user_id in followers
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту нового подписчика последние посты автора."""
+    if pulls(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-pk').values_list('pk', 'pub_date')[:BACKFILL_POSTS]
+    _insert(
+        TimelineEntry(user_id=user_id, post_id=pk, author_id=author_id,
+                      pub_date=pub_date)
+        for pk, pub_date in posts
+    )
+
+
+def forget(user_id, author_id):
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+class FollowPaginator(CursorPaginator):
+    """Курсорная лента подписок пользователя `user`.
+
+    Окно страницы собирается из `per_page + 1` строк ленты и столько же
+    постов каждого автора с `pull_feed`, на которого подписан
+    пользователь; таких авторов единицы, поэтому чтение остается
+    O(размер страницы).
+    """
+
+    def __init__(self, user, per_page):
+        super().__init__(Post.objects.for_feed(), per_page)
+        self.user = user
+
+    @cached_property
+    def pulled(self):
+        return list(Follow.objects.filter(
+            user=self.user, author__stats__pull_feed=True,
+        ).values_list('author_id', flat=True))
+
+    def window(self, direction, values):
+        entries = TimelineEntry.objects.filter(user=self.user).select_related(
+            'post__author', 'post__group')
+        if self.pulled:
+            entries = entries.exclude(author_id__in=self.pulled)
+        items = [entry.post for entry in self.slice(
+            entries, ('-pub_date', '-post_id'), direction, values)]
+        for author_id in self.pulled:
+            items.extend(self.slice(self.object_list.filter(
+                author_id=author_id), self.ordering, direction, values))
+        items.sort(key=lambda post: (post.pub_date, post.pk),
+                   reverse=direction == FORWARD)
+        return items[:self.per_page + 1]
+
+    def page_by_number(self, number):
+        # у ленты подписок нет старых ссылок с номерами: всегда первая
+        items = self.window(FORWARD, None)
+        return CursorPage(items[:self.per_page], 1, self,
+                          has_next=len(items) > self.per_page)
@@ -0,0 +1,258 @@
+"""Выгрузка и загрузка групп, постов и комментариев потоком.
+
+Поток — записи NDJSON или строки CSV с одинаковыми полями (`FIELDS`):
+сначала группы, потом посты, потом комментарии. Пользователи и группы
+указываются по username и slug, у постов и комментариев сохраняются id,
+поэтому комментарии ссылаются на пост без таблицы соответствий.
+
+Память не зависит от объема: выгрузка читает базу `.iterator()`, а
+загрузка держит только текущую пачку и ограниченный кэш
+username/slug -> id. Пачки пишутся `bulk_create`, поэтому сигналы не
+срабатывают; счетчики и поисковый индекс пересчитываются после загрузки.
+"""
+import csv
+import gzip
+import json
+import os
+import sys
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.management.color import no_style
+from django.db import connection, reset_queries, transaction
+from django.utils.dateparse import parse_datetime
+
+from .models import Comment, Group, Post
+
+User = get_user_model()
+
+FORMATS = ('ndjson', 'csv')
+FIELDS = ('kind', 'id', 'slug', 'title', 'description', 'author', 'group',
+          'post', 'text', 'pub_date', 'created', 'image')
+
+
+def batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Отключает auto_now_add, чтобы bulk_create записал свои даты."""
+    saved = [(field, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, value in saved:
+            field.auto_now_add = value
+
+
+def guess_format(path):
+    name = path[:-3] if path.endswith('.gz') else path
+    return 'csv' if name.endswith('.csv') else 'ndjson'
+
+
+@contextmanager
+def open_stream(path, mode):
+    """Текстовый поток файла, `.gz` или stdin/stdout для '-'."""
+    if path == '-':
+        yield sys.stdin if mode == 'r' else sys.stdout
+        return
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, mode + 't', encoding='utf-8', newline='') as stream:
+        yield stream
+
+
+def records():
+    """Все записи базы по порядку: группы, посты, комментарии."""
+    for slug, title, description in (
+            Group.objects.order_by('pk')
+            .values_list('slug', 'title', 'description').iterator()):
+        yield {'kind': 'group', 'slug': slug, 'title': title,
+               'description': description}
+    for pk, author, group, text, pub_date, image in (
+            Post.objects.order_by('pk')
+            .values_list('pk', 'author__username', 'group__slug', 'text',
+                         'pub_date', 'image').iterator()):
+        yield {'kind': 'post', 'id': pk, 'author': author,
+               'group': group or '', 'text': text,
+               'pub_date': pub_date.isoformat(), 'image': image}
+    for pk, post, author, text, created in (
+            Comment.objects.order_by('pk')
+            .values_list('pk', 'post_id', 'author__username', 'text',
+                         'created').iterator()):
+        yield {'kind': 'comment', 'id': pk, 'post': post, 'author': author,
+               'text': text, 'created': created.isoformat()}
+
+
+def write_records(stream, rows, fmt):
+    if fmt == 'csv':
+        writer = csv.DictWriter(stream, FIELDS, restval='')
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            yield row
+    else:
+        for row in rows:
+            stream.write(json.dumps(row, ensure_ascii=False))
+            stream.write('\n')
+            yield row
+
+
+def read_records(stream, fmt):
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+    else:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+
+def copy_image(name, source, target):
+    """Копирует файл картинки из хранилища `source` в `target`;
+    возвращает имя в `target`."""
+    if not name or target.exists(name) or not source.exists(name):
+        return name
+    with source.open(name, 'rb') as content:
+        return target.save(name, File(content))
+
+
+class Resolver:
+    """username/slug -> id с кэшем на `size` записей.
+
+    Ключи пачки разрешаются одним запросом, недостающие строки
+    создаются одним `bulk_create`.
+    """
+
+    def __init__(self, model, field, size=100000):
+        self.model = model
+        self.field = field
+        self.size = size
+        self.cache = OrderedDict()
+
+    def resolve(self, keys, defaults=None):
+        defaults = defaults or {}
+        missing = {key for key in keys if key and key not in self.cache}
+        found = {}
+        if missing:
+            found = dict(self.model.objects.filter(
+                **{self.field + '__in': missing}
+            ).values_list(self.field, 'pk'))
+            new = missing - set(found)
+            if new:
+                self.model.objects.bulk_create(
+                    [self.build(key, defaults.get(key)) for key in new],
+                    ignore_conflicts=True,
+                )
+                found.update(self.model.objects.filter(
+                    **{self.field + '__in': new}
+                ).values_list(self.field, 'pk'))
+        result = {}
+        for key in keys:
+            if key and key not in result:
+                pk = found[key] if key in found else self.cache.pop(key)
+                result[key] = self.cache[key] = pk
+        while len(self.cache) > self.size:
+            self.cache.popitem(last=False)
+        return result
+
+    def build(self, key, row):
+        if self.model is Group:
+            row = row or {}
+            return Group(slug=key, title=row.get('title') or key,
+                         description=row.get('description') or '')
+        return User(username=key, password=make_password(None))
+
+
+class Importer:
+    def __init__(self, batch_size=5000, media=None, ignore_conflicts=False,
+                 cache_size=100000):
+        self.batch_size = batch_size
+        self.media = media
+        self.ignore_conflicts = ignore_conflicts
+        self.users = Resolver(User, 'username', cache_size)
+        self.groups = Resolver(Group, 'slug', cache_size)
+
+    def run(self, rows):
+        """Загружает записи пачками и возвращает их число по видам."""
+        totals = {'group': 0, 'post': 0, 'comment': 0}
+        kind, batch = None, []
+        with explicit_dates(Post._meta.get_field('pub_date'),
+                            Comment._meta.get_field('created')):
+            for row in rows:
+                if row['kind'] != kind or len(batch) == self.batch_size:
+                    self.flush(kind, batch)
+                    kind, batch = row['kind'], []
+                batch.append(row)
+                totals[kind] += 1
+                if len(batch) == self.batch_size:
+                    yield totals
+            self.flush(kind, batch)
+        self.reset_sequences()
+        yield totals
+
+    def flush(self, kind, batch):
+        if not batch:
+            return
+        with transaction.atomic():
+            getattr(self, 'load_%s' % kind)(batch)
+        # при DEBUG журнал запросов копил бы текст каждой пачки
+        reset_queries()
+
+    def load_group(self, batch):
+        self.groups.resolve([row['slug'] for row in batch],
+                            {row['slug']: row for row in batch})
+
+    def load_post(self, batch):
+        authors = self.users.resolve([row['author'] for row in batch])
+        groups = self.groups.resolve([row['group'] for row in batch])
+        Post.objects.bulk_create(
+            [Post(pk=int(row['id']), author_id=authors[row['author']],
+                  group_id=groups.get(row['group']), text=row['text'],
+                  pub_date=parse_datetime(row['pub_date']),
+                  image=self.image(row['image']))
+             for row in batch],
+            ignore_conflicts=self.ignore_conflicts,
+        )
+
+    def load_comment(self, batch):
+        authors = self.users.resolve([row['author'] for row in batch])
+        Comment.objects.bulk_create(
+            [Comment(pk=int(row['id']), post_id=int(row['post']),
+                     author_id=authors[row['author']], text=row['text'],
+                     created=parse_datetime(row['created']))
+             for row in batch],
+            ignore_conflicts=self.ignore_conflicts,
+        )
+
+    def image(self, name):
+        if self.media is None or not name:
+            return name
+        return copy_image(name, self.media, default_storage)
+
+    def reset_sequences(self):
+        """Следующие id после загруженных (для баз с последовательностями)."""
+        statements = connection.ops.sequence_reset_sql(no_style(),
+                                                       [Post, Comment])
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+
+
+def media_storage(path):
+    """Каталог с картинками рядом с файлом выгрузки."""
+    os.makedirs(path, exist_ok=True)
+    return FileSystemStorage(location=path)
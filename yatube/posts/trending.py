@@ -0,0 +1,150 @@
+"""Ленты «Обсуждаемое»: посты по недавней активности в комментариях.
+
+Каждый комментарий дает посту вес, который падает вдвое за
+`TRENDING_HALF_LIFE` секунд. Оценка хранится с прямым затуханием
+(forward decay) в логарифме::
+
+    score = log2(Σ 2 ** ((created - EPOCH) / half_life))
+
+Новый комментарий только добавляет слагаемое, а порядок постов по
+`score` в любой момент совпадает с порядком по затухшей оценке
+`2 ** (score - now_weight)`. Поэтому со временем строки не
+пересчитываются, и ленту отдает индекс `(score, post)` без сортировки.
+
+Обработчики сигналов `Comment` меняют оценку в транзакции комментария.
+Команда `update_trending` пересчитывает оценки постов из комментариев
+окна `TRENDING_WINDOW`, сгруппированных по часам, пачками постов и
+удаляет строки, затухшие ниже `TRENDING_MIN_SCORE`.
+"""
+import math
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from .models import Comment, Post, PostScore
+from .paginator import CursorPaginator
+
+EPOCH = datetime(2020, 1, 1, tzinfo=timezone.utc)
+BUCKET = timedelta(hours=1)
+
+
+def setting(name, default):
+    return getattr(settings, name, default)
+
+
+def weight(moment):
+    """log2 веса комментария, написанного в `moment`."""
+    half_life = setting('TRENDING_HALF_LIFE', 12 * 3600)
+    return (moment - EPOCH).total_seconds() / half_life
+
+
+def log_add(a, b):
+    """log2(2**a + 2**b) без переполнения."""
+    if a is None:
+        return b
+    high, low = max(a, b), min(a, b)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+def log_sub(a, b):
+    """log2(2**a - 2**b) или None, если от суммы ничего не осталось."""
+    if b >= a - 1e-9:
+        return None
+    return a + math.log2(1 - 2 ** (b - a))
+
+
+def threshold(now=None):
+    """score, ниже которого затухшая оценка меньше TRENDING_MIN_SCORE."""
+    return (weight(now or timezone.now())
+            + math.log2(setting('TRENDING_MIN_SCORE', 0.05)))
+
+
+def add_comment(comment):
+    entry = PostScore.objects.select_for_update().filter(
+        post_id=comment.post_id).first()
+    if entry is None:
+        group_id = Post.objects.filter(pk=comment.post_id).values_list(
+            'group_id', flat=True).first()
+        PostScore.objects.create(post_id=comment.post_id, group_id=group_id,
+                                 score=weight(comment.created))
+    else:
+        entry.score = log_add(entry.score, weight(comment.created))
+        entry.save(update_fields=['score'])
+
+
+def remove_comment(comment):
+    entry = PostScore.objects.select_for_update().filter(
+        post_id=comment.post_id).first()
+    if entry is None:
+        return
+    entry.score = log_sub(entry.score, weight(comment.created))
+    if entry.score is None:
+        entry.delete()
+    else:
+        entry.save(update_fields=['score'])
+
+
+def move_post(post):
+    PostScore.objects.filter(post_id=post.pk).update(group_id=post.group_id)
+
+
+def recompute(post_ids, since):
+    """Оценки постов `post_ids` заново по часовым корзинам комментариев
+    после `since`. Транзакция начинается с записи: на SQLite она сразу
+    берет блокировку, и комментарий не проскочит между чтением и
+    записью оценок."""
+    with transaction.atomic():
+        PostScore.objects.filter(post_id__in=post_ids).delete()
+        buckets = Comment.objects.filter(
+            post_id__in=post_ids, created__gte=since,
+        ).annotate(bucket=TruncHour('created')).order_by().values(
+            'post_id', 'bucket').annotate(total=Count('pk'))
+        scores = {}
+        for row in buckets:
+            value = math.log2(row['total']) + weight(row['bucket']
+                                                     + BUCKET / 2)
+            scores[row['post_id']] = log_add(scores.get(row['post_id']),
+                                             value)
+        groups = dict(Post.objects.filter(pk__in=scores).values_list(
+            'pk', 'group_id'))
+        PostScore.objects.bulk_create(
+            PostScore(post_id=post_id, group_id=groups.get(post_id),
+                      score=score)
+            for post_id, score in scores.items() if post_id in groups)
+    return len(scores)
+
+
+def prune(now=None):
+    return PostScore.objects.filter(score__lt=threshold(now)).delete()[0]
+
+
+class TrendingPaginator(CursorPaginator):
+    """Посты по убыванию оценки; `group_id` — лента группы."""
+
+    def __init__(self, per_page, group_id=None):
+        scores = PostScore.objects.select_related('post__author',
+                                                  'post__group')
+        if group_id is not None:
+            scores = scores.filter(group_id=group_id)
+        super().__init__(scores, per_page, ordering=('-score', '-pk'))
+
+    def posts(self, entries):
+        posts = []
+        for entry in entries:
+            post = entry.post
+            # курсор строится по полям ordering у элементов страницы
+            post.score = entry.score
+            posts.append(post)
+        return posts
+
+    def window(self, direction, values):
+        return self.posts(super().window(direction, values))
+
+    def page_by_number(self, number):
+        page = super().page_by_number(number)
+        page.object_list = self.posts(page.object_list)
+        return page
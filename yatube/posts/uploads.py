@@ -0,0 +1,105 @@
+"""Загрузка картинок с ограничениями до полного декодирования.
+
+`LimitedImageUploadHandler` пишет файл кусками во временный файл
+(FileSystemStorage потом просто переносит его на место), считает байты
+и по первым килобайтам читает заголовок картинки. Слишком большой или
+слишком «широкий» файл дальше не пишется: вместо него форма получает
+`RejectedUpload` с причиной отказа, и `LimitedImageField` (в PostForm
+и в форме админки) показывает ее вместо «файл пуст». Pillow не
+декодирует пиксели, поэтому память на загрузку ограничена размером
+куска.
+"""
+import io
+import warnings
+
+from django import forms
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.template.defaultfilters import filesizeformat
+from PIL import Image
+
+MAX_BYTES = getattr(settings, 'UPLOAD_IMAGE_MAX_BYTES', 5 * 1024 * 1024)
+MAX_PIXELS = getattr(settings, 'UPLOAD_IMAGE_MAX_PIXELS', 4096 * 4096)
+HEADER_BYTES = 64 * 1024
+
+
+def header_size(header):
+    """Размеры картинки по началу файла или None, если заголовок
+    еще не дочитан или это не картинка."""
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+            with Image.open(io.BytesIO(header)) as image:
+                return image.size
+    except Exception:
+        return None
+
+
+def check_limits(size, dimensions):
+    if size > MAX_BYTES:
+        return 'Файл больше %s.' % filesizeformat(MAX_BYTES)
+    if dimensions and dimensions[0] * dimensions[1] > MAX_PIXELS:
+        return ('Слишком большая картинка: %d×%d, допустимо не больше '
+                '%d пикселей.' % (dimensions[0], dimensions[1], MAX_PIXELS))
+    return None
+
+
+class RejectedUpload(UploadedFile):
+    """Файл, отброшенный при загрузке; содержит только причину."""
+
+    def __init__(self, name, content_type, upload_error):
+        super().__init__(None, name, content_type, 0)
+        self.upload_error = upload_error
+
+    def open(self, mode=None):
+        raise ValueError(self.upload_error)
+
+
+class LimitedImageUploadHandler(TemporaryFileUploadHandler):
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.header = b''
+        self.dimensions = None
+        self.upload_error = None
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.upload_error:
+            return None
+        self.received += len(raw_data)
+        if self.dimensions is None and len(self.header) < HEADER_BYTES:
+            self.header += raw_data[:HEADER_BYTES - len(self.header)]
+            self.dimensions = header_size(self.header)
+        self.upload_error = check_limits(self.received, self.dimensions)
+        if self.upload_error:
+            self.file.close()
+            return None
+        self.file.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        if self.upload_error:
+            return RejectedUpload(self.file_name, self.content_type,
+                                  self.upload_error)
+        return super().file_complete(file_size)
+
+
+class LimitedImageField(forms.ImageField):
+    """ImageField, который до открытия файла Pillow проверяет причину
+    отказа от обработчика загрузки, размер и заголовок."""
+
+    def to_python(self, data):
+        if data in self.empty_values:
+            return super().to_python(data)
+        upload_error = getattr(data, 'upload_error', None)
+        if upload_error is None:
+            position = data.tell()
+            data.seek(0)
+            dimensions = header_size(data.read(HEADER_BYTES))
+            data.seek(position)
+            upload_error = check_limits(data.size, dimensions)
+        if upload_error:
+            raise ValidationError(upload_error, code='upload_limit')
+        return super().to_python(data)
@@ -1,14 +1,37 @@
-from django.urls import path
-from . import views
+from django.urls import path, re_path
+from . import api, views
 
 app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    re_path(r'^feed/(?P<format>atom|rss|json)/$', views.index_feed,
+            name='index_feed'),
+    path('groups/', views.groups, name='groups'),
     path('group/<slug:slug>/', views.group_list, name='group'),
+    path('group/<slug:slug>/hot/', views.group_hot, name='group_hot'),
+    re_path(r'^group/(?P<slug>[-\w]+)/feed/(?P<format>atom|rss|json)/$',
+            views.group_feed, name='group_feed'),
     path('profile/<str:username>/', views.profile, name='profile'),
+    re_path(r'^profile/(?P<username>[^/]+)/feed/(?P<format>atom|rss|json)/$',
+            views.profile_feed, name='profile_feed'),
+    path('follow/', views.follow_index, name='follow_index'),
+    path('profile/<str:username>/follow/', views.profile_follow,
+         name='profile_follow'),
+    path('profile/<str:username>/unfollow/', views.profile_unfollow,
+         name='profile_unfollow'),
+    path('search/', views.search, name='search'),
+    path('trending/', views.trending, name='trending'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path('posts/<int:post_id>/comments/', views.comments_more,
+         name='comments_more'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('posts/<int:post_id>/comment', views.add_comment, name='add_comment'),
+    path('api/v1/posts/', api.posts, name='api_posts'),
+    path('api/v1/posts/<int:post_id>/', api.post, name='api_post'),
+    path('api/v1/posts/<int:post_id>/comments/', api.comments,
+         name='api_comments'),
+    path('api/v1/groups/', api.groups, name='api_groups'),
+    path('api/v1/groups/<slug:slug>/', api.group, name='api_group'),
 ]
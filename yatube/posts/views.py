@@ -1,64 +1,354 @@
+import hashlib
+
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseRedirect, JsonResponse
 from django.urls import reverse
 from django.core.paginator import Paginator
-from .models import Post, Group
+from django.utils.formats import date_format
+from django.utils.http import urlencode
+from django.utils.timezone import localtime
+from django.utils.functional import SimpleLazyObject
+from .models import Follow, Post, Group
+from .paginator import CursorPaginator
+from . import cache, feeds
+from .cache import feed_etag, feed_key
+from .search import search as search_posts
+from .timeline import FollowPaginator
+from .trending import TrendingPaginator
+from .writes import save_comment
 from django.contrib.auth import get_user_model
 from .forms import PostForm, CommentForm
 from django.template import RequestContext
 from django.contrib.auth.decorators import login_required
+from django.views.decorators.http import condition
+from core.pagecache import cached_page
+from core.ratelimit import rate_limit
 
 User = get_user_model()
 
+POSTS_PER_PAGE = 10
+GROUPS_PER_PAGE = 50
+GROUP_ORDERINGS = {
+    'active': ('-last_activity', '-pk'),
+    'title': ('title', 'pk'),
+}
+COMMENTS_PER_PAGE = 20
+COMMENTS_ORDERING = ('created', 'pk')
+
+
+def get_page(request, object_list, per_page=POSTS_PER_PAGE, **kwargs):
+    """Страница вычисляется лениво: при попадании в кэш ленты
+    запрос к базе не выполняется."""
+    paginator = CursorPaginator(object_list, per_page, **kwargs)
+    return SimpleLazyObject(
+        lambda: paginator.get_page(request.GET.get('page'),
+                                   cursor=request.GET.get('cursor'))
+    )
+
+
+def index_etag(request):
+    return feed_etag('index', request)
+
+
+def group_etag(request, slug):
+    group_id = cache.object_id(Group, 'slug', slug)
+    if group_id is None:
+        return None
+    return feed_etag('group:%s' % group_id, request)
+
+
+def profile_etag(request, username):
+    author_id = cache.object_id(User, 'username', username)
+    if author_id is None:
+        return None
+    return feed_etag('profile:%s' % author_id, request)
+
+
+def trending_etag(request):
+    return feed_etag('trending', request)
+
+
+def group_hot_etag(request, slug):
+    group_id = cache.object_id(Group, 'slug', slug)
+    if group_id is None:
+        return None
+    return feed_etag('trending:%s' % group_id, request)
+
+
+def group_sort(request):
+    sort = request.GET.get('sort')
+    return sort if sort in GROUP_ORDERINGS else 'active'
+
+
+def groups_etag(request):
+    # курсор входит в ETag ленты, порядок — нет
+    return '%s:%s' % (feed_etag('groups', request), group_sort(request))
+
+
+def index_page_key(request):
+    return cache.page_key('index', request)
+
+
+def group_page_key(request, slug):
+    group_id = cache.object_id(Group, 'slug', slug)
+    if group_id is None:
+        return None
+    return cache.page_key('group:%s' % group_id, request)
+
+
+def profile_page_key(request, username):
+    author_id = cache.object_id(User, 'username', username)
+    if author_id is None:
+        return None
+    return cache.page_key('profile:%s' % author_id, request)
 
+
+def trending_page_key(request):
+    return cache.page_key('trending', request)
+
+
+def group_hot_page_key(request, slug):
+    group_id = cache.object_id(Group, 'slug', slug)
+    if group_id is None:
+        return None
+    return cache.page_key('trending:%s' % group_id, request)
+
+
+def groups_page_key(request):
+    return cache.page_key('groups', request)
+
+
+def post_page_key(request, post_id):
+    return cache.page_key('post:%s' % post_id, request)
+
+
+def post_validators(request, post_id):
+    """(updated, comments_count, число постов автора) одним запросом;
+    запоминается в запросе для ETag."""
+    if not hasattr(request, 'post_validators'):
+        request.post_validators = Post.objects.filter(pk=post_id).values_list(
+            'updated', 'comments_count', 'author__stats__posts_count',
+        ).first()
+    return request.post_validators
+
+
+def post_etag(request, post_id):
+    validators = post_validators(request, post_id)
+    if validators is None:
+        return None
+    updated, comments_count, posts_count = validators
+    raw = '%s:%s:%s:%s:%s:%s' % (
+        post_id, updated.isoformat(), comments_count, posts_count,
+        request.GET.get('cursor', ''), request.user.pk)
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+@condition(etag_func=index_etag)
+@cached_page(index_page_key, cache.FEED_CACHE_TIMEOUT)
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.for_feed()
+    page_obj = get_page(request, post_list)
     context = {
         'page_obj': page_obj,
+        'feed_key': feed_key('index', request),
     }
     return render(request, 'posts/index.html', context)
 
 
+@condition(etag_func=group_etag)
+@cached_page(group_page_key, cache.FEED_CACHE_TIMEOUT)
 def group_list(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = group.posts.for_feed()
+    page_obj = get_page(request, posts)
     context = {
         'group': group,
         'page_obj': page_obj,
+        'feed_key': feed_key('group:%s' % group.pk, request),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@condition(etag_func=profile_etag)
+@cached_page(profile_page_key, cache.FEED_CACHE_TIMEOUT)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list = author.posts.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    author = get_object_or_404(User.objects.select_related('stats'),
+                               username=username)
+    post_list = author.posts.for_feed()
+    page_obj = get_page(request, post_list)
     context = {
         'page_obj': page_obj,
         'author': author,
+        'feed_key': feed_key('profile:%s' % author.pk, request),
     }
     return render(request, 'posts/profile.html', context)
 
 
+def get_trending_page(request, group_id=None):
+    paginator = TrendingPaginator(POSTS_PER_PAGE, group_id)
+    return SimpleLazyObject(
+        lambda: paginator.get_page(request.GET.get('page'),
+                                   cursor=request.GET.get('cursor'))
+    )
+
+
+@condition(etag_func=trending_etag)
+@cached_page(trending_page_key, cache.FEED_CACHE_TIMEOUT)
+def trending(request):
+    context = {
+        'page_obj': get_trending_page(request),
+        'feed_key': feed_key('trending', request),
+    }
+    return render(request, 'posts/trending.html', context)
+
+
+@condition(etag_func=group_hot_etag)
+@cached_page(group_hot_page_key, cache.FEED_CACHE_TIMEOUT)
+def group_hot(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    context = {
+        'group': group,
+        'page_obj': get_trending_page(request, group.pk),
+        'feed_key': feed_key('trending:%s' % group.pk, request),
+    }
+    return render(request, 'posts/trending.html', context)
+
+
+@condition(etag_func=groups_etag)
+@cached_page(groups_page_key, cache.FEED_CACHE_TIMEOUT)
+def groups(request):
+    """Каталог групп из сводки в строке группы, без агрегатов по
+    постам."""
+    sort = group_sort(request)
+    group_list = Group.objects.select_related('latest_post').only(
+        'title', 'slug', 'posts_count', 'last_activity',
+        'latest_post__id', 'latest_post__text')
+    context = {
+        'page_obj': get_page(request, group_list, GROUPS_PER_PAGE,
+                             ordering=GROUP_ORDERINGS[sort]),
+        'sort': sort,
+        'page_query': urlencode({'sort': sort}) + '&',
+    }
+    return render(request, 'posts/groups.html', context)
+
+
+def index_feed_etag(request, format):
+    return feeds.etag('index', request)
+
+
+def group_feed_etag(request, slug, format):
+    group_id = cache.object_id(Group, 'slug', slug)
+    if group_id is None:
+        return None
+    return feeds.etag('group:%s' % group_id, request)
+
+
+def profile_feed_etag(request, username, format):
+    author_id = cache.object_id(User, 'username', username)
+    if author_id is None:
+        return None
+    return feeds.etag('profile:%s' % author_id, request)
+
+
+@condition(etag_func=index_feed_etag)
+def index_feed(request, format):
+    return feeds.response(request, 'index', format, 'Последние обновления',
+                          reverse('posts:index'), Post.objects.all())
+
+
+@condition(etag_func=group_feed_etag)
+def group_feed(request, slug, format):
+    group = get_object_or_404(Group, slug=slug)
+    return feeds.response(request, 'group:%s' % group.pk, format,
+                          group.title, reverse('posts:group', args=[slug]),
+                          group.posts.all())
+
+
+@condition(etag_func=profile_feed_etag)
+def profile_feed(request, username, format):
+    author = get_object_or_404(User, username=username)
+    return feeds.response(request, 'profile:%s' % author.pk, format,
+                          'Посты %s' % author.username,
+                          reverse('posts:profile', args=[username]),
+                          author.posts.all())
+
+
+@login_required
+def follow_index(request):
+    paginator = FollowPaginator(request.user, POSTS_PER_PAGE)
+    page_obj = paginator.get_page(request.GET.get('page'),
+                                  cursor=request.GET.get('cursor'))
+    context = {
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/follow.html', context)
+
+
+@login_required
+def profile_follow(request, username):
+    author = get_object_or_404(User, username=username)
+    if author != request.user:
+        Follow.objects.get_or_create(user=request.user, author=author)
+    return redirect('posts:profile', username=username)
+
+
+@login_required
+def profile_unfollow(request, username):
+    author = get_object_or_404(User, username=username)
+    Follow.objects.filter(user=request.user, author=author).delete()
+    return redirect('posts:profile', username=username)
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    paginator = Paginator(search_posts(query), POSTS_PER_PAGE)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@condition(etag_func=post_etag)
+@cached_page(post_page_key, cache.FEED_CACHE_TIMEOUT)
 def post_detail(request, post_id):
     form = CommentForm(request.POST or None)
-    post = get_object_or_404(Post, pk=post_id)
-    comments = post.comments.all()
+    post = get_object_or_404(Post.objects.for_detail(), pk=post_id)
+    comments = get_page(request, post.comments.for_post(), COMMENTS_PER_PAGE,
+                        ordering=COMMENTS_ORDERING)
     context = {
         'post': post,
         'form': form,
-        'comments': comments
+        'comments': comments,
+        'comments_key': feed_key('post:%s' % post.pk, request),
     }
     return render(request, 'posts/post_detail.html', context)
 
+
+def comments_more(request, post_id):
+    """Следующая страница комментариев в JSON для подгрузки."""
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    paginator = CursorPaginator(post.comments.for_post(), COMMENTS_PER_PAGE,
+                                ordering=COMMENTS_ORDERING)
+    page = paginator.get_page(cursor=request.GET.get('cursor'))
+    return JsonResponse({
+        'comments': [{
+            'id': comment.pk,
+            'author': comment.author.username,
+            'author_url': reverse('posts:profile',
+                                  args=[comment.author.username]),
+            'text': comment.text,
+            'created': comment.created.isoformat(),
+            'created_display': date_format(localtime(comment.created),
+                                           'd M Y'),
+        } for comment in page],
+        'next_cursor': page.next_cursor,
+    })
+
+
+@rate_limit('posts.create')
 @login_required(redirect_field_name='')
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None,)
@@ -95,6 +385,7 @@ def post_edit(request, post_id):
     return render(request, 'posts/create_post.html', context,
                   RequestContext(request))
 
+@rate_limit('posts.comment')
 @login_required
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
@@ -103,5 +394,5 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        save_comment(comment)
     return redirect('posts:post_detail', post_id=post_id)
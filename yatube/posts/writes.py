@@ -0,0 +1,17 @@
+"""Запись комментариев из view: по одной транзакции на комментарий или,
+при `COMMENT_WRITE_BATCHING`, группами через `core.groupcommit`."""
+from django.conf import settings
+
+from core.groupcommit import GroupCommit
+
+comment_writes = GroupCommit(
+    window=getattr(settings, 'COMMENT_BATCH_WINDOW', 0.005),
+    max_size=getattr(settings, 'COMMENT_BATCH_SIZE', 100),
+)
+
+
+def save_comment(comment):
+    if getattr(settings, 'COMMENT_WRITE_BATCHING', False):
+        comment_writes.save(comment)
+    else:
+        comment.save()
@@ -24,7 +24,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.db.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -35,12 +37,29 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+
+# Режим шаблонов для продакшена: cached.Loader читает и разбирает
+# шаблон один раз на процесс, а wsgi.py компилирует все шаблоны при
+# старте. По умолчанию включен без DEBUG, чтобы при разработке правки
+# шаблонов были видны сразу.
+TEMPLATES_CACHED = os.environ.get(
+    'TEMPLATES_CACHED', '0' if DEBUG else '1') == '1'
+TEMPLATES_PRECOMPILE = TEMPLATES_CACHED
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if TEMPLATES_CACHED:
+    TEMPLATE_LOADERS = [
+        ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+    ]
+
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.metrics.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -55,13 +74,54 @@ TEMPLATES = [
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
 
+# Соединение с базой живет CONN_MAX_AGE секунд и переиспользуется
+# следующими запросами того же потока вместо открытия нового.
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
     }
 }
 
+# PRAGMA для каждого соединения с файлом SQLite (core.db.tune_sqlite):
+# cache_size отрицательный — в КиБ, busy_timeout — в мс.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'busy_timeout': 10000,
+}
+
+# Комментарии параллельных запросов одного процесса пишутся одной
+# транзакцией (core.groupcommit): первый запрос ждет остальных
+# COMMENT_BATCH_WINDOW секунд.
+COMMENT_WRITE_BATCHING = False
+COMMENT_BATCH_WINDOW = 0.005
+COMMENT_BATCH_SIZE = 100
+
+# Реплики для чтения: пути к копиям базы через запятую, например
+# DB_REPLICAS=replica1.sqlite3,replica2.sqlite3. Локально их обновляет
+# команда sync_replicas.
+DATABASE_REPLICAS = []
+for number, name in enumerate(
+        filter(None, os.environ.get('DB_REPLICAS', '').split(',')), 1):
+    alias = 'replica%d' % number
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, name.strip()),
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['core.db.ReplicaRouter']
+# Сколько секунд после записи запросы пользователя читают с основной базы.
+DATABASE_PIN_SECONDS = 15
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -83,6 +143,83 @@ CACHES = {
     }
 }
 
+# Общий для всех воркеров кэш (core.cache.SQLiteCache) включается путем
+# к файлу: CACHE_PATH=/var/tmp/yatube-cache.sqlite3. Без него у каждого
+# процесса свой LocMemCache. CACHE_LOCAL_ENTRIES > 0 добавляет поверх
+# файла кэш в памяти процесса на столько записей.
+CACHE_PATH = os.environ.get('CACHE_PATH')
+if CACHE_PATH:
+    CACHES['default'] = {
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, CACHE_PATH),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'MAX_SIZE': 256 * 1024 * 1024,
+            'LOCAL_ENTRIES': int(os.environ.get('CACHE_LOCAL_ENTRIES', 1000)),
+        },
+    }
+
+# Страницы лент сбрасываются сигналами при записи постов и комментариев
+# через счетчики поколений в кэше (posts.cache). В LocMemCache счетчики
+# у каждого процесса свои: запись в одном воркере не сбрасывает страницы
+# и ETag остальных. Поэтому без общего кэша (CACHE_PATH) страницы и
+# поколения живут FEED_CACHE_TIMEOUT = 5 секунд — столько другие
+# воркеры могут отдавать старую страницу и 304 на нее. С общим кэшем
+# страницы хранятся долго, а поколения — без срока.
+FEED_CACHE_SHARED = bool(CACHE_PATH)
+FEED_CACHE_TIMEOUT = 60 * 5 if FEED_CACHE_SHARED else 5
+
+# Ленты Atom/RSS/JSON: постов по умолчанию и предел для ?limit=.
+FEED_ITEMS = 50
+FEED_MAX_ITEMS = 200
+
+# Поиск ранжирует по bm25 столько самых свежих совпадений.
+SEARCH_RANK_WINDOW = 1000
+
+# Ленты «Обсуждаемое» (posts.trending): вес комментария падает вдвое
+# за TRENDING_HALF_LIFE секунд; update_trending пересчитывает оценки по
+# комментариям за TRENDING_WINDOW секунд и удаляет посты, чья оценка
+# упала ниже TRENDING_MIN_SCORE (в «свежих комментариях»).
+TRENDING_HALF_LIFE = 12 * 3600
+TRENDING_WINDOW = 7 * 24 * 3600
+TRENDING_MIN_SCORE = 0.05
+
+# Очередь задач после записи (core.tasks): поиск, миниатюры, ленты
+# подписок. Без отдельного `manage.py run_worker` пачку задач выполняет
+# запрос, который их поставил, после отправки ответа
+# (TASKS_AFTER_RESPONSE). TASKS_EAGER выполняет задачу сразу.
+TASKS_EAGER = False
+TASKS_AFTER_RESPONSE = True
+TASKS_LEASE = 300
+TASKS_POLL_INTERVAL = 1
+
+# Лимиты записей (core.ratelimit): токенов на пользователя и на IP
+# и во сколько периодов накапливается запас. За обратным прокси IP
+# берется из заголовка: RATE_LIMIT_IP_HEADER = 'HTTP_X_REAL_IP'.
+RATE_LIMITS = {
+    'posts.create': {'user': '10/h', 'ip': '60/h', 'burst': 1},
+    'posts.comment': {'user': '10/m', 'ip': '60/m', 'burst': 2},
+}
+
+# Метрики запросов по view (core.metrics): окно гистограмм и период
+# строки в логе в секундах, доля запросов с полной трассой SQL.
+METRICS_ENABLED = True
+METRICS_WINDOW = 60 * 5
+METRICS_LOG_INTERVAL = 60
+METRICS_SQL_SAMPLE_RATE = 0
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.metrics': {'handlers': ['console'], 'level': 'INFO'},
+        'core.tasks': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
+
 LANGUAGE_CODE = 'ru'
 
 TIME_ZONE = 'UTC'
@@ -101,3 +238,9 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Загрузки пишутся на диск кусками, лимиты проверяются по заголовку
+# картинки до ее декодирования.
+FILE_UPLOAD_HANDLERS = ['posts.uploads.LimitedImageUploadHandler']
+UPLOAD_IMAGE_MAX_BYTES = 5 * 1024 * 1024
+UPLOAD_IMAGE_MAX_PIXELS = 4096 * 4096
@@ -3,8 +3,11 @@ from django.urls import include, path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from core.views import metrics_report
+
 urlpatterns = [
     path('', include('posts.urls', namespace='posts')),
+    path('admin/metrics/', metrics_report, name='metrics'),
     path('admin/', admin.site.urls),
     path('auth/', include('users.urls', namespace='users')),
     path('auth/', include('django.contrib.auth.urls')),